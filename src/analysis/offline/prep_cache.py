@@ -0,0 +1,159 @@
+"""
+On-disk cache of PREP-preprocessed recordings.
+
+``TFRContrastAnalyzer.preprocess`` (PREP robust reference, bad-channel
+interpolation and band-pass filtering) dominates the run time of
+``analyze_contrast``, but it only depends on the recording and a few
+config fields. Entries are content-addressed: the key is a SHA-256 over
+the SHA-256 of the recording file, the channels it was loaded with, the
+preprocessing fields (montage, notch_freqs, fmin, fmax, prep_ransac,
+prep_channel_wise) and the MNE and pyprep versions. ``stim_freq``, TFR and
+plotting parameters are not part of the key, so changing them reuses the
+cleaned data.
+
+An entry is a double-precision FIF file (the cleaned Raw, read back
+bit-identical) plus a JSON file with the PREP results for the report. A
+hit refreshes the modification time of the entry; after every store the
+least recently used entries are deleted until the cache fits its size cap.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bump when preprocess() changes in a way that alters its output
+PREP_CACHE_VERSION: int = 1
+DEFAULT_MAX_MB: float = 4096.0
+HASH_BUFFER_BYTES: int = 1 << 20
+BYTES_PER_MB: float = 1024 * 1024
+RAW_SUFFIX: str = "_raw.fif"
+INFO_SUFFIX: str = ".json"
+
+
+def file_sha256(path: Path) -> str:
+    """Returns the SHA-256 hex digest of a file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(HASH_BUFFER_BYTES):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _library_versions() -> Dict[str, str]:
+    import mne
+
+    try:
+        import pyprep
+        pyprep_version = getattr(pyprep, "__version__", "unknown")
+    except ImportError:
+        pyprep_version = "missing"
+    return {"mne": mne.__version__, "pyprep": pyprep_version}
+
+
+class PrepCache:
+    """
+    LRU cache of cleaned Raw objects and their PREP results.
+
+    Args:
+        directory: Cache directory; created on first store.
+        max_mb: Size cap in MB; least recently used entries are evicted
+            beyond it.
+    """
+
+    def __init__(self, directory: Path, max_mb: float = DEFAULT_MAX_MB) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = int(max_mb * BYTES_PER_MB)
+        self._file_hashes: Dict[Path, str] = {}
+
+    def key(self, source: Path, ch_names: List[str], params: Dict[str, Any]) -> str:
+        """
+        Returns the cache key of a recording preprocessed with *params*.
+
+        Args:
+            source: Recording file the Raw was read from.
+            ch_names: Channels of the Raw after picking.
+            params: Config fields preprocessing depends on.
+
+        Returns:
+            Hex digest naming the entry.
+        """
+        source = Path(source).resolve()
+        if source not in self._file_hashes:
+            # Hashed once per run; single-file mode preprocesses the same file twice
+            self._file_hashes[source] = file_sha256(source)
+        content = {
+            "version": PREP_CACHE_VERSION,
+            "file": self._file_hashes[source],
+            "channels": list(ch_names),
+            "params": params,
+            "libraries": _library_versions(),
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        return self.directory / f"{key}{RAW_SUFFIX}", self.directory / f"{key}{INFO_SUFFIX}"
+
+    def load(self, key: str) -> Optional[Tuple[Any, Dict[str, Any]]]:
+        """
+        Returns the cached (Raw, PREP results) of *key*, or None on a miss.
+
+        A hit marks the entry as recently used.
+        """
+        import mne
+
+        raw_path, info_path = self._paths(key)
+        if not (raw_path.exists() and info_path.exists()):
+            return None
+        try:
+            raw = mne.io.read_raw_fif(raw_path, preload=True, verbose=False)
+            info = json.loads(info_path.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.warning("Ignoring unreadable PREP cache entry %s: %s", key[:12], e)
+            return None
+        for path in self._entry_files(key):
+            os.utime(path)
+        return raw, info
+
+    def store(self, key: str, raw: Any, info: Dict[str, Any]) -> None:
+        """
+        Saves a cleaned Raw and its PREP results, then evicts down to the size cap.
+
+        The JSON file is written last, under a temporary name, and only an
+        entry with both files is a hit, so an interrupted store is a miss.
+        """
+        raw_path, info_path = self._paths(key)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        try:
+            # Recordings over 2 GB are split into <key>_raw-1.fif, ... next to it
+            raw.save(raw_path, fmt="double", overwrite=True, verbose=False)
+            tmp_info = info_path.with_name(info_path.name + ".tmp")
+            tmp_info.write_text(json.dumps(info, indent=2, default=sorted), encoding="utf-8")
+            os.replace(tmp_info, info_path)
+        except OSError as e:
+            logger.warning("Could not store PREP cache entry: %s", e)
+            return
+        self.evict()
+
+    def _entry_files(self, key: str) -> List[Path]:
+        return sorted(self.directory.glob(f"{key}*"))
+
+    def evict(self) -> None:
+        """Deletes least recently used entries until the cache fits ``max_bytes``."""
+        entries: Dict[str, List[Path]] = {}
+        for path in self.directory.iterdir():
+            entries.setdefault(path.name.split("_")[0].split(".")[0], []).append(path)
+        sizes = {key: sum(p.stat().st_size for p in paths) for key, paths in entries.items()}
+        used = {key: max(p.stat().st_mtime for p in paths) for key, paths in entries.items()}
+        total = sum(sizes.values())
+        for key in sorted(entries, key=used.get):
+            if total <= self.max_bytes:
+                break
+            for path in entries[key]:
+                path.unlink(missing_ok=True)
+            total -= sizes[key]
+            logger.info("Evicted PREP cache entry %s (%.1f MB)", key[:12], sizes[key] / BYTES_PER_MB)
@@ -41,7 +41,9 @@ import numpy as np
 import pandas as pd
 from pyprep.prep_pipeline import PrepPipeline
 
+from src.analysis.offline.prep_cache import DEFAULT_MAX_MB, PrepCache
 from src.utils.logger import setup_logger
+from src.utils.markers import MARKER_MAP  # noqa: F401  (re-exported)
 
 matplotlib.use("Agg")
 
@@ -69,24 +71,6 @@ MARKER_STIM_ON = 1
 MARKER_STIM_OFF = 11
 MARKER_REST = 0
 
-MARKER_MAP: Dict[float, str] = {
-    # New condition-aware markers
-    100.0: "FOT_Rest [100]",
-    101.0: "FOT_Stim_ON [101]",
-    111.0: "FOT_Stim_OFF [111]",
-    200.0: "IFNFN_Rest [200]",
-    201.0: "IFNFN_Stim_ON [201]",
-    211.0: "IFNFN_Stim_OFF [211]",
-    # Legacy markers (single-condition recordings)
-    0.0: "Stimulation READY [0]",
-    1.0: "Stimulation ON [1]",
-    11.0: "Stimulation OFF [11]",
-    3.0: "Baseline_VHP_OFF [3]",
-    33.0: "Baseline_VHP_ON [33]",
-    31.0: "Baseline_NoContact [31]",
-    333.0: "Baseline_PreSweep [333]",
-}
-
 
 # ---------------------------------------------------------------------------
 # Configuration dataclass
@@ -108,6 +92,10 @@ class TFRContrastConfig:
     # --- PREP preprocessing parameters ---
     prep_ransac: bool = False
     prep_channel_wise: bool = True
+    # Reuse cleaned data across runs (see prep_cache.py); None = <repo>/cache/prep
+    prep_cache: bool = True
+    prep_cache_dir: Optional[str] = None
+    prep_cache_max_mb: float = DEFAULT_MAX_MB
 
     # --- TFR parameters ---
     tfr_method: str = "morlet"
@@ -242,6 +230,12 @@ class TFRContrastAnalyzer:
         self.psd_ifnfn = None
         self.psd_contrast = None  # Spectrum contrast (FOT - IFNFN)
         self.prep_info: Dict[str, Any] = {}
+        self.prep_cache: Optional[PrepCache] = None
+        if config.prep_cache:
+            from src.utils.paths import CACHE_DIR
+
+            self.prep_cache = PrepCache(Path(config.prep_cache_dir or CACHE_DIR / "prep"),
+                                        max_mb=config.prep_cache_max_mb)
 
     # ------------------------------------------------------------------
     # Data loading
@@ -328,10 +322,29 @@ class TFRContrastAnalyzer:
     # ------------------------------------------------------------------
     # Step 0: Preprocessing
     # ------------------------------------------------------------------
+    def _prep_cache_key(self, raw: mne.io.RawArray) -> Optional[str]:
+        """Cache key of *raw* with the current preprocessing config, or None if uncached."""
+        source = raw.filenames[0] if raw.filenames else None
+        if self.prep_cache is None or source is None:
+            return None
+        params = {
+            "montage": self.cfg.montage,
+            "notch_freqs": [float(f) for f in self.cfg.notch_freqs],
+            "fmin": self.cfg.fmin,
+            "fmax": self.cfg.fmax,
+            "prep_ransac": self.cfg.prep_ransac,
+            "prep_channel_wise": self.cfg.prep_channel_wise,
+            "random_seed": RANDOM_SEED,
+        }
+        return self.prep_cache.key(Path(source), raw.ch_names, params)
+
     def preprocess(self, raw: mne.io.RawArray, label: str = "data") -> mne.io.RawArray:
         """
         Apply PREP (Preprocessing Pipeline) robust reference.
 
+        Results are cached on disk by recording content and preprocessing
+        config (``prep_cache``); a hit skips PREP, interpolation and filtering.
+
         Args:
             raw: MNE Raw object.
             label: Condition label for logging.
@@ -339,6 +352,16 @@ class TFRContrastAnalyzer:
         Returns:
             Preprocessed Raw object with re-reference and filtering applied.
         """
+        cache_key = self._prep_cache_key(raw)
+        cached = self.prep_cache.load(cache_key) if cache_key else None
+        if cached is not None:
+            raw_clean, info = cached
+            info["bad_before"] = set(info.get("bad_before", []))
+            self.prep_info[label] = info
+            logger.info("Using cached PREP result for %s (%s); interpolated: %s",
+                        label, cache_key[:12], info.get("interpolated") or "none")
+            return raw_clean
+
         logger.info("Running PREP pipeline for %s...", label)
 
         # 1. Identify channels for PREP: Must be 'eeg' AND in montage
@@ -465,6 +488,8 @@ class TFRContrastAnalyzer:
                 virtual_raw = mne.io.RawArray(ch_data, info, verbose=False)
                 raw_clean.add_channels([virtual_raw], force_update_info=True)
 
+        if cache_key:
+            self.prep_cache.store(cache_key, raw_clean, self.prep_info[label])
         return raw_clean
 
     # ------------------------------------------------------------------
@@ -2074,6 +2099,7 @@ def main():
     parser.add_argument("-o", "--output", type=Path, default=Path("reports"))
     parser.add_argument("-s", "--stimfreq", type=float, help="Stimulation frequency")
     parser.add_argument("--export-csv", action="store_true", help="Export CSV data")
+    parser.add_argument("--no-cache", action="store_true", help="Rerun PREP instead of using the cache")
 
     args = parser.parse_args()
 
@@ -2089,6 +2115,8 @@ def main():
         cfg.export_csv = True
     if args.stimfreq:
         cfg.stim_freq = args.stimfreq
+    if args.no_cache:
+        cfg.prep_cache = False
 
     cfg.output_dir = str(args.output)
 
@@ -196,27 +196,13 @@ class EEGVisualizer:
                 logger.error("Failed to create virtual channel %s: %s", name, e)
 
     def _add_annotations(self, timestamps, markers):
-        valid_mask = ~np.isnan(markers)
-        if not np.any(valid_mask):
+        from src.utils.markers import marker_annotations, markers_from_column
+
+        idxs, codes = markers_from_column(markers)
+        if not len(idxs):
             return
-            
-        marker_indices = np.where(valid_mask)[0]
-        marker_values = markers[valid_mask]
-        onsets = timestamps[marker_indices] - timestamps[0]
-        
-        marker_map = {
-            0.0: 'Stimulation READY [0]',
-            1.0: 'Stimulation ON [1]',
-            11.0: 'Stimulation OFF [11]',
-            3.0: 'Baseline_VHP_OFF [3]',
-            33.0: 'Baseline_VHP_ON [33]',
-            31.0: 'Baseline_NoContact [31]',
-            333.0: 'Baseline_PreSweep [333]'
-        }
-        
-        descriptions = [marker_map.get(m, f"Event_{int(m)}") for m in marker_values]
-        annots = mne.Annotations(onset=onsets, duration=[0.01]*len(onsets), description=descriptions)
-        self.raw.set_annotations(annots)
+        onsets = timestamps[idxs] - timestamps[0]
+        self.raw.set_annotations(marker_annotations(onsets, codes, end=self.raw.n_times / self.raw.info['sfreq']))
 
     def create_timeseries_plot(self, start: float, duration: float):
         """Creates a timeseries plot with markers."""
@@ -13,33 +13,43 @@ Closing /tmp/260406-1259_None_baseline_NO_CONTACT_eeg.fif.gz
 [done]
 """
 
+import argparse
+import glob
 import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
 from pathlib import Path
+from typing import BinaryIO, Callable, Dict, List, Optional, Sequence, Tuple
 
 import mne
 import numpy as np
 import pandas as pd
 import yaml
 
+from src.converting.gaps import (BAD_GAP_DESCRIPTION, DEFAULT_MAX_FILL_S, analyze_timestamps, gap_report_path,
+                                  resample_block, write_gap_report)
+from src.recording.writers import is_binary_record, read_record
+from src.utils.markers import marker_annotations
+
 logger = logging.getLogger(__name__)
 
-MARKER_MAP: dict[float, str] = {
-    # New condition-aware markers
-    100.0: "FOT_Rest [100]",
-    101.0: "FOT_Stim_ON [101]",
-    111.0: "FOT_Stim_OFF [111]",
-    200.0: "IFNFN_Rest [200]",
-    201.0: "IFNFN_Stim_ON [201]",
-    211.0: "IFNFN_Stim_OFF [211]",
-    # Legacy markers (single-condition recordings)
-    0.0: "Stimulation READY [0]",
-    1.0: "Stimulation ON [1]",
-    11.0: "Stimulation OFF [11]",
-    3.0: "Baseline_VHP_OFF [3]",
-    33.0: "Baseline_VHP_ON [33]",
-    31.0: "Baseline_NoContact [31]",
-    333.0: "Baseline_PreSweep [333]",
-}
+# CSV rows parsed per block; peak memory of a conversion is proportional to this
+DEFAULT_BLOCK_ROWS: int = 65536
+# Bytes per read when counting CSV rows
+COUNT_BUFFER_BYTES: int = 1 << 20
+# Brainflow samples are in uV, MNE expects V
+UV_TO_V: float = 1e-6
+SAMPLE_DTYPE = np.float32
+# Plain FIF is written and read without (de)compression and can be read lazily;
+# gzip saves little on float32 EEG and is single-threaded in both directions
+OUTPUT_FORMATS: Dict[str, str] = {"fif": "_eeg.fif", "fif.gz": "_eeg.fif.gz"}
+DEFAULT_OUTPUT_FORMAT: str = "fif.gz"
+BENCHMARK_REPEATS: int = 3
+RECORDING_PATTERNS: Tuple[str, ...] = ("*.csv", "*.rec")
+BYTES_PER_MB: float = 1024 * 1024
 
 
 def read_yaml_config(args):
@@ -52,21 +62,134 @@ def read_yaml_config(args):
     return config
 
 
+class SampleArrayRaw(mne.io.BaseRaw):
+    """
+    Raw object reading on demand from a (samples, channels) array.
+
+    The array is typically a memory map (binary ``.rec`` samples or the
+    buffer filled by ``read_csv_blocks``), so nothing is loaded until MNE
+    asks for a segment, and ``save`` streams it one buffer at a time.
+    Values are scaled from uV to V as they are read.
+
+    With *positions* (from ``analyze_timestamps``) the Raw is the repaired,
+    gap-free recording: each recorded sample is placed at its output index
+    and dropped samples are interpolated as segments are read.
+    """
+
+    def __init__(self, samples: np.ndarray, info: mne.Info, buffer_file: Optional[BinaryIO] = None,
+                 positions: Optional[np.ndarray] = None, verbose=None) -> None:
+        num_samples = len(samples) if positions is None else int(positions[-1]) + 1
+        # raw_extras also keeps the temporary file behind a CSV buffer alive
+        super().__init__(info, preload=False, last_samps=[num_samples - 1], orig_format="single",
+                         raw_extras=[{"samples": samples, "buffer_file": buffer_file, "positions": positions}],
+                         verbose=verbose)
+
+    def _read_segment_file(self, data, idx, fi, start, stop, cals, mult):
+        from mne._fiff.utils import _mult_cal_one
+
+        extras = self._raw_extras[fi]
+        if extras["positions"] is None:
+            block = extras["samples"][start:stop].astype(np.float64)
+        else:
+            block = resample_block(extras["samples"], extras["positions"], start, stop)
+        _mult_cal_one(data, block.T * UV_TO_V, idx, cals, mult)
+
+
+def count_csv_rows(csv_file: Path) -> int:
+    """Counts the rows of a CSV file in fixed-size binary reads."""
+    rows = 0
+    last = b"\n"
+    with open(csv_file, "rb") as f:
+        while chunk := f.read(COUNT_BUFFER_BYTES):
+            rows += chunk.count(b"\n")
+            last = chunk[-1:]
+    # A last row without a trailing newline
+    return rows + (last != b"\n")
+
+
+def read_csv_blocks(csv_file: Path, num_channels: int, block_rows: int = DEFAULT_BLOCK_ROWS
+                    ) -> Tuple[np.ndarray, BinaryIO, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Streams a sweep CSV into a memory-mapped float32 sample buffer.
+
+    The file is parsed *block_rows* rows at a time with explicit dtypes
+    (float64 timestamps, float32 samples and markers) into a buffer that
+    is preallocated from a row count, so peak memory depends on the block
+    size, not on the recording length. Besides the buffer only the
+    timestamps (8 bytes per row, for the gap repair) and the marker rows
+    are kept.
+
+    Args:
+        csv_file: CSV with timestamp, channel and marker columns.
+        num_channels: Channels between the timestamp and the marker column.
+        block_rows: Rows per parsed block.
+
+    Returns:
+        Tuple of (samples (n, num_channels) float32 memmap, its backing
+        temporary file, timestamps (n,), marker sample indices, marker
+        values).
+    """
+    num_rows = count_csv_rows(csv_file)
+    buffer_file = tempfile.TemporaryFile(prefix="convert_", suffix=".f32")
+    samples = np.memmap(buffer_file, dtype=SAMPLE_DTYPE, mode="w+", shape=(max(num_rows, 1), num_channels))
+    marker_col = num_channels + 1
+    dtypes = {0: np.float64, marker_col: SAMPLE_DTYPE, **{c: SAMPLE_DTYPE for c in range(1, marker_col)}}
+    timestamps, marker_idxs, values = [], [], []
+    row = 0
+    for block in pd.read_csv(csv_file, header=None, usecols=range(marker_col + 1), dtype=dtypes,
+                             chunksize=block_rows):
+        n = len(block)
+        samples[row:row + n] = block.iloc[:, 1:marker_col].to_numpy(dtype=SAMPLE_DTYPE)
+        timestamps.append(block[0].to_numpy())
+        markers = block[marker_col].to_numpy()
+        valid = np.flatnonzero(~np.isnan(markers))
+        marker_idxs.append(valid + row)
+        values.append(markers[valid].astype(np.float64))
+        row += n
+    samples.flush()
+    if row != num_rows:
+        samples = samples[:row]
+    if not timestamps:
+        return samples, buffer_file, np.empty(0), np.empty(0, dtype=np.int64), np.empty(0)
+    return (samples, buffer_file, np.concatenate(timestamps), np.concatenate(marker_idxs),
+            np.concatenate(values))
+
+
 def mne_from_brainflow(args, config):
-    """Read Brainflow CSV and return as MNE Raw object."""
-    if args.verbose:
-        logger.info(f"* Reading Brainflow CSV from {args.file}")
+    """
+    Read Brainflow CSV (or binary ``.rec`` recording) and return as MNE Raw object.
 
-    csv_file = args.file
-    data_in = pd.read_csv(csv_file, header=None).values.T
+    The returned Raw is not preloaded: samples stay in a memory map (the
+    ``.rec`` samples, or a temporary float32 buffer the CSV is streamed into
+    block by block) until MNE reads them, e.g. while saving.
 
-    timestamps = data_in[0]
+    Unless ``args.repair`` is False, dropped samples and clock drift are
+    detected from the timestamps (``analyze_timestamps``): the Raw gets the
+    dropped samples back by interpolation, markers are placed at their
+    corrected sample index, gaps longer than ``args.max_fill_s`` are
+    annotated ``BAD_gap``, and a ``<name>_gaps.json`` report is written to
+    ``args.output_dir``.
+    """
+    if args.verbose:
+        logger.info(f"* Reading Brainflow CSV from {args.file}")
 
-    # Convert from brainflow (V) to MNE (uV)
-    data = data_in[1 : len(config["channels"]) + 1] * 1e-6
-    markers = data_in[len(config["channels"]) + 1]
+    num_channels = len(config["channels"])
+    buffer_file = None
+    if is_binary_record(args.file):
+        # Binary sweep recording: columns are memory-mapped, nothing to parse
+        samples, timestamps, events, _ = read_record(args.file)
+        samples = samples[:, :num_channels]
+        events = events[events[:, 0] < len(timestamps)]
+        # One marker per sample, the last one written, as in the CSV layout
+        _, last = np.unique(events[::-1, 0], return_index=True)
+        events = events[::-1][last]
+        marker_idxs = events[:, 0]
+        marker_vals = events[:, 1].astype(np.float64)
+    else:
+        samples, buffer_file, timestamps, marker_idxs, marker_vals = read_csv_blocks(
+            args.file, num_channels, getattr(args, "block_rows", DEFAULT_BLOCK_ROWS))
 
-    ch_types = ["eeg"] * len(config["channels"])  # Assuming all are EEG channels
+    ch_types = ["eeg"] * num_channels  # Assuming all are EEG channels
     sfreq = config["sfreq"]
     info = mne.create_info(
         ch_names=config["channels"],
@@ -75,38 +198,240 @@ def mne_from_brainflow(args, config):
         verbose=args.verbose,
     )
 
-    raw = mne.io.RawArray(data, info, verbose=args.verbose)
+    repair = None
+    if getattr(args, "repair", True) and len(timestamps) > 1:
+        repair = analyze_timestamps(timestamps, sfreq, max_fill_s=getattr(args, "max_fill_s", DEFAULT_MAX_FILL_S))
+        logger.info("Timestamps: %d gaps (%d samples filled, %d BAD), drift %+.1f ppm (%.4f Hz)",
+                    len(repair.gaps), repair.num_missing, sum(gap["bad"] for gap in repair.gaps),
+                    repair.drift_ppm, repair.effective_sfreq)
+        if getattr(args, "output_dir", None):
+            write_gap_report(repair, gap_report_path(args.file, args.output_dir))
+        onsets = repair.positions[marker_idxs] / sfreq
+    else:
+        onsets = timestamps[marker_idxs] - timestamps[0] if len(marker_idxs) else np.empty(0)
+
+    raw = SampleArrayRaw(samples, info, buffer_file=buffer_file,
+                         positions=repair.positions if repair is not None and repair.num_missing else None,
+                         verbose=args.verbose)
 
     raw.set_montage(config["montage"], on_missing="ignore", verbose=args.verbose)
     raw.pick(config["pick_channels"])
 
-    # Build annotations from marker column
-    valid_mask = pd.to_numeric(pd.Series(markers), errors="coerce").notna()
-    marker_vals = pd.to_numeric(pd.Series(markers), errors="coerce").values
-
-    if np.any(valid_mask):
-        idxs = np.where(valid_mask)[0]
-        onsets = timestamps[idxs] - timestamps[0]
-        descriptions = [
-            MARKER_MAP.get(float(marker_vals[i]), f"Event_{int(marker_vals[i])}")
-            for i in idxs
-        ]
-        annots = mne.Annotations(
-            onset=onsets,
-            duration=[0.01] * len(onsets),
-            description=descriptions,
-        )
-        raw.set_annotations(annots)
+    # Build annotations from marker column; each lasts until the next marker
+    if len(onsets):
+        annots = marker_annotations(onsets, marker_vals, end=raw.n_times / sfreq)
         logger.info(f"Found {len(annots)} annotations")
     else:
+        annots = mne.Annotations([], [], [])
         logger.warning("No markers found!!!")
+    if repair is not None:
+        bad_onsets, bad_durations = repair.bad_segments()
+        annots += mne.Annotations(bad_onsets, bad_durations, [BAD_GAP_DESCRIPTION] * len(bad_onsets))
+    raw.set_annotations(annots)
 
     return raw
 
 
+def output_path(record: Path, output_dir: Path, output_format: str = DEFAULT_OUTPUT_FORMAT) -> Path:
+    """Returns the FIF file ``convert`` writes for *record* in *output_format* (``fif`` or ``fif.gz``)."""
+    return Path(output_dir) / (Path(record).stem + OUTPUT_FORMATS[output_format])
+
+
 def write_raw(args, raw):
-    """Write file with MNE."""
-    filename = Path(args.file).stem + "_eeg.fif.gz"
-    output_path = Path(args.output_dir) / filename
+    """Write file with MNE, as ``fif.gz`` unless ``args.format`` says otherwise."""
+    raw.save(output_path(args.file, args.output_dir, getattr(args, "format", DEFAULT_OUTPUT_FORMAT)),
+             overwrite=True)
+
+
+def collect_recordings(patterns: Sequence[str]) -> List[Path]:
+    """
+    Expands ``convert -f`` arguments into recordings.
+
+    Args:
+        patterns: Files, directories (every ``*.csv`` and ``*.rec`` inside)
+            or glob patterns such as ``data/raw/260406-*_c*.csv``.
+
+    Returns:
+        Sorted recordings, without duplicates.
+    """
+    records = set()
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir() and not is_binary_record(path):
+            records.update(p for glob_pattern in RECORDING_PATTERNS for p in path.glob(glob_pattern))
+        elif glob.has_magic(pattern):
+            records.update(Path(p) for p in glob.glob(pattern))
+        else:
+            records.add(path)
+    return sorted(records)
+
+
+def recording_size(record: Path) -> int:
+    """Returns the size in bytes of a CSV file or of all files of a ``.rec`` directory."""
+    if record.is_dir():
+        return sum(f.stat().st_size for f in record.iterdir())
+    return record.stat().st_size
+
+
+def is_up_to_date(record: Path, output: Path, config_path: Path) -> bool:
+    """
+    Checks whether *output* is newer than the recording and the montage.
+
+    Args:
+        record: CSV file or ``.rec`` directory.
+        output: FIF file ``convert`` would write.
+        config_path: Montage YAML used for the conversion.
+
+    Returns:
+        True if *output* exists and no input changed after it was written.
+    """
+    if not output.exists():
+        return False
+    inputs = list(record.iterdir()) if record.is_dir() else [record]
+    newest_input = max(os.path.getmtime(p) for p in [*inputs, config_path])
+    return output.stat().st_mtime >= newest_input
+
+
+def convert_file(record: Path, config_path: Path, output_dir: Path, verbose: bool = False,
+                 output_format: str = DEFAULT_OUTPUT_FORMAT, repair: bool = True,
+                 max_fill_s: float = DEFAULT_MAX_FILL_S) -> float:
+    """
+    Converts one recording to FIF; runs in a worker process in batch mode.
+
+    Args:
+        record: CSV file or ``.rec`` directory.
+        config_path: Montage YAML.
+        output_dir: Directory for the FIF file.
+        verbose: Verbose MNE output.
+        output_format: ``fif`` or ``fif.gz``.
+        repair: Repair timestamp gaps and drift (see ``mne_from_brainflow``).
+        max_fill_s: Longest gap that is interpolated without a BAD annotation.
+
+    Returns:
+        Seconds the conversion took.
+    """
+    start = time.perf_counter()
+    args = argparse.Namespace(file=str(record), config=str(config_path), output_dir=str(output_dir),
+                              verbose=verbose, format=output_format, repair=repair, max_fill_s=max_fill_s)
+    raw = mne_from_brainflow(args, read_yaml_config(args))
+    write_raw(args, raw)
+    return time.perf_counter() - start
+
+
+def convert_batch(patterns: Sequence[str], config_path: Path, output_dir: Path, jobs: Optional[int] = None,
+                  force: bool = False, verbose: bool = False, output_format: str = DEFAULT_OUTPUT_FORMAT,
+                  repair: bool = True, max_fill_s: float = DEFAULT_MAX_FILL_S) -> int:
+    """
+    Converts every recording matched by *patterns* with a process pool.
+
+    Recordings whose FIF file is newer than both the recording and the
+    montage YAML are skipped unless *force* is set. At the end the number
+    of converted, skipped and failed files and the throughput (input MB/s
+    and files/s over the wall time) are logged.
+
+    Args:
+        patterns: Files, directories or glob patterns (see ``collect_recordings``).
+        config_path: Montage YAML.
+        output_dir: Directory for the FIF files.
+        jobs: Worker processes (default: CPU count, at most one per file).
+        force: Convert even if the output is up to date.
+        verbose: Verbose MNE output.
+        output_format: ``fif`` or ``fif.gz``.
+        repair: Repair timestamp gaps and drift.
+        max_fill_s: Longest gap that is interpolated without a BAD annotation.
+
+    Returns:
+        Number of recordings that failed to convert.
+    """
+    records = collect_recordings(patterns)
+    if not records:
+        logger.warning("No recordings match %s", " ".join(patterns))
+        return 0
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    todo = [r for r in records if force or not is_up_to_date(r, output_path(r, output_dir, output_format),
+                                                              Path(config_path))]
+    skipped = len(records) - len(todo)
+    if skipped:
+        logger.info("Skipping %d recordings with up-to-date output (use --force to convert them)", skipped)
+    if not todo:
+        return 0
+
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(todo)))
+    sizes = {r: recording_size(r) for r in todo}
+    failed_records = set()
+
+    def finish(record: Path, run: Callable[[], float]) -> None:
+        """Logs one conversion; a failure is counted instead of aborting the batch."""
+        try:
+            seconds = run()
+        except Exception as e:
+            failed_records.add(record)
+            logger.error("Failed to convert %s: %s", record, e)
+            return
+        logger.info("Converted %s (%.1f MB, %.1f s)", record.name, sizes[record] / BYTES_PER_MB, seconds)
+
+    start = time.perf_counter()
+    if jobs == 1:
+        # Single worker: no pool, so MNE output stays in this process
+        for record in todo:
+            finish(record, partial(convert_file, record, config_path, output_dir, verbose, output_format,
+                                   repair, max_fill_s))
+    else:
+        logger.info("Converting %d recordings with %d processes...", len(todo), jobs)
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(convert_file, r, config_path, output_dir, verbose, output_format, repair,
+                                   max_fill_s): r for r in todo}
+            for future in as_completed(futures):
+                finish(futures[future], future.result)
+    wall = time.perf_counter() - start
+    failed = len(failed_records)
+    converted = len(todo) - failed
+    total_mb = sum(sizes[r] for r in todo if r not in failed_records) / BYTES_PER_MB
+    logger.info("Converted %d, skipped %d, failed %d recordings: %.1f MB in %.1f s (%.1f MB/s, %.2f files/s)",
+                converted, skipped, failed, total_mb, wall, total_mb / wall, converted / wall)
+    return failed
+
+
+def benchmark_formats(record: Path, config_path: Path,
+                      repeats: int = BENCHMARK_REPEATS) -> Dict[str, Dict[str, float]]:
+    """
+    Compares the output formats on one recording.
+
+    The recording is converted once; then each format is written and read
+    back with ``read_raw_fif(preload=True)`` (as the analyses do) *repeats*
+    times. The best time of each is kept, which filters out cache and
+    scheduler noise. All files go to a temporary directory, so outputs of
+    real conversions are never overwritten.
+
+    Args:
+        record: CSV file or ``.rec`` directory.
+        config_path: Montage YAML.
+        repeats: Timed runs per format.
 
-    raw.save(output_path, overwrite=True)
+    Returns:
+        ``{format: {"write_s", "read_s", "size_mb"}}``.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="convert_benchmark_") as output_dir:
+        args = argparse.Namespace(file=str(record), config=str(config_path), output_dir=output_dir,
+                                  verbose=False)
+        raw = mne_from_brainflow(args, read_yaml_config(args))
+        raw.load_data(verbose=False)
+        for output_format in OUTPUT_FORMATS:
+            path = output_path(record, output_dir, output_format)
+            write_s, read_s = [], []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                raw.save(path, overwrite=True, verbose=False)
+                write_s.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                mne.io.read_raw_fif(path, preload=True, verbose=False)
+                read_s.append(time.perf_counter() - start)
+            results[output_format] = {"write_s": min(write_s), "read_s": min(read_s),
+                                      "size_mb": path.stat().st_size / BYTES_PER_MB}
+    logger.info("Output format benchmark on %s (%d channels, %.0f s, best of %d):", Path(record).name,
+                len(raw.ch_names), raw.times[-1], repeats)
+    for output_format, r in results.items():
+        logger.info("  %-7s write %6.2f s   read %6.2f s   size %7.1f MB", output_format, r["write_s"],
+                    r["read_s"], r["size_mb"])
+    return results
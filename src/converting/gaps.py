@@ -0,0 +1,209 @@
+"""
+Timestamp-based gap and drift repair for recordings.
+
+Recordings store one LSL timestamp per sample, but a Raw object assumes a
+perfect sampling rate. When samples are dropped (lost BrainFlow packets)
+every later sample, and every later event, would sit too early. This
+module finds dropped samples from the timestamps and maps every recorded
+sample to its position on a gap-free grid at the nominal rate.
+
+Method: LSL timestamps are stamped per chunk on arrival, so every sample
+carries the transport latency of its chunk (several sample periods of
+jitter), while a dropped run of samples is a *persistent* step. The
+residual ``ts[i] - ts[0] - i * T`` is reduced to its lower envelope, the
+minimum over the next window (1 s by default): the latency floor, which
+ignores late chunks but steps up exactly where samples are missing. The
+slope of the envelope away from steps is the clock drift (the effective
+period ``T_eff``). With ``T_eff``, the cumulative number of missing
+samples is the rounded, non-decreasing envelope in units of ``T_eff``.
+Steps closer than a window are one gap (late chunks just before a gap
+make the envelope rise early), placed at the last step. All of this is
+array operations; only the list of gaps is built in Python.
+"""
+
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_S: float = 1.0
+# Gaps up to this length are interpolated; longer ones are also annotated BAD
+DEFAULT_MAX_FILL_S: float = 0.1
+# Above this the montage sfreq is probably wrong, not the clock
+DRIFT_WARN_PPM: float = 1000.0
+PPM: float = 1e6
+BAD_GAP_DESCRIPTION: str = "BAD_gap"
+GAP_REPORT_SUFFIX: str = "_gaps.json"
+
+
+@dataclass
+class TimestampRepair:
+    """
+    Result of ``analyze_timestamps``.
+
+    Attributes:
+        positions: Output (gap-free) sample index of every recorded sample.
+        sfreq: Nominal sampling rate in Hz.
+        effective_sfreq: Sampling rate measured from the timestamps.
+        gaps: One dict per gap: ``sample`` (first missing output sample),
+            ``input_sample`` (first recorded sample after it), ``missing``,
+            ``onset_s``, ``duration_s`` and ``bad``.
+    """
+
+    positions: np.ndarray
+    sfreq: float
+    effective_sfreq: float
+    gaps: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def num_output(self) -> int:
+        """Samples of the repaired recording."""
+        return int(self.positions[-1]) + 1 if len(self.positions) else 0
+
+    @property
+    def num_missing(self) -> int:
+        """Samples inserted into gaps."""
+        return self.num_output - len(self.positions)
+
+    @property
+    def drift_ppm(self) -> float:
+        """Deviation of the measured from the nominal rate, in parts per million."""
+        return (self.effective_sfreq / self.sfreq - 1.0) * PPM
+
+    def bad_segments(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns onsets and durations (s) of the gaps too long to interpolate."""
+        bad = [gap for gap in self.gaps if gap["bad"]]
+        return (np.array([gap["onset_s"] for gap in bad]), np.array([gap["duration_s"] for gap in bad]))
+
+    def report(self) -> Dict[str, Any]:
+        """Returns the gap report as a JSON-serializable dict."""
+        return {
+            "sfreq": self.sfreq,
+            "effective_sfreq": self.effective_sfreq,
+            "drift_ppm": self.drift_ppm,
+            "recorded_samples": len(self.positions),
+            "output_samples": self.num_output,
+            "missing_samples": self.num_missing,
+            "gaps": self.gaps,
+        }
+
+
+def lower_envelope(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Minimum of each value and the ``window - 1`` values after it.
+
+    The last window is held at the envelope of the last full window, so
+    the shrinking window at the end does not read late chunks as gaps.
+    """
+    import pandas as pd
+
+    envelope = pd.Series(values[::-1]).rolling(window, min_periods=1).min().to_numpy()[::-1].copy()
+    if len(values) > window:
+        envelope[len(values) - window:] = envelope[len(values) - window]
+    return envelope
+
+
+def analyze_timestamps(timestamps: np.ndarray, sfreq: float, window_s: float = DEFAULT_WINDOW_S,
+                       max_fill_s: float = DEFAULT_MAX_FILL_S) -> TimestampRepair:
+    """
+    Detects dropped samples and clock drift from per-sample timestamps.
+
+    Args:
+        timestamps: LSL timestamp of every recorded sample (seconds).
+        sfreq: Nominal sampling rate in Hz.
+        window_s: Envelope window; must contain chunks at the latency floor.
+            Gaps closer than this are merged, and a gap in the last window
+            is not detected.
+        max_fill_s: Longest gap that is only interpolated; longer gaps are
+            marked ``bad``.
+
+    Returns:
+        The sample mapping, the measured rate and the list of gaps.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    n = len(timestamps)
+    period = 1.0 / sfreq
+    if n < 2:
+        return TimestampRepair(np.arange(n), sfreq, sfreq)
+
+    index = np.arange(n)
+    window = max(2, int(window_s * sfreq))
+    # Drift: mean slope of the envelope, at least a window away from any step
+    slope = np.diff(lower_envelope(timestamps - timestamps[0] - index * period, window))
+    steps = np.concatenate([[0], np.cumsum(slope >= period / 2)])
+    near_step = steps[np.minimum(index[:-1] + window, n - 1)] > steps[np.maximum(index[:-1] - window, 0)]
+    effective_period = period + (slope[~near_step].mean() if (~near_step).any() else 0.0)
+
+    envelope = lower_envelope(timestamps - timestamps[0] - index * effective_period, window)
+    missing = np.round((envelope - envelope[0]) / effective_period).astype(np.int64)
+    # Samples cannot be un-dropped: overlapping stamps are jitter, not negative gaps
+    missing = np.maximum(np.maximum.accumulate(missing), 0)
+    step_at = np.flatnonzero(np.diff(missing) > 0) + 1
+    counts = missing[step_at] - missing[step_at - 1]
+    # Merge steps closer than a window into one gap at the last step
+    if len(step_at):
+        last = np.append(np.diff(step_at) > window, True)
+        first = np.concatenate([[0], np.flatnonzero(last[:-1]) + 1])
+        counts = np.add.reduceat(counts, first)
+        step_at = step_at[last]
+    missing = np.zeros(n, dtype=np.int64)
+    missing[step_at] = counts
+    positions = index + np.cumsum(missing)
+
+    gaps = []
+    for k, count in zip(step_at, counts):
+        duration = int(count) * period
+        gaps.append({
+            "sample": int(positions[k] - count),
+            "input_sample": int(k),
+            "missing": int(count),
+            "onset_s": float((positions[k] - count) * period),
+            "duration_s": float(duration),
+            "bad": bool(duration > max_fill_s),
+        })
+    repair = TimestampRepair(positions, sfreq, 1.0 / effective_period, gaps)
+    if abs(repair.drift_ppm) > DRIFT_WARN_PPM:
+        logger.warning("Timestamps run at %.3f Hz, %.0f ppm off the nominal %.3f Hz; check sfreq in the montage.",
+                       repair.effective_sfreq, repair.drift_ppm, sfreq)
+    return repair
+
+
+def resample_block(samples: np.ndarray, positions: np.ndarray, start: int, stop: int) -> np.ndarray:
+    """
+    Reads output samples ``start:stop`` of a repaired recording.
+
+    Recorded samples are copied to their output position; samples inside a
+    gap are interpolated linearly between the recorded neighbours.
+
+    Args:
+        samples: Recorded samples (n, channels), e.g. a memory map.
+        positions: Output index of every recorded sample (``TimestampRepair.positions``).
+        start: First output sample.
+        stop: Output sample after the last one.
+
+    Returns:
+        float64 array (stop - start, channels).
+    """
+    wanted = np.arange(start, stop)
+    before = np.searchsorted(positions, wanted, side="right") - 1
+    after = np.minimum(before + 1, len(positions) - 1)
+    span = positions[after] - positions[before]
+    frac = np.where(span > 0, (wanted - positions[before]) / np.maximum(span, 1), 0.0)[:, None]
+    first = before[0]
+    block = np.asarray(samples[first:after[-1] + 1], dtype=np.float64)
+    return block[before - first] * (1.0 - frac) + block[after - first] * frac
+
+
+def gap_report_path(record: Path, output_dir: Path) -> Path:
+    """Returns the gap report written next to the FIF output of *record*."""
+    return Path(output_dir) / (Path(record).stem + GAP_REPORT_SUFFIX)
+
+
+def write_gap_report(repair: TimestampRepair, path: Path) -> None:
+    """Writes the gap report of a conversion as JSON."""
+    Path(path).write_text(json.dumps(repair.report(), indent=2), encoding="utf-8")
@@ -1,3 +1,8 @@
+import time
+
+# Taken before any other import so --profile-startup covers interpreter-level imports too
+_MAIN_T0 = time.perf_counter()
+
 import argparse
 import sys
 import logging
@@ -6,6 +11,7 @@ from pathlib import Path
 from src.utils.logger import setup_logger
 from src.utils.paths import initialize_directories, CONFIG_DIR, set_cloud_root
 from src.utils.config import EEGConfig
+from src.utils.profiling import StartupProfiler
 
 # Add the project root to sys.path to allow 'from src...' imports
 root_dir = Path(__file__).resolve().parent.parent
@@ -21,17 +27,41 @@ def main():
         type=str,
         help="Override the root directory for data, logs, and reports"
     )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Log how long imports and device connections take before streaming/sweeping starts"
+    )
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
     # Server command
     server_parser = subparsers.add_parser("LSLserver", help="Start LSL Server")
-    server_parser.add_argument("-c", "--config", type=str, required=True, help="Hardware config file")
+    server_parser.add_argument("-c", "--config", type=str, nargs="+", required=True, help="Hardware config file(s); several files or a 'Boards' list stream multiple boards")
     server_parser.add_argument("-m", "--montage", type=str, help="Montage YAML file for channel names")
+    server_parser.add_argument("--max-latency-ms", type=float, help="Scheduler mode: push chunks as soon as this latency budget is filled instead of polling every 10 ms")
+    server_parser.add_argument("--companions", nargs="+", choices=["counters", "aux"], help="Also publish package counter/timestamp/marker rows and/or aux (accel, gyro, analog) rows as separate streams")
+    server_parser.add_argument("--telemetry", type=float, metavar="SECONDS", help="Publish a <StreamName>_Diagnostics stream with rate, chunk, packet-loss and latency counters every SECONDS")
+    server_parser.add_argument("--telemetry-jsonl", action="store_true", help="Also append the telemetry to a JSON-lines file in the log directory")
+    server_parser.add_argument("--ring-buffer", nargs="?", const="", metavar="DIR", help="Also keep pushed EEG in a bounded on-disk ring buffer (default DIR: data/ring/<StreamName>)")
+    server_parser.add_argument("--ring-minutes", type=float, default=30.0, help="Ring buffer length in minutes (default: 30)")
+    server_parser.add_argument("--highpass", type=float, help="Filter stage: high-pass cutoff in Hz for the <StreamName>_Filtered stream")
+    server_parser.add_argument("--notch", type=float, nargs="+", help="Filter stage: notch frequencies in Hz (e.g. 50 100) for the <StreamName>_Filtered stream")
+    server_parser.add_argument("--benchmark", action="store_true", help="Report CPU cost per pushed sample (list vs float32 push) and exit")
 
     # Sweep command
     sweep_parser = subparsers.add_parser("sweep", help="Run Sweep Protocol")
     sweep_parser.add_argument("-p", "--protocol", type=str, required=True, help="Protocol config file")
     sweep_parser.add_argument("-d", "--device", type=str, required=True, help="Hardware config file")
+    sweep_parser.add_argument("--resume", type=str, metavar="TIMESTAMP",
+                              help="Continue an interrupted sweep (e.g. 261016-2054), skipping completed segments")
+    sweep_parser.add_argument("--simulate", action="store_true",
+                              help="Dry run on simulated EEG/VHP devices; prints the predicted timeline and duration")
+    sweep_parser.add_argument("--connect-s", type=float, default=2.0,
+                              help="Simulation: seconds to open the VHP serial port")
+    sweep_parser.add_argument("--command-s", type=float, default=0.05,
+                              help="Simulation: seconds per VHP serial command")
+    sweep_parser.add_argument("--prompt-s", type=float, default=0.0,
+                              help="Simulation: seconds the operator needs per prompt")
 
     # Analyze command
     analyze_parser = subparsers.add_parser("analyze", help="Analyze recorded data")
@@ -49,12 +79,47 @@ def main():
     analyze_contrast_parser.add_argument("-o", "--output", type=Path, default=Path("reports"),help="Output directory for report",)
     analyze_contrast_parser.add_argument("-s", "--stimfreq", type=int, help="StimFreq in Hz")
     analyze_contrast_parser.add_argument("--export-csv", action="store_true", help="Export TFR data to CSV")
+    analyze_contrast_parser.add_argument("--no-cache", action="store_true", help="Rerun PREP instead of using the preprocessing cache")
+
+    # Replay command
+    replay_parser = subparsers.add_parser("replay", help="Stream a recorded FIF/CSV file over LSL")
+    replay_parser.add_argument("-f", "--file", type=Path, required=True, help="FIF file from convert or raw sweep CSV")
+    replay_parser.add_argument("-n", "--name", type=str, default="BrainFlowEEG", help="LSL stream name (default: BrainFlowEEG)")
+    replay_parser.add_argument("--speed", type=float, default=1.0, help="Speed multiplier, e.g. 1 or 10; 0 = as fast as possible")
+    replay_parser.add_argument("--chunk-ms", type=float, default=20.0, help="Recording time per pushed chunk in ms (default: 20)")
+    replay_parser.add_argument("--sfreq", type=float, help="Sampling rate for CSV files (default: estimated from timestamps)")
+    replay_parser.add_argument("--loop", action="store_true", help="Restart at the end of the file")
+
+    # Ring buffer export command
+    export_ring_parser = subparsers.add_parser("export_ring", help="Export a time range of an LSLserver ring buffer to CSV/FIF")
+    export_ring_parser.add_argument("-r", "--ring-dir", type=Path, required=True, help="Ring buffer directory (e.g. data/ring/BrainFlowEEG)")
+    export_ring_parser.add_argument("-o", "--output-dir", type=Path, required=True, help="Output directory")
+    export_ring_parser.add_argument("--from", dest="start", type=str, help="Start time, ISO format (e.g. 2026-05-02T11:23:00); default: oldest sample")
+    export_ring_parser.add_argument("--to", dest="end", type=str, help="End time, ISO format; default: newest sample")
+    export_ring_parser.add_argument("--last", type=float, help="Export only the last N seconds before --to (or before now)")
+    export_ring_parser.add_argument("-c", "--config", type=Path, help="Montage YAML; if given, also write a FIF file like convert")
+
+    # Binary recording export command
+    export_record_parser = subparsers.add_parser("export_record", help="Export binary sweep recordings (.rec) to the CSV layout")
+    export_record_parser.add_argument("-f", "--file", type=Path, nargs="+", required=True, help="One or more .rec recording directories")
+    export_record_parser.add_argument("-o", "--output-dir", type=Path, help="Output directory (default: next to each recording)")
 
     convert = subparsers.add_parser("convert", help="Convert CSV to RAW")
-    convert.add_argument("-f", "--file", type=str, required=True, help="CSV file path")
+    convert.add_argument("-f", "--file", type=str, nargs="+", required=True,
+                         help="CSV files, binary .rec recordings, directories or glob patterns (quote them)")
     convert.add_argument("-c", "--config", type=str, required=True, help="Configuration file path")
     convert.add_argument("-o", "--output-dir", type=str, required=True, help="RAW output directory")
     convert.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output")
+    convert.add_argument("-j", "--jobs", type=int, help="Worker processes (default: number of CPUs)")
+    convert.add_argument("--force", action="store_true", help="Convert even if the FIF output is up to date")
+    convert.add_argument("--format", choices=["fif", "fif.gz"], default="fif.gz",
+                         help="Output format: fif (fast, uncompressed) or fif.gz (default)")
+    convert.add_argument("--no-repair", dest="repair", action="store_false",
+                         help="Keep the samples as recorded instead of repairing timestamp gaps and drift")
+    convert.add_argument("--max-fill-s", type=float, default=0.1,
+                         help="Longest gap (s) interpolated without a BAD_gap annotation (default: 0.1)")
+    convert.add_argument("--benchmark", action="store_true",
+                         help="Compare write/read time and size of the output formats on the first file")
 
     args = parser.parse_args()
 
@@ -69,30 +134,77 @@ def main():
         sys.exit(1)
 
     logger = setup_logger()
+    profiler = StartupProfiler(args.profile_startup, origin=_MAIN_T0)
+    profiler.mark("cli + logging setup", _MAIN_T0)
 
     if args.command == "LSLserver":
-        from src.streaming.LSLserver import LSLServer
-        config_path = Path(args.config)
+        with profiler.phase("import LSLserver"):
+            from src.streaming.LSLserver import LSLServer, LSLServerGroup, split_board_configs
         from src.utils.config import load_yaml
-        config = load_yaml(config_path)
 
-        # Add montage path to config if provided
-        if args.montage:
-            config["montage_path"] = args.montage
-
-        server = LSLServer(config)
-        server.run()
+        board_configs = []
+        for config_file in args.config:
+            config = load_yaml(Path(config_file))
+
+            # Add montage path to config if provided
+            if args.montage:
+                config["montage_path"] = args.montage
+            if args.max_latency_ms:
+                config["max_latency_ms"] = args.max_latency_ms
+            board_configs.extend(split_board_configs(config))
+
+        if args.companions:
+            for board_config in board_configs:
+                board_config["Board"] = dict(board_config["Board"], Companions=args.companions)
+        if args.ring_buffer is not None:
+            for board_config in board_configs:
+                ring_dir = args.ring_buffer and str(Path(args.ring_buffer) / board_config["Board"].get("StreamName", "BrainFlowEEG"))
+                board_config["Board"] = dict(board_config["Board"], RingBuffer={
+                    "Directory": ring_dir or None, "Minutes": args.ring_minutes})
+        if args.highpass or args.notch:
+            for board_config in board_configs:
+                board_config["Board"] = dict(board_config["Board"], Filter={
+                    "HighPass": args.highpass, "Notch": args.notch})
+        if args.telemetry:
+            for board_config in board_configs:
+                board_config["Board"] = dict(board_config["Board"], Telemetry={
+                    "Interval": args.telemetry, "JsonLog": args.telemetry_jsonl})
+
+        if args.benchmark:
+            for board_config in board_configs:
+                LSLServer(board_config).benchmark()
+        else:
+            runner = LSLServer(board_configs[0]) if len(board_configs) == 1 else LSLServerGroup(board_configs)
+            if args.profile_startup:
+                # Set up eagerly so board/outlet creation shows up in the profile;
+                # start() skips servers that are already set up
+                for server in getattr(runner, "servers", [runner]):
+                    with profiler.phase(f"setup_board {server.stream_name}"):
+                        server.setup_board()
+                    with profiler.phase(f"setup_lsl {server.stream_name}"):
+                        server.setup_lsl()
+                profiler.report()
+            runner.run()
 
     elif args.command == "sweep":
         logger.info("Initializing Sweep command...")
-        from src.recording.sweep import EEGSweep
+        with profiler.phase("import sweep"):
+            from src.recording.sweep import EEGSweep
         logger.info("Loading configuration...")
         cfg = EEGConfig(hardware_path=Path(args.device), protocol_path=Path(args.protocol))
+        if args.simulate:
+            from src.recording.simulate import SimulationTiming, simulate_sweep
+            simulate_sweep(cfg, SimulationTiming(connect_s=args.connect_s, command_s=args.command_s,
+                                                 prompt_s=args.prompt_s))
+            return
         logger.info("Setting up Sweep engine...")
-        sweep = EEGSweep(cfg)
-        sweep.connect_lsl()
+        sweep = EEGSweep(cfg, resume=args.resume)
+        with profiler.phase("connect_lsl"):
+            sweep.connect_lsl()
         # Silent connect initially, as Baseline 1 (VHP OFF) handles connection later
-        sweep.connect_vhp(silent=True)
+        with profiler.phase("connect_vhp"):
+            sweep.connect_vhp(silent=True)
+        profiler.report()
         sweep.run_sweep()
 
     elif args.command == "analyze":
@@ -140,6 +252,9 @@ def main():
         if args.stimfreq:
             cfg.stim_freq = float(args.stimfreq)
 
+        if args.no_cache:
+            cfg.prep_cache = False
+
         # Automatically resolve the montage profile if set
         if cfg.montage_profile:
             montage_dir = Path(__file__).resolve().parent.parent / "config" / "montages"
@@ -154,7 +269,11 @@ def main():
         cfg.output_dir = str(output_dir)
 
         analyzer = TFRContrastAnalyzer(cfg)
-        analyzer.load_two_files(args.fot, args.ifnfn)
+        if args.fot.resolve() == args.ifnfn.resolve():
+            # Interleaved recording: both conditions are in one file
+            analyzer.load_single_file(args.fot)
+        else:
+            analyzer.load_two_files(args.fot, args.ifnfn)
 
         success = analyzer.run_pipeline()
 
@@ -165,11 +284,47 @@ def main():
         report_path = analyzer.generate_report(output_dir=output_dir)
 
     elif args.command == "convert":
-        from src.converting.convert import read_yaml_config, mne_from_brainflow, write_raw
+        from src.converting.convert import benchmark_formats, collect_recordings, convert_batch
+
+        if args.benchmark:
+            records = collect_recordings(args.file)
+            if not records:
+                logger.error("No recordings match %s", " ".join(args.file))
+                sys.exit(1)
+            benchmark_formats(records[0], Path(args.config))
+        elif convert_batch(args.file, Path(args.config), Path(args.output_dir), jobs=args.jobs,
+                           force=args.force, verbose=args.verbose, output_format=args.format,
+                           repair=args.repair, max_fill_s=args.max_fill_s):
+            sys.exit(1)
+
+    elif args.command == "replay":
+        from src.streaming.replay import ReplayServer
+
+        server = ReplayServer(args.file, stream_name=args.name, speed=args.speed,
+                              chunk_ms=args.chunk_ms, sfreq=args.sfreq)
+        server.run(loop=args.loop)
+
+    elif args.command == "export_ring":
+        import time
+        from datetime import datetime
+        from src.streaming.ring_buffer import export_ring
+        from src.utils.config import load_yaml
 
-        config = read_yaml_config(args)
-        raw = mne_from_brainflow(args, config)
-        write_raw(args, raw)
+        start = datetime.fromisoformat(args.start).timestamp() if args.start else None
+        end = datetime.fromisoformat(args.end).timestamp() if args.end else None
+        if args.last:
+            start = (end or time.time()) - args.last
+        montage_config = load_yaml(args.config) if args.config else None
+        export_ring(args.ring_dir, args.output_dir, start, end, montage_config)
+
+    elif args.command == "export_record":
+        from src.recording.writers import export_record_csv
+
+        if args.output_dir:
+            args.output_dir.mkdir(parents=True, exist_ok=True)
+        for record in args.file:
+            csv_path = args.output_dir / record.with_suffix(".csv").name if args.output_dir else None
+            export_record_csv(record, csv_path)
 
     else:
         parser.print_help()
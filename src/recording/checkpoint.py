@@ -0,0 +1,163 @@
+"""
+Checkpoint journal for resumable sweeps.
+
+After every completed segment (baseline or sweep cell), and after every
+trial of a sweep cell, the sweep writes ``<timestamp>_checkpoint.json``
+next to its recordings. The file is replaced atomically (write to a
+temporary file, fsync, rename), so a crash leaves either the previous or
+the new checkpoint, never a torn one. ``sweep --resume <timestamp>``
+reads it back, skips the completed segments and trials and continues the
+interrupted recording right after the last completed trial.
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_SUFFIX: str = "_checkpoint.json"
+CHECKPOINT_VERSION: int = 2
+
+
+def checkpoint_path(directory: Path, timestamp: str) -> Path:
+    """Returns the journal path of the sweep started at *timestamp*."""
+    return Path(directory) / f"{timestamp}{CHECKPOINT_SUFFIX}"
+
+
+def write_json_atomic(path: Path, content: Dict[str, Any]) -> None:
+    """
+    Replaces *path* with *content* so readers never see a partial file.
+
+    Args:
+        path: Destination JSON file.
+        content: JSON-serializable dict.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(content, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SweepCheckpoint:
+    """
+    Journal of the completed segments and trials of one sweep.
+
+    Progress is reported from the background writer thread once the data is
+    on disk, so updates are serialized with a lock.
+    """
+
+    def __init__(self, path: Path, timestamp: str, protocol: Dict[str, Any]) -> None:
+        self.path = Path(path)
+        self.timestamp = timestamp
+        self.protocol = protocol
+        self.completed: List[str] = []
+        self.session: Optional[Dict[str, Any]] = None
+        # Segment interrupted after some trials: name, trials, writer state, start bookmark
+        self.partial: Optional[Dict[str, Any]] = None
+        self.finished = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, directory: Path, timestamp: str, protocol: Dict[str, Any]) -> "SweepCheckpoint":
+        """
+        Reads the journal of an interrupted sweep.
+
+        Args:
+            directory: Directory holding the recordings (``RAW_DATA_DIR``).
+            timestamp: Timestamp of the interrupted sweep, e.g. ``261016-2054``.
+            protocol: Protocol of the resumed run; must match the journal.
+
+        Returns:
+            The loaded checkpoint.
+
+        Raises:
+            FileNotFoundError: If there is no journal for *timestamp*.
+            ValueError: If the protocol differs from the interrupted run.
+        """
+        path = checkpoint_path(directory, timestamp)
+        if not path.exists():
+            raise FileNotFoundError(f"No sweep checkpoint {path}")
+        content = json.loads(path.read_text(encoding="utf-8"))
+        if content["protocol"] != protocol:
+            raise ValueError(f"Protocol differs from the one recorded in {path}; "
+                             "resume with the same protocol file.")
+        checkpoint = cls(path, timestamp, protocol)
+        checkpoint.completed = content["completed"]
+        checkpoint.session = content.get("session")
+        checkpoint.partial = content.get("partial")
+        checkpoint.finished = content.get("finished", False)
+        logger.info("Resuming sweep %s: %d segments already completed (last update %s)",
+                    timestamp, len(checkpoint.completed), content["updated"])
+        if checkpoint.partial:
+            logger.info("Segment %s continues after %d completed trials",
+                        checkpoint.partial["segment"], checkpoint.partial["trials"])
+        return checkpoint
+
+    def is_done(self, segment: str) -> bool:
+        """Returns True if *segment* was completed before."""
+        return segment in self.completed
+
+    def partial_for(self, segment: str) -> Optional[Dict[str, Any]]:
+        """Returns the progress of *segment* if it was interrupted after some trials, else None."""
+        if self.partial and self.partial["segment"] == segment:
+            return self.partial
+        return None
+
+    def trial_done(self, segment: str, trials: int, state: Dict[str, Any],
+                   start: Optional[int] = None, session: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Records that *trials* trials of *segment* are on disk and saves the journal.
+
+        Args:
+            segment: Segment name.
+            trials: Number of trials of the segment completed so far.
+            state: State of the writer the segment is recorded with.
+            start: Bookmark of the segment start, in session mode.
+            session: Session writer state and completed segment list, in session mode.
+        """
+        with self._lock:
+            self.partial = {"segment": segment, "trials": trials, "state": state, "start": start}
+            if session is not None:
+                self.session = session
+            self._save()
+
+    def complete(self, segment: str, session: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Marks *segment* as completed and saves the journal.
+
+        Args:
+            segment: Segment name.
+            session: Session writer state and segment list, in session mode.
+        """
+        with self._lock:
+            if segment not in self.completed:
+                self.completed.append(segment)
+            self.partial = None
+            if session is not None:
+                self.session = session
+            self._save()
+
+    def finish(self) -> None:
+        """Marks the whole sweep as completed."""
+        with self._lock:
+            self.finished = True
+            self._save()
+
+    def _save(self) -> None:
+        write_json_atomic(self.path, {
+            "version": CHECKPOINT_VERSION,
+            "timestamp": self.timestamp,
+            "updated": datetime.now().isoformat(timespec="seconds"),
+            "finished": self.finished,
+            "protocol": self.protocol,
+            "completed": self.completed,
+            "session": self.session,
+            "partial": self.partial,
+        })
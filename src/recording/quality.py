@@ -0,0 +1,244 @@
+"""
+Live signal quality gate for sweep recordings.
+
+The recording loop hands every pulled chunk to a ``QualityMonitor``. A
+background thread collects the chunks into a sliding window and, once per
+window, scores all channels at once with the metrics of the real-time
+viewer (``PlotManager.update``): peak-to-peak amplitude, RMS, the fraction
+of near-constant sample steps and the line-noise ratio (power within
+±1 Hz of the mains frequency over the 1-45 Hz power, from a Welch PSD).
+Channels that stay flat or noisy for several windows in a row are reported,
+and the sweep can pause between trials until the electrodes are fixed.
+"""
+
+import logging
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Thresholds in µV, as in the real-time viewer
+DEFAULT_WINDOW_S: float = 2.0
+DEFAULT_FLAT_PTP: float = 10.0
+DEFAULT_FLAT_FRACTION: float = 0.95
+FLAT_STEP: float = 3.0
+DEFAULT_NOISY_PTP: float = 1000.0
+DEFAULT_LINE_RATIO: float = 1.0
+DEFAULT_LINE_FREQ: float = 50.0
+LINE_TOLERANCE_HZ: float = 1.0
+SIGNAL_BAND_HZ: Tuple[float, float] = (1.0, 45.0)
+# Consecutive bad windows before a channel is reported
+DEFAULT_PERSIST: int = 2
+# Pulled chunks the monitor may lag behind before it drops data
+MONITOR_QUEUE_BLOCKS: int = 64
+QUALITY_ACTIONS: Tuple[str, ...] = ("warn", "pause")
+
+STATUS_OK: str = "OK"
+STATUS_FLAT: str = "FLAT"
+STATUS_NOISY: str = "NOISY"
+STATUS_LINE: str = "LINE NOISE"
+
+
+def channel_quality(window: np.ndarray, sampling_rate: float,
+                    line_freq: float = DEFAULT_LINE_FREQ) -> Dict[str, np.ndarray]:
+    """
+    Computes per-channel quality metrics of a window in one pass.
+
+    All metrics are reductions along the sample axis, so every channel is
+    scored at once. The line-noise ratio integrates a Welch PSD (1 s
+    segments, so 1 Hz resolution) over ``line_freq ± 1 Hz`` and divides
+    by the power in the 1-45 Hz band.
+
+    Args:
+        window: Samples of shape (n_samples, n_channels), in µV.
+        sampling_rate: Sampling rate in Hz.
+        line_freq: Mains frequency in Hz.
+
+    Returns:
+        Dict of ``ptp``, ``rms``, ``flat`` (fraction of steps below 3 µV)
+        and ``line_ratio``, each of shape (n_channels,).
+    """
+    from scipy.signal import welch
+
+    window = np.asarray(window, dtype=np.float64)
+    centered = window - window.mean(axis=0)
+    freqs, psd = welch(centered, fs=sampling_rate, nperseg=min(len(window), int(sampling_rate)), axis=0)
+    line_band = np.abs(freqs - line_freq) < LINE_TOLERANCE_HZ
+    signal_band = (freqs > SIGNAL_BAND_HZ[0]) & (freqs < SIGNAL_BAND_HZ[1])
+    return {
+        "ptp": np.ptp(window, axis=0),
+        "rms": np.sqrt(np.mean(centered ** 2, axis=0)),
+        "flat": np.mean(np.abs(np.diff(window, axis=0)) < FLAT_STEP, axis=0),
+        "line_ratio": psd[line_band].sum(axis=0) / (psd[signal_band].sum(axis=0) + 1e-10),
+    }
+
+
+@dataclass
+class QualityThresholds:
+    """
+    Limits of the quality gate, from the protocol's ``Quality`` section.
+
+    Attributes:
+        flat_ptp: Peak-to-peak amplitude (µV) below which a channel is flat.
+        flat_fraction: Fraction of near-constant steps above which a channel is flat.
+        noisy_ptp: Peak-to-peak amplitude (µV) above which a channel is noisy.
+        line_ratio: Line-noise ratio above which a channel is noisy.
+        line_freq: Mains frequency in Hz.
+    """
+
+    flat_ptp: float = DEFAULT_FLAT_PTP
+    flat_fraction: float = DEFAULT_FLAT_FRACTION
+    noisy_ptp: float = DEFAULT_NOISY_PTP
+    line_ratio: float = DEFAULT_LINE_RATIO
+    line_freq: float = DEFAULT_LINE_FREQ
+
+    def classify(self, metrics: Dict[str, np.ndarray]) -> np.ndarray:
+        """Returns the status (``OK``, ``FLAT``, ``NOISY``, ``LINE NOISE``) of each channel."""
+        status = np.full(metrics["ptp"].shape, STATUS_OK, dtype=object)
+        status[metrics["line_ratio"] > self.line_ratio] = STATUS_LINE
+        status[metrics["ptp"] > self.noisy_ptp] = STATUS_NOISY
+        status[(metrics["ptp"] < self.flat_ptp) | (metrics["flat"] > self.flat_fraction)] = STATUS_FLAT
+        return status
+
+
+class QualityMonitor:
+    """
+    Scores the recorded signal on a background thread.
+
+    ``feed`` never blocks the recording loop: if the monitor falls behind,
+    chunks are dropped from the quality check (not from the recording).
+    ``bad_channels`` holds the channels that failed ``persist`` windows in a
+    row; the sweep polls it between trials.
+    """
+
+    def __init__(self, num_channels: int, sampling_rate: float, thresholds: QualityThresholds,
+                 window_s: float = DEFAULT_WINDOW_S, persist: int = DEFAULT_PERSIST,
+                 channel_names: Optional[List[str]] = None) -> None:
+        self.sampling_rate = sampling_rate
+        self.thresholds = thresholds
+        self.window_samples = max(2, int(round(window_s * sampling_rate)))
+        self.persist = persist
+        self.channel_names = channel_names or [f"ch{i + 1}" for i in range(num_channels)]
+        self.buffer = np.empty((0, num_channels))
+        self.bad_counts = np.zeros(num_channels, dtype=int)
+        self.status = np.full(num_channels, STATUS_OK, dtype=object)
+        self.last_metrics: Optional[Dict[str, np.ndarray]] = None
+        self.windows = 0
+        self.bad_windows = np.zeros(num_channels, dtype=int)
+        self.dropped_chunks = 0
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[np.ndarray]]" = queue.Queue(maxsize=MONITOR_QUEUE_BLOCKS)
+        self._thread = threading.Thread(target=self._run, name="SweepQualityMonitor", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_protocol(cls, protocol: Dict[str, Any], num_channels: int,
+                      sampling_rate: float) -> Optional["QualityMonitor"]:
+        """
+        Creates the monitor configured by the protocol's ``Quality`` section.
+
+        Args:
+            protocol: Protocol YAML content.
+            num_channels: Channels of the EEG stream.
+            sampling_rate: Nominal sampling rate of the EEG stream.
+
+        Returns:
+            The started monitor, or None if ``Quality: Enabled`` is not set.
+        """
+        cfg = protocol.get("Quality") or {}
+        if not cfg.get("Enabled", False):
+            return None
+        thresholds = QualityThresholds(
+            flat_ptp=float(cfg.get("Flat_PTP", DEFAULT_FLAT_PTP)),
+            flat_fraction=float(cfg.get("Flat_Fraction", DEFAULT_FLAT_FRACTION)),
+            noisy_ptp=float(cfg.get("Noisy_PTP", DEFAULT_NOISY_PTP)),
+            line_ratio=float(cfg.get("Line_Ratio", DEFAULT_LINE_RATIO)),
+            line_freq=float(cfg.get("Line_Freq", DEFAULT_LINE_FREQ)),
+        )
+        return cls(num_channels, sampling_rate, thresholds,
+                   window_s=float(cfg.get("Window", DEFAULT_WINDOW_S)),
+                   persist=int(cfg.get("Persist", DEFAULT_PERSIST)),
+                   channel_names=cfg.get("Channels"))
+
+    def feed(self, samples: np.ndarray) -> None:
+        """Queues a pulled chunk of shape (n_samples, n_channels) for checking."""
+        if len(samples) == 0:
+            return
+        try:
+            self._queue.put_nowait(samples)
+        except queue.Full:
+            self.dropped_chunks += 1
+
+    def bad_channels(self) -> Dict[str, str]:
+        """Returns ``{channel name: status}`` of the channels that are currently reported."""
+        with self._lock:
+            bad = np.flatnonzero(self.bad_counts >= self.persist)
+            return {self.channel_names[i]: self.status[i] for i in bad}
+
+    def describe(self, channels: Dict[str, str]) -> str:
+        """Formats reported channels with their PTP, RMS and line-noise ratio."""
+        with self._lock:
+            metrics = self.last_metrics
+        parts = []
+        for name, status in channels.items():
+            i = self.channel_names.index(name)
+            parts.append(f"{name} {status} (PTP {metrics['ptp'][i]:.1f} µV, RMS {metrics['rms'][i]:.1f} µV, "
+                         f"LNR {metrics['line_ratio'][i]:.2f})")
+        return ", ".join(parts)
+
+    def reset(self) -> None:
+        """Forgets past windows, e.g. after electrodes were fixed during a pause."""
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        with self._lock:
+            self.buffer = self.buffer[:0]
+            self.bad_counts[:] = 0
+            self.status[:] = STATUS_OK
+
+    def close(self) -> None:
+        """Stops the thread and logs how often each channel failed."""
+        self._queue.put(None)
+        self._thread.join()
+        if self.windows:
+            failed = {name: f"{100 * n / self.windows:.0f}%"
+                      for name, n in zip(self.channel_names, self.bad_windows) if n}
+            logger.info("Quality: %d windows checked; failed windows per channel: %s",
+                        self.windows, failed or "none")
+        if self.dropped_chunks:
+            logger.warning("Quality monitor fell behind and skipped %d chunks.", self.dropped_chunks)
+
+    def _run(self) -> None:
+        while (samples := self._queue.get()) is not None:
+            with self._lock:
+                self.buffer = np.concatenate([self.buffer, samples])
+                if len(self.buffer) < self.window_samples:
+                    continue
+                window = self.buffer[-self.window_samples:]
+                self.buffer = self.buffer[:0]
+            self._check(window)
+
+    def _check(self, window: np.ndarray) -> None:
+        metrics = channel_quality(window, self.sampling_rate, self.thresholds.line_freq)
+        status = self.thresholds.classify(metrics)
+        bad = status != STATUS_OK
+        with self._lock:
+            was_reported = self.bad_counts >= self.persist
+            self.bad_counts = np.where(bad, self.bad_counts + 1, 0)
+            self.status = status
+            self.last_metrics = metrics
+            self.windows += 1
+            self.bad_windows += bad
+            reported = self.bad_counts >= self.persist
+        newly_bad = np.flatnonzero(reported & ~was_reported)
+        recovered = np.flatnonzero(was_reported & ~reported)
+        if len(newly_bad):
+            logger.warning("Quality: %s", self.describe({self.channel_names[i]: status[i] for i in newly_bad}))
+        if len(recovered):
+            logger.info("Quality: %s back to OK", ", ".join(self.channel_names[i] for i in recovered))
@@ -0,0 +1,248 @@
+"""
+Absolute-deadline scheduling for the sweep protocol.
+
+The sweep is planned up front as a flat list of phases with start and end
+offsets from the sweep start. Phases are then run against those fixed
+deadlines on a monotonic clock, so a late phase shortens itself instead of
+pushing every later stimulus back: session length and inter-stimulus
+intervals stay exact however long the sweep runs.
+
+Two sequencing modes exist: the classic blocked sweep (one cell per
+channel/frequency/volume, legacy markers 0/1/11) and an interleaved mode
+that alternates FOT and IFNFN trials on two tactors within one cell, with
+the condition-aware markers 100/101/111 and 200/201/211.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RANDOM_SEED: int = 42
+MILLISECONDS_PER_SECOND: float = 1e3
+# Below this remaining time, wait() spins instead of sleeping
+SPIN_THRESHOLD_S: float = 0.002
+DEFAULT_BASELINE_3_S: float = 10.0
+
+MARKER_PRE_SWEEP: int = 333
+MARKER_REST: int = 0
+MARKER_STIM_ON: int = 1
+MARKER_STIM_OFF: int = 11
+# (rest, stim on, stim off) markers per condition, as read by tfr_contrast
+CONDITION_MARKERS: Dict[str, Tuple[int, int, int]] = {
+    "FOT": (100, 101, 111),
+    "IFNFN": (200, 201, 211),
+}
+TRIAL_ORDERS: Tuple[str, ...] = ("random", "alternate", "counterbalanced")
+
+
+@dataclass(frozen=True)
+class SweepPhase:
+    """
+    One scheduled phase of the sweep.
+
+    Attributes:
+        segment: Name of the recording segment (file) the phase belongs to.
+        cell: (channel, frequency, volume) the VHP must be set to during the phase.
+        marker: Marker written at the phase start.
+        start: Planned start, seconds after the sweep start.
+        end: Planned end, seconds after the sweep start.
+        stim: True to switch the VHP on at the start, False to switch it
+            off, None to leave it.
+        ends_trial: True for the last phase of a trial (progress step).
+    """
+
+    segment: str
+    cell: Tuple[int, int, int]
+    marker: int
+    start: float
+    end: float
+    stim: Optional[bool] = None
+    ends_trial: bool = False
+
+
+def sweep_cells(protocol: Dict[str, Any]) -> List[Tuple[int, int, int]]:
+    """
+    Lists the (channel, frequency, volume) cells of a protocol in sweep order.
+
+    Args:
+        protocol: Protocol YAML content.
+
+    Returns:
+        Cells, channel outermost and volume innermost.
+    """
+    def values(section: str) -> range:
+        cfg = protocol[section]
+        # Ensure step is at least 1 to avoid infinite loops/division by zero
+        return range(cfg["Start"], cfg["End"] + 1, max(1, cfg["Steps"]))
+
+    return [(ch, freq, vol) for ch in values("Channel")
+            for freq in values("Frequency") for vol in values("Volume")]
+
+
+def trial_conditions(num_per_condition: int, order: str, seed: int = RANDOM_SEED) -> List[str]:
+    """
+    Orders the FOT and IFNFN trials of an interleaved cell.
+
+    Args:
+        num_per_condition: Trials per condition.
+        order: ``random`` (balanced shuffle), ``alternate`` (FOT, IFNFN,
+            FOT, ...) or ``counterbalanced`` (FOT, IFNFN, IFNFN, FOT, ...).
+        seed: Seed of the shuffle, so every session gets the same order.
+
+    Returns:
+        Condition name per trial, ``2 * num_per_condition`` long.
+
+    Raises:
+        ValueError: If *order* is unknown.
+    """
+    if order == "random":
+        conditions = ["FOT"] * num_per_condition + ["IFNFN"] * num_per_condition
+        return [conditions[i] for i in np.random.default_rng(seed).permutation(len(conditions))]
+    if order == "alternate":
+        return ["FOT", "IFNFN"] * num_per_condition
+    if order == "counterbalanced":
+        return [c for i in range(num_per_condition)
+                for c in (("FOT", "IFNFN") if i % 2 == 0 else ("IFNFN", "FOT"))]
+    raise ValueError(f"Unknown trial order '{order}'; use one of {TRIAL_ORDERS}.")
+
+
+def _append_trial(phases: List[SweepPhase], segment: str, cell: Tuple[int, int, int],
+                  markers: Tuple[int, int, int], t: float, off_s: float, on_s: float) -> float:
+    """Appends rest, stimulation and post-stimulation phases; returns the trial end."""
+    rest, stim_on, stim_off = markers
+    phases.append(SweepPhase(segment, cell, rest, t, t + off_s))
+    phases.append(SweepPhase(segment, cell, stim_on, t + off_s, t + off_s + on_s, stim=True))
+    phases.append(SweepPhase(segment, cell, stim_off, t + off_s + on_s, t + 2 * off_s + on_s,
+                             stim=False, ends_trial=True))
+    return t + 2 * off_s + on_s
+
+
+def build_sweep_schedule(protocol: Dict[str, Any]) -> List[SweepPhase]:
+    """
+    Plans every phase of the sweep with absolute offsets.
+
+    Blocked mode: each channel/frequency/volume cell is an optional
+    Baseline 3 (333) followed by ``Number`` trials of rest (0), stimulation
+    (1) and post-stimulation rest (11).
+
+    Interleaved mode (``Interleaved`` section in the protocol): each
+    frequency/volume cell holds ``Number`` trials per condition in the
+    configured order. FOT trials stimulate ``FOT_Channel`` and IFNFN trials
+    ``IFNFN_Channel``; the markers are 100/101/111 and 200/201/211.
+
+    Args:
+        protocol: Protocol YAML content.
+
+    Returns:
+        Phases in execution order.
+    """
+    measurements = protocol["Measurements"]
+    off_s, on_s = float(measurements["Duration_off"]), float(measurements["Duration_on"])
+    b3_s = float(protocol.get("Baselines", {}).get("Baseline_3", DEFAULT_BASELINE_3_S))
+    interleaved = protocol.get("Interleaved")
+
+    phases: List[SweepPhase] = []
+    t = 0.0
+    if not interleaved:
+        for cell in sweep_cells(protocol):
+            ch, freq, vol = cell
+            segment = f"c{ch}_f{freq}_v{vol}"
+            if b3_s > 0:
+                phases.append(SweepPhase(segment, cell, MARKER_PRE_SWEEP, t, t + b3_s))
+                t += b3_s
+            for _ in range(measurements["Number"]):
+                t = _append_trial(phases, segment, cell, (MARKER_REST, MARKER_STIM_ON, MARKER_STIM_OFF),
+                                  t, off_s, on_s)
+        return phases
+
+    channels = {"FOT": interleaved["FOT_Channel"], "IFNFN": interleaved["IFNFN_Channel"]}
+    conditions = trial_conditions(measurements["Number"], interleaved.get("Order", "random"))
+    # Frequency/volume cells in sweep order; the Channel section is not used
+    freq_vol = dict.fromkeys((freq, vol) for _, freq, vol in sweep_cells(protocol))
+    for freq, vol in freq_vol:
+        segment = f"fot{channels['FOT']}_ifnfn{channels['IFNFN']}_f{freq}_v{vol}"
+        if b3_s > 0:
+            phases.append(SweepPhase(segment, (channels[conditions[0]], freq, vol),
+                                     MARKER_PRE_SWEEP, t, t + b3_s))
+            t += b3_s
+        for condition in conditions:
+            t = _append_trial(phases, segment, (channels[condition], freq, vol),
+                              CONDITION_MARKERS[condition], t, off_s, on_s)
+    return phases
+
+
+class DeadlineScheduler:
+    """
+    Runs phases against deadlines fixed relative to one start time.
+
+    All times come from ``time.perf_counter`` (monotonic). The scheduler
+    also keeps planned vs. actual start times of every event and logs them.
+    """
+
+    def __init__(self) -> None:
+        self.t0: float = 0.0
+        self.origin: float = 0.0
+        self.paused: float = 0.0
+        self.lateness: List[float] = []
+
+    def start(self, origin: float = 0.0) -> float:
+        """
+        Fixes the start time; returns it.
+
+        Args:
+            origin: Schedule offset that begins now. A resumed sweep starts
+                at the first phase not yet recorded instead of at 0.
+        """
+        self.origin = origin
+        self.t0 = time.perf_counter() - origin
+        self.paused = 0.0
+        self.lateness = []
+        return self.t0
+
+    def shift(self, seconds: float) -> None:
+        """Moves all remaining deadlines *seconds* later, e.g. after an operator pause."""
+        self.t0 += seconds
+        self.paused += seconds
+
+    def deadline(self, offset: float) -> float:
+        """Returns the absolute ``perf_counter`` time of *offset* seconds after start."""
+        return self.t0 + offset
+
+    def wait(self, deadline: float) -> None:
+        """Sleeps until *deadline*, spinning for the last few milliseconds."""
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return
+            if remaining > SPIN_THRESHOLD_S:
+                time.sleep(remaining - SPIN_THRESHOLD_S)
+
+    def log_event(self, label: str, planned: float, actual: float) -> None:
+        """
+        Logs planned and actual time of an event, relative to the start.
+
+        Args:
+            label: Event description.
+            planned: Planned offset in seconds.
+            actual: Actual ``perf_counter`` time of the event.
+        """
+        actual_offset = actual - self.t0
+        late = actual_offset - planned
+        self.lateness.append(late)
+        logger.info("Event %s: planned +%.3f s, actual +%.3f s (%+.1f ms)",
+                    label, planned, actual_offset, late * MILLISECONDS_PER_SECOND)
+
+    def log_summary(self, planned_total: float) -> None:
+        """Logs event lateness statistics and planned vs. actual total length (from the origin)."""
+        if not self.lateness:
+            return
+        late_ms = np.asarray(self.lateness) * MILLISECONDS_PER_SECOND
+        logger.info("Schedule: %d events, lateness mean %.1f ms, max %.1f ms; "
+                    "length planned %.1f s, actual %.1f s (+%.1f s paused)", len(late_ms), late_ms.mean(),
+                    late_ms.max(), planned_total - self.origin,
+                    time.perf_counter() - self.t0 - self.origin, self.paused)
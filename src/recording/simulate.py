@@ -0,0 +1,287 @@
+"""
+Dry run of the sweep protocol with a timing model.
+
+``simulate_sweep`` runs the unmodified ``EEGSweep.run_sweep`` against a
+synthetic LSL inlet and a VHP stand-in, in a temporary data directory, and
+reports the predicted timeline and total duration of a protocol.
+
+Time is virtual: the clock is the real ``perf_counter`` plus all time the
+sweep would have spent sleeping or blocked on I/O, which is skipped. A
+one-hour protocol is therefore simulated in seconds, while the real CPU
+time of the sweep engine (scheduling, pulling, marker placement, writing)
+still advances the clock. The wall time of the simulation and the phase
+lateness it reports are the regression benchmark for engine overhead.
+
+Timing model (``SimulationTiming``): opening the VHP serial port costs
+``connect_s`` (the firmware boot the ping handshake waits for), every
+serial command ``command_s``, and every operator prompt ``prompt_s``. EEG
+data arrives in the LSL server's 10 ms chunks at the nominal rate.
+Recordings are written on the sweep thread, so the reported lateness is an
+upper bound of what the background writer achieves on real hardware.
+"""
+
+import logging
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Tuple
+from unittest import mock
+
+import numpy as np
+
+from src.recording import scheduler as scheduler_mod
+from src.recording import sweep as sweep_mod
+from src.recording.scheduler import RANDOM_SEED, DeadlineScheduler
+from src.recording.sweep import (
+    MILLISECONDS_PER_SECOND,
+    PULL_MAX_SAMPLES,
+    EEGSweep,
+    PendingCommand,
+    SerialCommunicator,
+    format_time_hms,
+)
+from src.recording.writers import RecordWriter
+from src.utils.config import EEGConfig
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONNECT_S: float = 2.0
+DEFAULT_COMMAND_S: float = 0.05
+DEFAULT_PROMPT_S: float = 0.0
+SIM_CHANNELS: int = 8
+SIM_SAMPLING_RATE: float = 250.0
+# LSLserver pushes a chunk every POLL_INTERVAL_S
+SIM_CHUNK_INTERVAL_S: float = 0.01
+SIM_AMPLITUDE_UV: float = 20.0
+
+
+@dataclass
+class SimulationTiming:
+    """
+    Costs the simulation charges to the virtual clock.
+
+    Attributes:
+        connect_s: Seconds to open the VHP serial port until it is ready.
+        command_s: Seconds per serial command.
+        prompt_s: Seconds the operator needs per prompt.
+    """
+
+    connect_s: float = DEFAULT_CONNECT_S
+    command_s: float = DEFAULT_COMMAND_S
+    prompt_s: float = DEFAULT_PROMPT_S
+
+
+class SimClock:
+    """Real ``perf_counter`` plus skipped sleeps; stands in for ``time`` and ``local_clock``."""
+
+    def __init__(self) -> None:
+        self.skipped = 0.0
+
+    def perf_counter(self) -> float:
+        return time.perf_counter() + self.skipped
+
+    def sleep(self, seconds: float) -> None:
+        self.skipped += max(0.0, seconds)
+
+    def time(self) -> float:
+        return time.time() + self.skipped
+
+
+class SimulatedInlet:
+    """
+    LSL inlet replaying Gaussian noise in 10 ms chunks on the virtual clock.
+
+    Implements the parts of ``pylsl.StreamInlet`` the sweep uses, with
+    pylsl's signatures and return types: lists, or ``None`` samples when
+    pulling into ``dest_obj``.
+    """
+
+    def __init__(self, clock: SimClock, num_channels: int, sampling_rate: float) -> None:
+        self.clock = clock
+        self.num_channels = num_channels
+        self.sampling_rate = sampling_rate
+        self.origin = clock.perf_counter()
+        self.delivered = 0
+        self.rng = np.random.default_rng(RANDOM_SEED)
+
+    def available(self) -> int:
+        """Returns the number of samples pushed so far by the simulated server."""
+        chunks = np.floor((self.clock.perf_counter() - self.origin) / SIM_CHUNK_INTERVAL_S)
+        return int(chunks * SIM_CHUNK_INTERVAL_S * self.sampling_rate)
+
+    def pull_chunk(self, timeout: float = 0.0, max_samples: int = 1024,
+                   dest_obj: Any = None) -> Tuple[Optional[List[List[float]]], List[float]]:
+        if self.available() <= self.delivered and timeout > 0:
+            # Block until the next chunk, but not past the timeout
+            self.clock.sleep(min(timeout, SIM_CHUNK_INTERVAL_S))
+        n = min(self.available() - self.delivered, max_samples)
+        timestamps = self.origin + (self.delivered + np.arange(n)) / self.sampling_rate
+        samples = self.rng.normal(0.0, SIM_AMPLITUDE_UV, (n, self.num_channels)).astype(np.float32)
+        self.delivered += n
+        if dest_obj is not None:
+            np.frombuffer(dest_obj, dtype=np.float32)[:samples.size] = samples.ravel()
+            return None, timestamps.tolist()
+        return samples.tolist(), timestamps.tolist()
+
+    def time_correction(self, timeout: float = 0.0) -> float:
+        return 0.0
+
+
+class SimulatedMarkerOutlet:
+    """Collects the markers the sweep publishes."""
+
+    def __init__(self) -> None:
+        self.markers: List[Tuple[float, str]] = []
+
+    def push_sample(self, sample: List[str], timestamp: float) -> None:
+        self.markers.append((timestamp, sample[0]))
+
+
+class SimulatedVHP(SerialCommunicator):
+    """
+    VHP stand-in: the real command methods, with the serial write replaced
+    by a fixed cost on the virtual clock.
+    """
+
+    def __init__(self, port: str, clock: SimClock, timing: SimulationTiming) -> None:
+        self.port = port
+        self.clock = clock
+        self.timing = timing
+        self.connected = True
+        self.commands = 0
+        clock.sleep(timing.connect_s)
+
+    def send_commands(self, cmds: List[str]) -> List[PendingCommand]:
+        sent = self.clock.perf_counter()
+        self.clock.sleep(self.timing.command_s * len(cmds))
+        self.commands += len(cmds)
+        commands = [PendingCommand(cmd, sent, response=cmd) for cmd in cmds]
+        for command in commands:
+            command.done.set()
+        return commands
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    def close(self) -> None:
+        self.connected = False
+
+
+class SimulatedSweep(EEGSweep):
+    """``EEGSweep`` on simulated devices that keeps a timeline of what it does."""
+
+    def __init__(self, config: EEGConfig, clock: SimClock, timing: SimulationTiming) -> None:
+        super().__init__(config)
+        # A writer thread cannot keep up with virtual time; write inline so the
+        # serialization cost is charged to the clock instead
+        self.queue_blocks = 0
+        self.clock = clock
+        self.timing = timing
+        self.origin = clock.perf_counter()
+        # (virtual offset, duration, description)
+        self.timeline: List[Tuple[float, float, str]] = []
+        self.vhps: List[SimulatedVHP] = []
+        self.schedulers: List[DeadlineScheduler] = []
+
+    def offset(self) -> float:
+        """Returns the virtual seconds since the simulation started."""
+        return self.clock.perf_counter() - self.origin
+
+    def connect_lsl(self) -> None:
+        self.inlet = SimulatedInlet(self.clock, SIM_CHANNELS, SIM_SAMPLING_RATE)
+        self.num_channels = SIM_CHANNELS
+        self.sampling_rate = SIM_SAMPLING_RATE
+        # The simulated server streams float32, like LSLserver
+        self.pull_buffer = np.empty((PULL_MAX_SAMPLES, SIM_CHANNELS), dtype=np.float32)
+        self.marker_outlet = SimulatedMarkerOutlet()
+
+    def open_vhp(self, port: str, silent: bool = False) -> SimulatedVHP:
+        """Replaces ``SerialCommunicator`` for ``connect_vhp``."""
+        start = self.offset()
+        vhp = SimulatedVHP(port, self.clock, self.timing)
+        self.vhps.append(vhp)
+        self.timeline.append((start, self.offset() - start, f"VHP connect on {port}"))
+        return vhp
+
+    def prompt(self, prompt: str) -> None:
+        """Replaces ``wait_for_space``: the operator answers after ``prompt_s``."""
+        start = self.offset()
+        self.clock.sleep(self.timing.prompt_s)
+        self.timeline.append((start, self.timing.prompt_s, f"prompt: {prompt.strip().splitlines()[0]}"))
+
+    def new_scheduler(self) -> DeadlineScheduler:
+        """Replaces ``DeadlineScheduler`` so the lateness of each run can be reported."""
+        scheduler = DeadlineScheduler()
+        self.schedulers.append(scheduler)
+        return scheduler
+
+    @contextmanager
+    def segment(self, name: str, **params: Any) -> Iterator[RecordWriter]:
+        start = self.offset()
+        first_marker = len(self.marker_outlet.markers)
+        with super().segment(name, **params) as writer:
+            yield writer
+        markers = [code for _, code in self.marker_outlet.markers[first_marker:]]
+        self.timeline.append((start, self.offset() - start,
+                              f"segment {name}: {len(markers)} markers ({', '.join(dict.fromkeys(markers))})"))
+
+
+def simulate_sweep(config: EEGConfig, timing: Optional[SimulationTiming] = None) -> float:
+    """
+    Runs the sweep protocol on simulated devices and logs the predicted timeline.
+
+    Args:
+        config: Hardware and protocol configuration; a VHP is simulated if
+            the hardware configuration names a serial port.
+        timing: Timing model; defaults to ``SimulationTiming()``.
+
+    Returns:
+        Predicted protocol duration in seconds.
+    """
+    timing = timing or SimulationTiming()
+    clock = SimClock()
+    wall_start = time.perf_counter()
+    recording_logger = logging.getLogger("src.recording")
+    with ExitStack() as stack:
+        data_dir = Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="sweep_sim_")))
+        stack.enter_context(mock.patch.object(sweep_mod, "RAW_DATA_DIR", data_dir))
+        sweep = SimulatedSweep(config, clock, timing)
+        for module in (sweep_mod, scheduler_mod):
+            stack.enter_context(mock.patch.object(module, "time", clock))
+        stack.enter_context(mock.patch("pylsl.local_clock", clock.perf_counter))
+        stack.enter_context(mock.patch.object(sweep_mod, "wait_for_space", sweep.prompt))
+        stack.enter_context(mock.patch.object(sweep_mod, "SerialCommunicator", sweep.open_vhp))
+        stack.enter_context(mock.patch.object(sweep_mod, "DeadlineScheduler", sweep.new_scheduler))
+        # Per-phase sweep logging would drown the report
+        level = recording_logger.level
+        recording_logger.setLevel(logging.WARNING)
+        try:
+            sweep.connect_lsl()
+            sweep.connect_vhp(silent=True)
+            sweep.run_sweep()
+        finally:
+            recording_logger.setLevel(level)
+        total = sweep.offset()
+    wall = time.perf_counter() - wall_start
+
+    print()
+    logger.info("Simulated sweep timeline:")
+    for start, duration, description in sweep.timeline:
+        logger.info("  +%-9s %8.2f s  %s", format_time_hms(start), duration, description)
+    commands = sum(vhp.commands for vhp in sweep.vhps)
+    recorded = sum(duration for _, duration, description in sweep.timeline if description.startswith("segment"))
+    logger.info("Predicted duration: %s (%.1f s): recording %.1f s, VHP connect %.1f s, "
+                "%d serial commands %.1f s, prompts %.1f s",
+                format_time_hms(total), total, recorded, len(sweep.vhps) * timing.connect_s,
+                commands, commands * timing.command_s,
+                sum(1 for *_, d in sweep.timeline if d.startswith("prompt")) * timing.prompt_s)
+    lateness = np.concatenate([np.asarray(s.lateness) for s in sweep.schedulers]) \
+        if sweep.schedulers else np.empty(0)
+    if len(lateness):
+        logger.info("Engine overhead: phase lateness mean %.2f ms, max %.2f ms over %d events",
+                    lateness.mean() * MILLISECONDS_PER_SECOND, lateness.max() * MILLISECONDS_PER_SECOND,
+                    len(lateness))
+    logger.info("Simulated %.1f s of protocol in %.2f s wall time (%.0fx)", total, wall, total / wall)
+    return total
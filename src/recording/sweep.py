@@ -1,21 +1,44 @@
 import logging
+import threading
 import time
-import csv
 import sys
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
+from itertools import groupby
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Deque, Iterator, List, Optional, Tuple
 
 # Heavy imports moved inside classes to prevent hanging on startup
 # from pylsl import StreamInlet, resolve_stream
 
+import numpy as np
+
 from src.utils.paths import RAW_DATA_DIR, DATA_DIR
 from src.utils.config import EEGConfig
+from src.recording.quality import QUALITY_ACTIONS, QualityMonitor
+from src.recording.checkpoint import SweepCheckpoint, checkpoint_path
+from src.recording.scheduler import RANDOM_SEED, DeadlineScheduler, build_sweep_schedule
+from src.recording.writers import (
+    DEFAULT_QUEUE_BLOCKS,
+    DEFAULT_RECORD_FORMAT,
+    RecordWriter,
+    open_record_writer,
+    record_path,
+    sync_record,
+    write_session_index,
+)
 
 logger = logging.getLogger(__name__)
 
-RANDOM_SEED: int = 42
 PROGRESS_BAR_LENGTH: int = 30
+MARKER_STREAM_SUFFIX: str = "_SweepMarkers"
+MARKER_CLOCK_TIMEOUT_S: float = 2.0
+MILLISECONDS_PER_SECOND: float = 1e3
+PULL_TIMEOUT_S: float = 0.1
+# pylsl's default max_samples per pull_chunk
+PULL_MAX_SAMPLES: int = 1024
 
 def format_time_hms(seconds: float) -> str:
     """Converts seconds into human-readable format."""
@@ -43,11 +66,35 @@ def wait_for_space(prompt: str) -> None:
             
     input()
 
+@dataclass
+class PendingCommand:
+    """A VHP command waiting for its response line."""
+
+    cmd: str
+    sent: float
+    response: Optional[str] = None
+    done: threading.Event = field(default_factory=threading.Event)
+
+
 class SerialCommunicator:
-    """Handles serial communication with the VHP device."""
+    """
+    Handles serial communication with the VHP device.
+
+    Commands are written without waiting; a reader thread matches each
+    response to the oldest pending command it answers and logs them.
+    """
     
     BAUDRATE: int = 115200
     TIMEOUT: float = 0.1
+    # Upper bound for the firmware to answer after the port opens; this is
+    # the old fixed 2 s + 1 s settle time, now only paid by silent devices.
+    READY_TIMEOUT: float = 3.0
+    PING_CMD: str = "L"
+    PING_INTERVAL: float = 0.05
+    # Single-character commands the firmware echoes without a newline
+    BARE_ACKS: Tuple[str, ...] = ("1", "0", "T", "L")
+    # Longest a command may wait for its response before it counts as unanswered
+    RESPONSE_TIMEOUT: float = 0.5
 
     def __init__(self, port: str, silent: bool = False) -> None:
         import serial
@@ -58,35 +105,173 @@ class SerialCommunicator:
                 self.ser.open()
             if not silent:
                 print(f"DEBUG: Serial port {port} opened successfully.")
-            time.sleep(2)
+            self.wait_until_ready()
+            self.discard_input()
+            self.start_reader()
         except serial.SerialException as e:
             if not silent:
                 logger.error("Could not open serial port %s: %s", port, e)
             raise
 
-    def send_command(self, cmd: str, wait_for_resp: bool = True) -> None:
+    def wait_until_ready(self) -> float:
+        """
+        Pings the firmware until it echoes, instead of sleeping a fixed time.
+
+        The VHP firmware answers the ``L`` command with ``L``. Boards that
+        reset on port open answer once booted; others answer immediately.
+        If nothing answers within ``READY_TIMEOUT`` we continue as before.
+
+        Returns:
+            Seconds spent waiting.
+        """
+        start = time.perf_counter()
+        deadline = start + self.READY_TIMEOUT
+        while time.perf_counter() < deadline:
+            self.ser.write(f"{self.PING_CMD}\n".encode("utf-8"))
+            self.ser.flush()
+            time.sleep(self.PING_INTERVAL)
+            if self.ser.in_waiting and self.PING_CMD in self.ser.read_all().decode("utf-8", "ignore"):
+                waited = time.perf_counter() - start
+                logger.debug("VHP on %s ready after %.2f s", self.port, waited)
+                return waited
+        logger.debug("VHP on %s did not answer ping within %.1f s", self.port, self.READY_TIMEOUT)
+        return self.READY_TIMEOUT
+
+    def discard_input(self) -> None:
+        """
+        Drops echoes of readiness pings that are still in flight.
+
+        The firmware answers ``L`` without a newline, so a late echo would
+        otherwise be glued to the first real response.
+        """
+        time.sleep(self.PING_INTERVAL)
+        self.ser.reset_input_buffer()
+
+    def start_reader(self) -> None:
+        """Starts the thread that reads, matches and logs device responses."""
+        self.pending: Deque[PendingCommand] = deque()
+        self.pending_lock = threading.Lock()
+        self.reader_stop = threading.Event()
+        self.reader = threading.Thread(target=self._read_responses, name=f"vhp-{self.port}", daemon=True)
+        self.reader.start()
+
+    def _read_responses(self) -> None:
+        """
+        Reader thread: splits incoming bytes into responses and hands each
+        one to the command it answers.
+
+        The firmware acknowledges the single-character commands ``1``, ``0``,
+        ``T`` and ``L`` by echoing the bare character, without a newline;
+        all other commands are answered with a line. A command that gets no
+        answer within ``RESPONSE_TIMEOUT`` is logged as unanswered and
+        dropped. All logging happens here, off the thread that times the
+        protocol.
+        """
+        buffer = b""
+        while not self.reader_stop.is_set():
+            try:
+                chunk = self.ser.read(self.ser.in_waiting or 1)
+            except Exception as e:
+                if not self.reader_stop.is_set():
+                    logger.error("VHP reader on %s stopped: %s", self.port, e)
+                return
+            now = time.perf_counter()
+            buffer += chunk
+            while buffer:
+                buffer = buffer.lstrip(b"\r\n")
+                if buffer[:1] and buffer[:1].decode("utf-8", "ignore") in self.BARE_ACKS:
+                    response, buffer = buffer[:1], buffer[1:]
+                elif b"\n" in buffer:
+                    response, buffer = buffer.split(b"\n", 1)
+                else:
+                    break
+                response_text = response.decode("utf-8", "ignore").strip()
+                if response_text:
+                    self._match_response(response_text, now)
+            self._expire_pending(now)
+
+    def _answers(self, cmd: str, response: str) -> bool:
+        """Returns True if *response* is the kind of reply the firmware sends to *cmd*."""
+        if cmd in self.BARE_ACKS:
+            return response == cmd
+        return response not in self.BARE_ACKS
+
+    def _match_response(self, response: str, now: float) -> None:
+        """Completes the oldest pending command that *response* answers."""
+        with self.pending_lock:
+            command = next((c for c in self.pending if self._answers(c.cmd, response)), None)
+            if command is not None:
+                self.pending.remove(command)
+        if command is None:
+            logger.info("VHP: %s", response)
+            return
+        command.response = response
+        command.done.set()
+        logger.info("VHP CMD: %s -> %s (%.1f ms)", command.cmd, response,
+                    (now - command.sent) * MILLISECONDS_PER_SECOND)
+
+    def _expire_pending(self, now: float) -> None:
+        """Drops commands that waited longer than ``RESPONSE_TIMEOUT``."""
+        with self.pending_lock:
+            while self.pending and now - self.pending[0].sent > self.RESPONSE_TIMEOUT:
+                command = self.pending.popleft()
+                command.done.set()
+                logger.info("VHP CMD: %s (no response)", command.cmd)
+
+    def send_commands(self, cmds: List[str]) -> List["PendingCommand"]:
+        """
+        Writes several commands in one serial write without waiting.
+
+        Args:
+            cmds: Command strings, without newline.
+
+        Returns:
+            One PendingCommand per command; its ``done`` event is set when the
+            response arrived or timed out.
+        """
+        now = time.perf_counter()
+        commands = [PendingCommand(cmd, now) for cmd in cmds]
+        with self.pending_lock:
+            self.pending.extend(commands)
+        self.ser.write("".join(f"{cmd}\n" for cmd in cmds).encode("utf-8"))
+        self.ser.flush()
+        return commands
+
+    def send_command(self, cmd: str, wait_for_resp: bool = True) -> Optional[str]:
         """
         Sends a command to the serial device.
+
+        The response is matched and logged by the reader thread either way.
         
         Args:
             cmd: The command string to send.
-            wait_for_resp: If True, waits 50ms to read and log the device response.
+            wait_for_resp: If True, blocks until the response arrives (at most
+                ``RESPONSE_TIMEOUT``) and returns it; if False, returns as soon
+                as the command is written.
+
+        Returns:
+            The device response if waited for and received, else None.
         """
-        full_cmd = f"{cmd}\n"
-        self.ser.write(full_cmd.encode("utf-8"))
-        self.ser.flush()
-        
+        command = self.send_commands([cmd])[0]
         if not wait_for_resp:
-            logger.info("VHP CMD: %s", cmd)
-            return
+            return None
+        command.done.wait(self.RESPONSE_TIMEOUT)
+        return command.response
 
-        # Small delay for the device to process response
-        time.sleep(0.05)
-        if self.ser.in_waiting:
-            resp = self.ser.read_all().decode("utf-8").strip()
-            logger.info("VHP CMD: %s -> %s", cmd, resp)
-        else:
-            logger.info("VHP CMD: %s", cmd)
+    def configure(self, channel: Optional[int] = None, frequency: Optional[int] = None,
+                  volume: Optional[int] = None) -> None:
+        """
+        Sets channel, frequency and volume in one batched write.
+
+        Args:
+            channel: Tactor channel (``C``), if it should change.
+            frequency: Stimulation frequency (``F``), if it should change.
+            volume: Volume (``V``), if it should change.
+        """
+        cmds = [f"{prefix}{value}" for prefix, value in
+                (("C", channel), ("F", frequency), ("V", volume)) if value is not None]
+        if cmds:
+            self.send_commands(cmds)
 
     def is_connected(self) -> bool:
         """Checks if the device is responsive."""
@@ -104,39 +289,91 @@ class SerialCommunicator:
     def set_frequency(self, frequency: int) -> None:
         self.send_command(f"F{frequency}")
 
-    def start_stream(self) -> None:
+    def timed_command(self, cmd: str) -> float:
+        """
+        Sends *cmd* without waiting for a response and returns when it was sent.
+
+        Args:
+            cmd: The command string to send.
+
+        Returns:
+            LSL ``local_clock()`` time halfway through the serial write.
+        """
+        from pylsl import local_clock
+        before = local_clock()
+        self.send_command(cmd, wait_for_resp=False)
+        return (before + local_clock()) / 2
+
+    def start_stream(self) -> float:
         # Immediate return for timing precision
-        self.send_command("1", wait_for_resp=False)
+        return self.timed_command("1")
 
-    def stop_stream(self) -> None:
+    def stop_stream(self) -> float:
         # Immediate return for timing precision
-        self.send_command("0", wait_for_resp=False)
+        return self.timed_command("0")
 
     def set_test_mode(self, enabled: bool) -> None:
         self.send_command(f"M{1 if enabled else 0}")
 
     def close(self) -> None:
+        if hasattr(self, "reader"):
+            self.reader_stop.set()
+            self.reader.join(timeout=1.0)
         if hasattr(self, "ser") and self.ser.is_open:
             self.ser.close()
 
 class EEGSweep:
     """Performs EEG measurements following the sweep protocol."""
 
-    def __init__(self, config: EEGConfig) -> None:
+    def __init__(self, config: EEGConfig, resume: Optional[str] = None) -> None:
+        """
+        Args:
+            config: Hardware and protocol configuration.
+            resume: Timestamp of an interrupted sweep to continue; its
+                completed segments are skipped.
+        """
         self.config = config
         self.inlet = None
         self.vhp: Optional[SerialCommunicator] = None
-        self.timestamp: str = datetime.now().strftime("%y%m%d-%H%M")
+        self.timestamp: str = resume or datetime.now().strftime("%y%m%d-%H%M")
+        if resume:
+            self.checkpoint = SweepCheckpoint.load(RAW_DATA_DIR, resume, config.protocol)
+        else:
+            self.checkpoint = SweepCheckpoint(checkpoint_path(RAW_DATA_DIR, self.timestamp),
+                                              self.timestamp, config.protocol)
         self.global_start_time: float = 0
         self.baseline_files: List[Path] = []
+        recording_cfg = config.protocol.get("Recording", {})
+        self.record_format: str = recording_cfg.get("Format", DEFAULT_RECORD_FORMAT)
+        # Serialize on a writer thread unless disabled with Background: false
+        self.queue_blocks: int = int(recording_cfg.get("QueueBlocks", DEFAULT_QUEUE_BLOCKS)) \
+            if recording_cfg.get("Background", True) else 0
+        # Session mode: the whole sweep goes into one file plus an index sidecar
+        self.session: bool = bool(recording_cfg.get("Session", False))
+        self.session_writer: Optional[RecordWriter] = None
+        self.session_path: Optional[Path] = None
+        self.session_segments: List[Dict[str, Any]] = []
+        # Start bookmark of the session segment being recorded
+        self.segment_start: Optional[int] = None
+        self.sampling_rate: float = 0.0
+        # Preallocated float32 destination for pulls from float32 streams
+        self.pull_buffer: Optional[np.ndarray] = None
+        # Local clock minus EEG stream clock, from inlet.time_correction()
+        self.clock_offset: float = 0.0
+        self.marker_outlet = None
+        # Live signal check, created in run_sweep if ``Quality: Enabled`` is set
+        self.quality: Optional[QualityMonitor] = None
+        self.quality_action: str = (config.protocol.get("Quality") or {}).get("Action", "warn")
+        if self.quality_action not in QUALITY_ACTIONS:
+            raise ValueError(f"Unknown Quality Action '{self.quality_action}'; use one of {QUALITY_ACTIONS}.")
 
     def connect_lsl(self) -> None:
         """Resolves and connects to the LSL stream."""
         try:
-            from pylsl import StreamInlet, resolve_stream
+            from pylsl import StreamInlet, cf_float32, resolve_stream
             resolver = "resolve_stream"
         except ImportError:
-            from pylsl import StreamInlet, resolve_streams
+            from pylsl import StreamInlet, cf_float32, resolve_streams
             resolve_stream = None
             resolver = "resolve_streams"
         logger.info("Resolving LSL stream: '%s' (Timeout: 5s)...", self.config.stream_name)
@@ -160,6 +397,9 @@ class EEGSweep:
             
         self.inlet = StreamInlet(streams[0])
         self.num_channels = self.inlet.info().channel_count()
+        self.sampling_rate = self.inlet.info().nominal_srate()
+        if self.inlet.info().channel_format() == cf_float32:
+            self.pull_buffer = np.empty((PULL_MAX_SAMPLES, self.num_channels), dtype=np.float32)
         logger.info("Connected to LSL stream with %d channels.", self.num_channels)
         
         # Verify EEG data is actually flowing - block until data arrives
@@ -175,16 +415,48 @@ class EEGSweep:
                 wait_for_space("Check EEG hardware and LSL server. Is the board streaming?")
                 logger.info("Retrying EEG verification...")
             
+        self.update_clock_offset(timeout=MARKER_CLOCK_TIMEOUT_S)
+
         # Drain stale data
         self.inlet.pull_chunk(timeout=0.0)
 
+    def update_clock_offset(self, timeout: float = 0.0) -> None:
+        """
+        Refreshes the offset between this machine's LSL clock and the EEG stream.
+
+        liblsl keeps estimating the offset in the background once it has
+        been asked for it, so later calls are cheap. A failed call keeps the
+        previous estimate.
+
+        Args:
+            timeout: Seconds to wait for the first estimate.
+        """
+        try:
+            self.clock_offset = self.inlet.time_correction(timeout=timeout)
+        except Exception as e:
+            logger.debug("time_correction failed, keeping offset %.6f s: %s", self.clock_offset, e)
+
+    def publish_marker(self, marker: int, onset: float) -> None:
+        """
+        Pushes *marker* on the ``<StreamName>_SweepMarkers`` outlet.
+
+        Args:
+            marker: Marker code.
+            onset: ``local_clock()`` time of the event.
+        """
+        from pylsl import IRREGULAR_RATE, StreamInfo, StreamOutlet
+        if self.marker_outlet is None:
+            info = StreamInfo(f"{self.config.stream_name}{MARKER_STREAM_SUFFIX}", "Markers", 1,
+                              IRREGULAR_RATE, "string", f"eegsweep_{self.timestamp}_markers")
+            self.marker_outlet = StreamOutlet(info)
+        self.marker_outlet.push_sample([str(marker)], onset)
+
     def connect_vhp(self, silent: bool = False) -> None:
         """Connects to the VHP serial device."""
         if self.config.serial_port:
             try:
+                # SerialCommunicator waits until the firmware answers a ping
                 self.vhp = SerialCommunicator(self.config.serial_port, silent=silent)
-                # Small delay after successful port opening to let firmware stabilize
-                time.sleep(1)
                 if not silent:
                     logger.info("Connected to VHP on %s", self.config.serial_port)
             except Exception:
@@ -192,43 +464,280 @@ class EEGSweep:
                     logger.warning("VHP device not found on %s. Please check connection and power.", self.config.serial_port)
                 self.vhp = None
 
-    def record_to_csv(self, duration: float, writer: Any, marker: Optional[int]) -> None:
-        """Records LSL data to CSV for a specified duration using pull_chunk."""
-        start_time = time.time()
-        marker_written: bool = False
+    def pull_chunk(self, timeout: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pulls a chunk from the inlet as arrays.
+
+        Float32 streams (such as the LSL server's) are pulled straight into
+        a preallocated buffer (pylsl's ``dest_obj``), which skips building a
+        Python list per sample; other formats convert the returned lists.
+
+        Args:
+            timeout: Seconds to wait for data.
+
+        Returns:
+            Tuple of (samples (n, channels), timestamps (n,)); both empty if
+            nothing arrived.
+        """
+        if self.pull_buffer is not None:
+            _, timestamps = self.inlet.pull_chunk(timeout=timeout, max_samples=len(self.pull_buffer),
+                                                  dest_obj=self.pull_buffer)
+            # Copied: the buffer is reused by the next pull while the writer may still queue it
+            return self.pull_buffer[:len(timestamps)].copy(), np.asarray(timestamps, dtype=np.float64)
+        samples, timestamps = self.inlet.pull_chunk(timeout=timeout, max_samples=PULL_MAX_SAMPLES)
+        if not timestamps:
+            return np.empty((0, self.num_channels)), np.empty(0)
+        return np.asarray(samples), np.asarray(timestamps, dtype=np.float64)
+
+    def open_writer(self, stem: Path, resume_state: Optional[Dict[str, Any]] = None) -> RecordWriter:
+        """
+        Opens a recording file in the format selected by ``Recording: Format``.
+
+        Args:
+            stem: Output path without suffix.
+            resume_state: Checkpointed writer state to continue from.
+
+        Returns:
+            An open RecordWriter; use it as a context manager.
+        """
+        return open_record_writer(stem, self.record_format, self.num_channels,
+                                  self.sampling_rate, queue_blocks=self.queue_blocks,
+                                  resume_state=resume_state)
+
+    def segment_stem(self, name: str) -> Path:
+        """Returns the output path (without suffix) of a segment in per-file mode."""
+        return RAW_DATA_DIR / f"{self.timestamp}_{self.config.board_id}_{name}"
+
+    def skip_segment(self, name: str) -> bool:
+        """
+        Checks the checkpoint journal for a segment finished before a resume.
+
+        Args:
+            name: Segment name.
+
+        Returns:
+            True if the segment was completed and must not be recorded again.
+        """
+        if not self.checkpoint.is_done(name):
+            return False
+        logger.info("Skipping segment %s (completed before resume)", name)
+        return True
+
+    @contextmanager
+    def segment(self, name: str, **params: Any) -> Iterator[RecordWriter]:
+        """
+        Provides the writer for one protocol segment (a baseline or sweep cell).
+
+        Without session mode each segment is its own file, named
+        ``<timestamp>_<board>_<name>``. In session mode the segment is
+        appended to the session recording: data buffered while waiting for
+        the operator is written first (without a marker, outside the
+        segment), then the segment's start and end are bookmarked for the
+        index sidecar.
+
+        Once the segment is on disk it is recorded in the checkpoint journal.
+        A segment interrupted after some trials (see :meth:`journal_trial`)
+        is continued: its file, or the session file, is cut back to the last
+        journaled trial and appended to.
+
+        Args:
+            name: Segment name, e.g. ``baseline_VHP_OFF`` or ``c5_f32_v100``.
+            **params: Protocol parameters stored with the segment in the index.
+
+        Yields:
+            The writer to record the segment into.
+        """
+        partial = self.checkpoint.partial_for(name)
+        if self.session_writer is None:
+            with self.open_writer(self.segment_stem(name),
+                                  resume_state=partial["state"] if partial else None) as writer:
+                yield writer
+            sync_record(writer.path)
+            self.checkpoint.complete(name)
+            return
+
+        writer = self.session_writer
+        if partial:
+            start = partial["start"]
+        else:
+            self.drain(writer)
+            start = writer.add_bookmark()
+        self.segment_start = start
+        yield writer
+        self.session_segments.append({"name": name, **params, "start": start, "end": writer.add_bookmark()})
+        # Journaled from the writer thread once the segment is actually on disk
+        segments = list(self.session_segments)
+        writer.when_written(lambda state: self.checkpoint.complete(
+            name, session={"state": state, "segments": segments}))
+
+    def journal_trial(self, name: str, trials: int, writer: RecordWriter) -> None:
+        """
+        Records in the checkpoint journal that *trials* trials of segment *name* are done.
+
+        The journal is written from the writer thread once the trials are
+        on disk, so a resumed sweep continues the segment after them.
+
+        Args:
+            name: Segment name.
+            trials: Trials of the segment completed so far.
+            writer: Writer of the segment.
+        """
+        if self.session_writer is None:
+            writer.when_written(lambda state: self.checkpoint.trial_done(name, trials, state))
+            return
+        segments, start = list(self.session_segments), self.segment_start
+        writer.when_written(lambda state: self.checkpoint.trial_done(
+            name, trials, state, start=start, session={"state": state, "segments": segments}))
+
+    def drain(self, writer: RecordWriter) -> int:
+        """
+        Writes everything the inlet has buffered, without a marker.
+
+        A single pull returns at most ``PULL_MAX_SAMPLES``, so after a long
+        operator prompt it takes several.
+
+        Args:
+            writer: Destination writer.
+
+        Returns:
+            Number of samples written.
+        """
+        total = 0
+        while True:
+            samples, timestamps = self.pull_chunk(timeout=0.0)
+            if not len(timestamps):
+                return total
+            writer.write_block(samples, timestamps)
+            total += len(timestamps)
+
+    def open_session(self) -> None:
+        """Opens the session recording that all segments are appended to."""
+        resumed = self.checkpoint.session
+        if resumed:
+            self.session_segments = list(resumed["segments"])
+        self.session_writer = self.open_writer(self.segment_stem("session"),
+                                               resume_state=resumed["state"] if resumed else None)
+        self.session_path = self.session_writer.path
+        logger.info("Recording the whole sweep to %s", self.session_writer.path)
+
+    def close_session(self) -> None:
+        """Closes the session recording and writes its index sidecar."""
+        if self.session_writer is None:
+            return
+        writer, self.session_writer = self.session_writer, None
+        writer.close()
+        write_session_index(writer, self.session_segments, self.record_format)
+
+    def write_with_marker(self, writer: RecordWriter, samples: np.ndarray, timestamps: np.ndarray,
+                          marker: Optional[int], onset: float) -> Optional[int]:
+        """
+        Writes a pulled block, placing *marker* on the sample nearest to *onset*.
+
+        The onset is mapped to the EEG stream clock with the inlet's time
+        correction. The nearest sample is the first one stamped later than
+        half a sample period before the onset; the block is split there so
+        the marker no longer depends on how LSL chunked the data.
+
+        Args:
+            writer: Destination writer.
+            samples: Pulled samples (n, channels).
+            timestamps: Their LSL timestamps (EEG stream clock).
+            marker: Marker still waiting for its sample, or None.
+            onset: ``local_clock()`` time of the marker event.
+
+        Returns:
+            The marker if its sample has not arrived yet, else None.
+        """
+        if marker is None:
+            writer.write_block(samples, timestamps)
+            return None
+        half_period = 0.5 / self.sampling_rate if self.sampling_rate > 0 else 0.0
+        stream_onset = onset - self.clock_offset
+        i = int(np.searchsorted(timestamps, stream_onset - half_period))
+        if i == len(timestamps):
+            writer.write_block(samples, timestamps)
+            return marker
+        if i > 0:
+            writer.write_block(samples[:i], timestamps[:i])
+        writer.write_block(samples[i:], timestamps[i:], marker)
+        logger.debug("Marker %s on sample %+.1f ms from onset", marker,
+                     (timestamps[i] - stream_onset) * MILLISECONDS_PER_SECOND)
+        return None
+
+    def record(self, duration: float, writer: RecordWriter, marker: Optional[int],
+               onset: Optional[float] = None, until: Optional[float] = None) -> None:
+        """
+        Records LSL data to *writer* for a specified duration using pull_chunk.
+
+        Args:
+            duration: Seconds to record (ignored if *until* is given).
+            writer: Destination writer.
+            marker: Marker code for the sample at *onset*, or None.
+            onset: ``local_clock()`` time of the marker event, e.g. as returned
+                by ``SerialCommunicator.start_stream``; defaults to now.
+            until: Absolute ``time.perf_counter()`` deadline to record until.
+        """
+        from pylsl import local_clock
+        if until is None:
+            until = time.perf_counter() + duration
+        if onset is None:
+            onset = local_clock()
+        self.update_clock_offset()
+        if marker is not None:
+            self.publish_marker(marker, onset)
+        marker_pending: Optional[int] = marker
         total_samples = 0
 
-        while (time.time() - start_time) < duration:
-            # Use a small timeout to block and wait for data instead of spinning
-            samples, timestamps = self.inlet.pull_chunk(timeout=0.1)
-            
-            if timestamps:
+        while (remaining := until - time.perf_counter()) > 0:
+            # Block for data, but never past the deadline
+            samples, timestamps = self.pull_chunk(timeout=min(PULL_TIMEOUT_S, remaining))
+
+            if len(timestamps):
                 total_samples += len(timestamps)
-                rows: List[List[Any]] = []
-                for sample, ts in zip(samples, timestamps):
-                    # Only write the marker on the very first sample of this duration block
-                    label = str(marker) if (marker is not None and not marker_written) else ""
-                    # Ensure sample is a list
-                    sample_data = list(sample)
-                    rows.append([ts] + sample_data[:self.num_channels] + [label])
-                    marker_written = True
-                
-                writer.writerows(rows)
+                marker_pending = self.write_with_marker(writer, samples, timestamps, marker_pending, onset)
+                if self.quality:
+                    self.quality.feed(samples)
             # No else: sleep needed here as pull_chunk(timeout=0.1) handles it
 
         # Final drain
-        samples, timestamps = self.inlet.pull_chunk(timeout=0.0)
-        if timestamps:
-            for sample, ts in zip(samples, timestamps):
-                label = str(marker) if (marker is not None and not marker_written) else ""
-                writer.writerow([ts] + list(sample)[:self.num_channels] + [label])
-                marker_written = True
-                total_samples += 1
+        samples, timestamps = self.pull_chunk(timeout=0.0)
+        if len(timestamps):
+            marker_pending = self.write_with_marker(writer, samples, timestamps, marker_pending, onset)
+            total_samples += len(timestamps)
 
         if total_samples == 0:
             logger.warning("No samples recorded for marker %s! Is the EEG stream sending data?", marker)
         else:
             logger.info("Recorded %d samples for marker %s", total_samples, marker)
+            if marker_pending is not None:
+                logger.warning("No sample reached the onset of marker %s; it was not written.", marker)
+        writer.end_phase(marker)
+
+    def quality_gate(self, writer: RecordWriter, scheduler: DeadlineScheduler) -> None:
+        """
+        Pauses the sweep between trials while the quality monitor reports bad channels.
+
+        Only active with ``Quality: Action: pause``. The data recorded during
+        the pause is kept, without a marker, and the remaining deadlines are
+        shifted by the pause length.
+
+        Args:
+            writer: Writer of the current segment.
+            scheduler: Scheduler of the running sweep.
+        """
+        if not self.quality or self.quality_action != "pause":
+            return
+        bad = self.quality.bad_channels()
+        if not bad:
+            return
+        paused_at = time.perf_counter()
+        logger.warning("Quality gate: pausing the sweep, %s", self.quality.describe(bad))
+        wait_for_space(f"\nQUALITY GATE | Bad channels: {', '.join(f'{n} ({s})' for n, s in bad.items())}.\n"
+                       f"Check electrodes and impedance, then continue.")
+        self.drain(writer)
+        self.quality.reset()
+        scheduler.shift(time.perf_counter() - paused_at)
+        logger.info("Sweep resumed after %.1f s quality pause.", time.perf_counter() - paused_at)
 
     def render_progress(self, current: int, total: int) -> None:
         """Renders progress bar in terminal."""
@@ -252,33 +761,47 @@ class EEGSweep:
             f.write("\n*** Protocol Configuration ***\n")
             f.write(yaml.dump(self.config.protocol))
             f.write(f"\nBaseline Files: {[p.name for p in self.baseline_files]}\n")
+            if self.session_path:
+                f.write(f"Session File: {self.session_path.name}\n")
         logger.info("Metadata saved to %s", metadata_path)
 
     def run_sweep(self) -> None:
         """Executes the full sweep protocol including baselines."""
+        if self.checkpoint.finished:
+            logger.warning("Sweep %s was already completed; nothing to resume.", self.timestamp)
+            return
         if not self.inlet:
             raise RuntimeError("LSL must be connected before sweep.")
 
+        self.quality = QualityMonitor.from_protocol(self.config.protocol, self.num_channels,
+                                                    self.sampling_rate)
+        if self.session:
+            self.open_session()
+        try:
+            self._run_protocol()
+        finally:
+            self.close_session()
+            if self.quality:
+                self.quality.close()
+        self.checkpoint.finish()
+        self.write_metadata()
+
+    def _run_protocol(self) -> None:
+        """Runs baselines and sweep cells, one ``segment`` each."""
         p = self.config.protocol
         
-        # Calculate total steps early to avoid UnboundLocalError
-        ch_start, ch_end, ch_step = p["Channel"]["Start"], p["Channel"]["End"], p["Channel"]["Steps"]
-        freq_start, freq_end, freq_step = p["Frequency"]["Start"], p["Frequency"]["End"], p["Frequency"]["Steps"]
-        vol_start, vol_end, vol_step = p["Volume"]["Start"], p["Volume"]["End"], p["Volume"]["Steps"]
-        num_cycles = p["Measurements"]["Number"]
-        
-        # Ensure step is at least 1 to avoid infinite loops/division by zero
-        ch_step = max(1, ch_step)
-        freq_step = max(1, freq_step)
-        vol_step = max(1, vol_step)
-        
-        total_steps = ((ch_end - ch_start)//ch_step + 1) * \
-                      ((freq_end - freq_start)//freq_step + 1) * \
-                      ((vol_end - vol_start)//vol_step + 1) * num_cycles
+        # Plan the whole sweep up front: every phase gets a fixed deadline
+        schedule = build_sweep_schedule(p)
+        total_steps = sum(phase.ends_trial for phase in schedule)
+        ch_start, freq_start, vol_start = p["Channel"]["Start"], p["Frequency"]["Start"], p["Volume"]["Start"]
 
         # --- BASELINE 1: VHP OFF ---
         b1_dur = float(p.get("Baselines", {}).get("Baseline_1", 10.0))
-        if b1_dur > 0:
+        if b1_dur > 0 and self.skip_segment("baseline_VHP_OFF"):
+            if not self.session:
+                self.baseline_files.append(record_path(self.segment_stem("baseline_VHP_OFF"),
+                                                       self.record_format))
+        elif b1_dur > 0:
             # Force disconnect for Baseline 1 (Environmental noise requires VHP OFF)
             if self.vhp:
                 logger.info("Closing VHP connection for Baseline 1 (OFF phase)...")
@@ -288,14 +811,12 @@ class EEGSweep:
             wait_for_space(f"Calibration Phase | Marker 3: Baseline 1 (VHP OFF).\n"
                            f"Ensure VBS/VHP is powered OFF. Ready to record {b1_dur}s?")
             logger.info("Recording Baseline 1 (VHP OFF phase)...")
-            b1_path = RAW_DATA_DIR / f"{self.timestamp}_{self.config.board_id}_baseline_VHP_OFF.csv"
-            
-            with open(b1_path, "w", newline="") as f:
-                writer = csv.writer(f)
-                self.record_to_csv(b1_dur, writer, marker=3)
+            with self.segment("baseline_VHP_OFF") as writer:
+                self.record(b1_dur, writer, marker=3)
             
             logger.info("Baseline 1 (VHP OFF) completed.")
-            self.baseline_files.append(b1_path)
+            if not self.session:
+                self.baseline_files.append(writer.path)
 
         # Transition to VHP ON (Required for Baseline 2 or Sweep)
         if self.config.serial_port and (not self.vhp or not self.vhp.is_connected()):
@@ -314,73 +835,97 @@ class EEGSweep:
 
         # --- BASELINE 2: NO CONTACT (IFNFN) ---
         b2_dur = float(p.get("Baselines", {}).get("Baseline_2", 10.0))
-        if b2_dur > 0:
+        if b2_dur > 0 and self.skip_segment("baseline_NO_CONTACT"):
+            if not self.session:
+                self.baseline_files.append(record_path(self.segment_stem("baseline_NO_CONTACT"),
+                                                       self.record_format))
+        elif b2_dur > 0:
             wait_for_space(f"Calibration Phase | Marker 31/33: Baseline 2 (No physical contact).\n"
                            f"1. Place finger 1 mm away from tactor nipple (IFNFN).\n"
                            f"2. Press SPACEBAR to record {b2_dur}s baseline.")
             logger.info("Recording Baseline 2 (VHP ON, STIM ON, no contact)...")
             
-            b2_path = RAW_DATA_DIR / f"{self.timestamp}_{self.config.board_id}_baseline_NO_CONTACT.csv"
-            
             if self.vhp:
-                self.vhp.set_channel(ch_start)
-                self.vhp.set_volume(vol_start)
-                self.vhp.set_frequency(freq_start)
-                self.vhp.start_stream()
-
-            with open(b2_path, "w", newline="") as f:
-                writer = csv.writer(f)
-                self.record_to_csv(b2_dur, writer, marker=31)
-                if self.vhp:
-                    self.vhp.stop_stream()
-                self.record_to_csv(b2_dur, writer, marker=33)
+                self.vhp.configure(channel=ch_start, frequency=freq_start, volume=vol_start)
+
+            with self.segment("baseline_NO_CONTACT", channel=ch_start, frequency=freq_start,
+                              volume=vol_start) as writer:
+                # Start inside the segment so its first samples are not drained away
+                onset = self.vhp.start_stream() if self.vhp else None
+                self.record(b2_dur, writer, marker=31, onset=onset)
+                onset = self.vhp.stop_stream() if self.vhp else None
+                self.record(b2_dur, writer, marker=33, onset=onset)
             
-            self.baseline_files.append(b2_path)
+            if not self.session:
+                self.baseline_files.append(writer.path)
             logger.info("Baseline 2 completed.")
 
         # --- SWEEP: CONTACT ---
-        wait_for_space(f"Recording Phase | Marker 0/1/11: Sweep (Physical contact). "
-                       f"Place finger(s) ON tactors. Ready for sweep ({total_steps} steps)?")
-        
-        current_step = 0
-        self.global_start_time = time.perf_counter()
+        interleaved = p.get("Interleaved")
+        if interleaved:
+            wait_for_space(f"Recording Phase | Markers 100/101/111 (FOT) and 200/201/211 (IFNFN), "
+                           f"{interleaved.get('Order', 'random')} order.\n"
+                           f"FOT: finger ON the nipple of tactor CH{interleaved['FOT_Channel']}. "
+                           f"IFNFN: finger on the case of tactor CH{interleaved['IFNFN_Channel']}.\n"
+                           f"Ready for interleaved sweep ({total_steps} trials)?")
+        else:
+            wait_for_space(f"Recording Phase | Marker 0/1/11: Sweep (Physical contact). "
+                           f"Place finger(s) ON tactors. Ready for sweep ({total_steps} steps)?")
         
+        # Tactors per segment, taken before a resume drops the trials already recorded
+        segment_channels: Dict[str, Dict[int, None]] = {}
+        for phase in schedule:
+            segment_channels.setdefault(phase.segment, {})[phase.cell[0]] = None
+
+        # A resumed sweep continues after the last journaled trial
+        done_steps = sum(phase.ends_trial for phase in schedule if self.checkpoint.is_done(phase.segment))
+        schedule = [phase for phase in schedule if not self.checkpoint.is_done(phase.segment)]
+        partial = self.checkpoint.partial_for(schedule[0].segment) if schedule else None
+        if partial:
+            trial_ends = [i for i, phase in enumerate(schedule) if phase.ends_trial]
+            schedule = schedule[trial_ends[partial["trials"] - 1] + 1:]
+            done_steps += partial["trials"]
+        current_step = done_steps
         if self.vhp:
             self.vhp.set_test_mode(True)
 
-        for ch in range(ch_start, ch_end + 1, ch_step):
-            for freq in range(freq_start, freq_end + 1, freq_step):
-                for vol in range(vol_start, vol_end + 1, vol_step):
-                    if self.vhp:
-                        self.vhp.set_channel(ch)
-                        self.vhp.set_frequency(freq)
-                        self.vhp.set_volume(vol)
-                    
-                    filename = f"{self.config.board_id}_c{ch}_f{freq}_v{vol}.csv"
-                    filepath = RAW_DATA_DIR / f"{self.timestamp}_{filename}"
-                    
-                    with open(filepath, "w", newline="") as f:
-                        writer = csv.writer(f)
-                        b3_dur = float(p.get("Baselines", {}).get("Baseline_3", 10.0))
-                        if b3_dur > 0:
-                            self.record_to_csv(b3_dur, writer, marker=333)
-                        
-                        for _ in range(num_cycles):
-                            # Pre-Stim period (Rest)
-                            self.record_to_csv(p["Measurements"]["Duration_off"], writer, marker=0)
-                            
-                            # Stim ON
-                            if self.vhp:
-                                self.vhp.start_stream()
-                            self.record_to_csv(p["Measurements"]["Duration_on"], writer, marker=1)
-                            if self.vhp:
-                                self.vhp.stop_stream()
-                            
-                            # Stim OFF period (Post-stim rest)
-                            self.record_to_csv(p["Measurements"]["Duration_off"], writer, marker=11)
-                            
-                            current_step += 1
-                            self.render_progress(current_step, total_steps)
-        
+        scheduler = DeadlineScheduler()
+        self.global_start_time = scheduler.start(schedule[0].start if schedule else 0.0)
+        vhp_cell: Optional[Tuple[int, int, int]] = None
+        for segment_name, segment_phases in groupby(schedule, key=lambda phase: phase.segment):
+            phases = list(segment_phases)
+            channels = list(segment_channels[segment_name])
+            _, freq, vol = phases[0].cell
+            channel_params = {"channel": channels[0]} if len(channels) == 1 else {"channels": channels}
+
+            partial = self.checkpoint.partial_for(segment_name)
+            segment_trials = partial["trials"] if partial else 0
+            with self.segment(segment_name, frequency=freq, volume=vol, **channel_params) as writer:
+                for phase in phases:
+                    # Only changed settings are sent, e.g. the tactor between interleaved trials
+                    if self.vhp and phase.cell != vhp_cell:
+                        self.vhp.configure(*(new if new != old else None for new, old in
+                                             zip(phase.cell, vhp_cell or (None,) * 3)))
+                    vhp_cell = phase.cell
+                    scheduler.wait(scheduler.deadline(phase.start))
+                    # Stimulation is switched at the phase start, marked at the serial write
+                    onset = None
+                    if self.vhp and phase.stim is not None:
+                        onset = self.vhp.start_stream() if phase.stim else self.vhp.stop_stream()
+                    scheduler.log_event(f"{phase.marker} {segment_name}", phase.start,
+                                        time.perf_counter())
+                    self.record(phase.end - phase.start, writer, marker=phase.marker, onset=onset,
+                                until=scheduler.deadline(phase.end))
+
+                    if phase.ends_trial:
+                        current_step += 1
+                        segment_trials += 1
+                        self.render_progress(current_step, total_steps)
+                        # The last trial is journaled with the whole segment
+                        if phase is not phases[-1]:
+                            self.journal_trial(segment_name, segment_trials, writer)
+                        if phase is not schedule[-1]:
+                            self.quality_gate(writer, scheduler)
+
+        scheduler.log_summary(schedule[-1].end if schedule else 0.0)
         print("\nSweep completed.")
-        self.write_metadata()
@@ -0,0 +1,669 @@
+"""
+Recording backends for the sweep recorder.
+
+``csv`` writes the historical row layout (timestamp, channels..., marker)
+that ``convert`` reads. ``binary`` writes one directory per recording with
+fixed-width columns that are appended as raw blocks, no text formatting::
+
+    <name>.rec/header.json     layout (channels, rate, dtypes, sample count)
+    <name>.rec/samples.f32     float32 (n, channels)
+    <name>.rec/timestamps.f64  float64 (n,) LSL timestamps
+    <name>.rec/events.i64      int64 (k, 2) sparse (sample_index, marker code)
+
+``export_record_csv`` turns a binary recording back into the CSV layout,
+value for value.
+
+``AsyncRecordWriter`` wraps either backend so that serialization and disk
+writes run on a background thread instead of the thread that pulls LSL
+data and times the stimulation protocol.
+
+A whole sweep can also go into one session recording. Its sidecar
+``<name>.index.json`` lists every marker and every protocol segment
+(baselines, sweep cells) with sample and byte offsets, so
+``read_session_segment`` can slice any cell without scanning the file.
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RECORD_FORMATS: Tuple[str, ...] = ("csv", "binary")
+DEFAULT_RECORD_FORMAT: str = "csv"
+BINARY_RECORD_SUFFIX: str = ".rec"
+HEADER_FILE: str = "header.json"
+SAMPLES_FILE: str = "samples.f32"
+TIMESTAMPS_FILE: str = "timestamps.f64"
+EVENTS_FILE: str = "events.i64"
+SAMPLE_DTYPE = np.float32
+TIMESTAMP_DTYPE = np.float64
+EVENT_DTYPE = np.int64
+BINARY_FORMAT_VERSION: int = 1
+# Rows converted per batch by the CSV exporter
+EXPORT_BATCH_ROWS: int = 4096
+# Pulled chunks the background writer may lag behind (~0.1 s each, so ~25 s)
+DEFAULT_QUEUE_BLOCKS: int = 256
+MILLISECONDS_PER_SECOND: float = 1e3
+SESSION_INDEX_SUFFIX: str = ".index.json"
+
+
+class RecordWriter(ABC):
+    """
+    Base class for sweep recording backends.
+
+    A writer receives (samples, timestamps) blocks as pulled from the LSL
+    inlet. The marker of a block is attached to its first sample, which is
+    how the sweep has always tagged the start of a protocol phase.
+    """
+
+    def __init__(self, path: Path, num_channels: int) -> None:
+        self.path = Path(path)
+        self.num_channels = num_channels
+        self.num_samples = 0
+        # (sample_index, code, byte_offset, timestamp) of every marker written
+        self.events: List[Tuple[int, int, int, float]] = []
+        # (sample_index, byte_offset) positions requested with add_bookmark()
+        self.bookmarks: List[Tuple[int, int]] = []
+
+    @abstractmethod
+    def byte_offset(self) -> int:
+        """Returns the byte position of the next sample in the (sample) file."""
+
+    def add_bookmark(self) -> int:
+        """
+        Remembers the current write position.
+
+        Returns:
+            Index of the bookmark in :attr:`bookmarks`.
+        """
+        self.bookmarks.append((self.num_samples, self.byte_offset()))
+        return len(self.bookmarks) - 1
+
+    def add_event(self, marker: int, timestamp: float) -> None:
+        """Records *marker* at the current write position."""
+        self.events.append((self.num_samples, int(marker), self.byte_offset(), float(timestamp)))
+
+    def state(self) -> Dict[str, Any]:
+        """
+        Returns the write position and tables needed to resume the recording.
+
+        Returns:
+            JSON-serializable dict for ``resume_record_writer``.
+        """
+        return {
+            "num_samples": self.num_samples,
+            "byte_offset": self.byte_offset(),
+            "events": [list(event) for event in self.events],
+            "bookmarks": [list(bookmark) for bookmark in self.bookmarks],
+        }
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        """Restores the counters and tables saved by :meth:`state`."""
+        self.num_samples = state["num_samples"]
+        self.events[:] = [tuple(event) for event in state["events"]]
+        self.bookmarks[:] = [tuple(bookmark) for bookmark in state["bookmarks"]]
+
+    def when_written(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """
+        Calls *callback* with :meth:`state` once everything written so far is on disk.
+
+        Args:
+            callback: Receives the writer state; used for checkpoints.
+        """
+        self.flush()
+        for f in self.files():
+            os.fsync(f.fileno())
+        callback(self.state())
+
+    @abstractmethod
+    def files(self) -> List[Any]:
+        """Returns the open data files."""
+
+    @abstractmethod
+    def write_block(self, samples: np.ndarray, timestamps: np.ndarray,
+                    marker: Optional[int] = None) -> None:
+        """
+        Appends a block of samples.
+
+        Args:
+            samples: Array of shape (n, channels); extra channels are dropped.
+            timestamps: LSL timestamps of shape (n,).
+            marker: Marker code for the first sample of the block, if any.
+        """
+
+    @abstractmethod
+    def flush(self) -> None:
+        """Pushes buffered data to the operating system."""
+
+    def end_phase(self, label: Any) -> None:
+        """
+        Called by the recorder when a protocol phase has been recorded.
+
+        Args:
+            label: Phase label (usually the marker code) for log messages.
+        """
+
+    @abstractmethod
+    def close(self) -> None:
+        """Flushes and closes the underlying files."""
+
+    def __enter__(self) -> "RecordWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class CsvRecordWriter(RecordWriter):
+    """Writes the text layout ``ts, ch1..chN, marker`` with ``csv.writer``."""
+
+    def __init__(self, path: Path, num_channels: int, append: bool = False) -> None:
+        super().__init__(path, num_channels)
+        self.file = open(self.path, "a" if append else "w", newline="")
+        self.writer = csv.writer(self.file)
+
+    def write_block(self, samples: np.ndarray, timestamps: np.ndarray,
+                    marker: Optional[int] = None) -> None:
+        n = len(timestamps)
+        if n == 0:
+            return
+        labels = [""] * n
+        if marker is not None:
+            labels[0] = str(marker)
+            self.add_event(marker, timestamps[0])
+        # tolist() yields Python floats, formatted exactly as before
+        values = np.asarray(samples)[:, :self.num_channels].tolist()
+        self.writer.writerows(
+            [ts] + row + [label]
+            for ts, row, label in zip(np.asarray(timestamps).tolist(), values, labels)
+        )
+        self.num_samples += n
+
+    def byte_offset(self) -> int:
+        return self.file.tell()
+
+    def files(self) -> List[Any]:
+        return [self.file]
+
+    def flush(self) -> None:
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class BinaryRecordWriter(RecordWriter):
+    """
+    Appends raw float32 sample and float64 timestamp blocks to column files.
+
+    Markers are kept in the in-memory event table and written, together
+    with the final sample count, when the recording is closed. The header is
+    written up front as well, so an interrupted recording can still be read
+    (the sample count then follows from the file sizes).
+    """
+
+    def __init__(self, path: Path, num_channels: int, sampling_rate: float = 0.0,
+                 channel_labels: Optional[List[str]] = None, append: bool = False) -> None:
+        super().__init__(path, num_channels)
+        self.sampling_rate = sampling_rate
+        self.channel_labels = channel_labels or []
+        self.row_bytes = num_channels * np.dtype(SAMPLE_DTYPE).itemsize
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.write_header()
+        mode = "ab" if append else "wb"
+        self.samples_file = open(self.path / SAMPLES_FILE, mode)
+        self.timestamps_file = open(self.path / TIMESTAMPS_FILE, mode)
+
+    def write_header(self) -> None:
+        """Writes ``header.json`` with the layout and current sample count."""
+        (self.path / HEADER_FILE).write_text(json.dumps({
+            "version": BINARY_FORMAT_VERSION,
+            "num_channels": self.num_channels,
+            "num_samples": self.num_samples,
+            "sampling_rate": self.sampling_rate,
+            "channel_labels": self.channel_labels,
+            "sample_dtype": np.dtype(SAMPLE_DTYPE).str,
+            "timestamp_dtype": np.dtype(TIMESTAMP_DTYPE).str,
+        }, indent=2), encoding="utf-8")
+
+    def write_block(self, samples: np.ndarray, timestamps: np.ndarray,
+                    marker: Optional[int] = None) -> None:
+        n = len(timestamps)
+        if n == 0:
+            return
+        if marker is not None:
+            self.add_event(marker, timestamps[0])
+        block = np.ascontiguousarray(np.asarray(samples)[:, :self.num_channels], dtype=SAMPLE_DTYPE)
+        self.samples_file.write(block.tobytes())
+        self.timestamps_file.write(np.asarray(timestamps, dtype=TIMESTAMP_DTYPE).tobytes())
+        self.num_samples += n
+
+    def byte_offset(self) -> int:
+        return self.num_samples * self.row_bytes
+
+    def files(self) -> List[Any]:
+        return [self.samples_file, self.timestamps_file]
+
+    def flush(self) -> None:
+        self.samples_file.flush()
+        self.timestamps_file.flush()
+
+    def close(self) -> None:
+        self.samples_file.close()
+        self.timestamps_file.close()
+        events = [(sample_index, code) for sample_index, code, _, _ in self.events]
+        np.asarray(events, dtype=EVENT_DTYPE).reshape(-1, 2).tofile(self.path / EVENTS_FILE)
+        self.write_header()
+
+
+class AsyncRecordWriter(RecordWriter):
+    """
+    Hands blocks to a wrapped writer on a background thread.
+
+    :meth:`write_block` only puts the (already pulled) NumPy block on a
+    bounded queue; the writer thread serializes it and flushes whenever the
+    queue runs empty. If the disk falls so far behind that the queue is
+    full, the caller blocks until there is room (no data is dropped) and
+    the time spent waiting is reported as backpressure per phase.
+    """
+
+    _STOP = object()
+    _BOOKMARK = object()
+
+    def __init__(self, writer: RecordWriter, max_blocks: int = DEFAULT_QUEUE_BLOCKS) -> None:
+        super().__init__(writer.path, writer.num_channels)
+        self.writer = writer
+        # Filled in by the writer thread; complete once close() returns
+        self.events = writer.events
+        self.bookmarks = writer.bookmarks
+        self.num_bookmarks = 0
+        self.max_blocks = max_blocks
+        self.queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_blocks)
+        self.error: Optional[BaseException] = None
+        self._reset_phase()
+        self._thread = threading.Thread(target=self._run, name=f"writer-{self.path.name}", daemon=True)
+        self._thread.start()
+
+    def _reset_phase(self) -> None:
+        """Clears the per-phase queue statistics."""
+        self.high_water = 0
+        self.blocked_puts = 0
+        self.blocked_s = 0.0
+
+    def _run(self) -> None:
+        """Writer thread: drains the queue into the wrapped writer."""
+        while True:
+            item = self.queue.get()
+            if item is self._STOP:
+                break
+            if self.error is not None:
+                continue  # keep draining so the producer never deadlocks
+            try:
+                if item is self._BOOKMARK:
+                    self.writer.add_bookmark()
+                    continue
+                if callable(item):
+                    self.writer.when_written(item)
+                    continue
+                self.writer.write_block(*item)
+                if self.queue.empty():
+                    self.writer.flush()
+            except Exception as e:
+                logger.error("Background writer for %s failed: %s", self.path, e)
+                self.error = e
+
+    def _raise_error(self) -> None:
+        if self.error is not None:
+            raise RuntimeError(f"Writing {self.path} failed") from self.error
+
+    def add_bookmark(self) -> int:
+        # Queued in order with the blocks, so the position is exact
+        self._put(self._BOOKMARK)
+        self.num_bookmarks += 1
+        return self.num_bookmarks - 1
+
+    def when_written(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        # Runs on the writer thread after the blocks queued before it
+        self._put(callback)
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        self.writer.restore(state)
+        self.num_samples = state["num_samples"]
+        self.num_bookmarks = len(state["bookmarks"])
+
+    def write_block(self, samples: np.ndarray, timestamps: np.ndarray,
+                    marker: Optional[int] = None) -> None:
+        self._raise_error()
+        if len(timestamps) == 0:
+            return
+        self._put((samples, timestamps, marker))
+        self.num_samples += len(timestamps)
+
+    def _put(self, item: Any) -> None:
+        """Queues *item*, blocking (and counting backpressure) if the queue is full."""
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            start = time.perf_counter()
+            self.queue.put(item)
+            self.blocked_puts += 1
+            self.blocked_s += time.perf_counter() - start
+        self.high_water = max(self.high_water, self.queue.qsize())
+
+    def byte_offset(self) -> int:
+        # Position reached by the writer thread; exact once the queue is drained
+        return self.writer.byte_offset()
+
+    def files(self) -> List[Any]:
+        return self.writer.files()
+
+    def flush(self) -> None:
+        # The writer thread flushes on its own whenever it catches up
+        self._raise_error()
+
+    def end_phase(self, label: Any) -> None:
+        """Logs the queue high-water mark and any backpressure of the phase."""
+        if self.blocked_puts:
+            logger.warning("Writer for %s fell behind during phase %s: queue full %d times, "
+                           "acquisition blocked %.1f ms", self.path.name, label,
+                           self.blocked_puts, self.blocked_s * MILLISECONDS_PER_SECOND)
+        else:
+            logger.info("Writer queue high-water mark for phase %s: %d/%d blocks",
+                        label, self.high_water, self.max_blocks)
+        self._reset_phase()
+
+    def close(self) -> None:
+        self.queue.put(self._STOP)
+        self._thread.join()
+        self.writer.close()
+        self._raise_error()
+
+
+def record_path(stem: Path, record_format: str) -> Path:
+    """
+    Returns the output path of a recording for the given backend.
+
+    Args:
+        stem: Path without suffix, e.g. ``data/raw/<ts>_<board>_c5_f32_v100``.
+        record_format: ``csv`` or ``binary``.
+
+    Returns:
+        ``<stem>.csv`` or the ``<stem>.rec`` directory.
+    """
+    suffix = BINARY_RECORD_SUFFIX if record_format == "binary" else ".csv"
+    return stem.with_name(stem.name + suffix)
+
+
+def open_record_writer(
+    stem: Path,
+    record_format: str,
+    num_channels: int,
+    sampling_rate: float = 0.0,
+    channel_labels: Optional[List[str]] = None,
+    queue_blocks: int = 0,
+    resume_state: Optional[Dict[str, Any]] = None,
+) -> RecordWriter:
+    """
+    Opens a writer for the configured backend.
+
+    Args:
+        stem: Output path without suffix.
+        record_format: ``csv`` or ``binary``.
+        num_channels: Number of EEG channels to keep per sample.
+        sampling_rate: Nominal rate stored in the binary header.
+        channel_labels: Channel labels stored in the binary header.
+        queue_blocks: If > 0, write on a background thread with a queue of
+            this many blocks (see AsyncRecordWriter).
+        resume_state: Writer state saved at a checkpoint; the existing
+            recording is truncated to it and appended to.
+
+    Returns:
+        An open RecordWriter.
+
+    Raises:
+        ValueError: If *record_format* is unknown.
+    """
+    if record_format not in RECORD_FORMATS:
+        raise ValueError(f"Unknown recording format '{record_format}'; use one of {RECORD_FORMATS}.")
+    path = record_path(stem, record_format)
+    append = resume_state is not None
+    if append:
+        truncate_record(path, record_format, num_channels, resume_state)
+    if record_format == "binary":
+        writer: RecordWriter = BinaryRecordWriter(path, num_channels, sampling_rate, channel_labels,
+                                                  append=append)
+    else:
+        writer = CsvRecordWriter(path, num_channels, append=append)
+    if queue_blocks > 0:
+        writer = AsyncRecordWriter(writer, queue_blocks)
+    if append:
+        writer.restore(resume_state)
+        logger.info("Resuming %s after sample %d", path, resume_state["num_samples"])
+    return writer
+
+
+def truncate_record(path: Path, record_format: str, num_channels: int,
+                    state: Dict[str, Any]) -> None:
+    """
+    Cuts a recording back to a saved write position.
+
+    Whatever was written after the checkpoint (e.g. half a sweep cell
+    before a crash) is discarded so the resumed recording continues right
+    after the last completed segment.
+
+    Args:
+        path: Recording file (``.csv``) or directory (``.rec``).
+        record_format: ``csv`` or ``binary``.
+        num_channels: Channels per sample.
+        state: Writer state from ``RecordWriter.state``.
+
+    Raises:
+        ValueError: If a file is shorter than the checkpoint says it was.
+    """
+    num_samples = state["num_samples"]
+    if record_format == "binary":
+        sizes = {path / SAMPLES_FILE: num_samples * num_channels * np.dtype(SAMPLE_DTYPE).itemsize,
+                 path / TIMESTAMPS_FILE: num_samples * np.dtype(TIMESTAMP_DTYPE).itemsize}
+    else:
+        sizes = {path: state["byte_offset"]}
+    for file_path, size in sizes.items():
+        if file_path.stat().st_size < size:
+            raise ValueError(f"{file_path} is shorter than its checkpoint ({size} bytes); cannot resume.")
+        os.truncate(file_path, size)
+
+
+def sync_record(path: Path) -> None:
+    """
+    Forces a closed recording to disk, so a checkpoint never claims data that is not there.
+
+    Args:
+        path: Recording file (``.csv``) or directory (``.rec``).
+    """
+    path = Path(path)
+    for file_path in sorted(path.iterdir()) if path.is_dir() else [path]:
+        # Opened for appending: fsync needs a writable handle on Windows
+        with open(file_path, "ab") as f:
+            os.fsync(f.fileno())
+
+
+def is_binary_record(path: Path) -> bool:
+    """Returns True if *path* is a binary recording directory."""
+    return (Path(path) / HEADER_FILE).is_file() and (Path(path) / SAMPLES_FILE).is_file()
+
+
+def read_record(path: Path) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, Any]]:
+    """
+    Memory-maps a binary recording.
+
+    Args:
+        path: ``.rec`` directory written by BinaryRecordWriter.
+
+    Returns:
+        Tuple of (samples (n, channels) float32, timestamps (n,) float64,
+        events (k, 2) int64 of (sample_index, code), header dict).
+    """
+    path = Path(path)
+    header = json.loads((path / HEADER_FILE).read_text(encoding="utf-8"))
+    num_channels = header["num_channels"]
+    timestamps = np.fromfile(path / TIMESTAMPS_FILE, dtype=TIMESTAMP_DTYPE)
+    # After a crash the header count is stale; trust the shorter column file
+    row_bytes = num_channels * np.dtype(SAMPLE_DTYPE).itemsize
+    num_samples = min(len(timestamps), (path / SAMPLES_FILE).stat().st_size // row_bytes)
+    samples = np.memmap(path / SAMPLES_FILE, dtype=SAMPLE_DTYPE, mode="r",
+                        shape=(num_samples, num_channels)) if num_samples else \
+        np.empty((0, num_channels), dtype=SAMPLE_DTYPE)
+    events_path = path / EVENTS_FILE
+    events = np.fromfile(events_path, dtype=EVENT_DTYPE).reshape(-1, 2) if events_path.exists() \
+        else np.empty((0, 2), dtype=EVENT_DTYPE)
+    return samples, timestamps[:num_samples], events, header
+
+
+def marker_column(events: np.ndarray, num_samples: int) -> np.ndarray:
+    """
+    Expands the sparse event table into a dense marker column.
+
+    Args:
+        events: (k, 2) array of (sample_index, code).
+        num_samples: Length of the recording.
+
+    Returns:
+        float64 array of length *num_samples*, NaN where there is no marker
+        (what pandas yields for the empty CSV marker cells).
+    """
+    markers = np.full(num_samples, np.nan)
+    valid = events[:, 0] < num_samples
+    markers[events[valid, 0]] = events[valid, 1]
+    return markers
+
+
+def export_record_csv(path: Path, csv_path: Optional[Path] = None) -> Path:
+    """
+    Writes a binary recording in the sweep CSV layout.
+
+    Rows go through ``csv.writer`` with the float32 samples widened to Python
+    floats, which is exactly what the CSV backend writes, so the output is
+    identical to a recording made with ``Format: csv``.
+
+    Args:
+        path: ``.rec`` directory.
+        csv_path: Output file (default: ``<name>.csv`` next to the directory).
+
+    Returns:
+        Path of the written CSV file.
+    """
+    path = Path(path)
+    samples, timestamps, events, header = read_record(path)
+    csv_path = Path(csv_path) if csv_path else path.with_suffix(".csv")
+    markers = dict(events.tolist())
+
+    with CsvRecordWriter(csv_path, header["num_channels"]) as writer:
+        for start in range(0, len(timestamps), EXPORT_BATCH_ROWS):
+            stop = min(start + EXPORT_BATCH_ROWS, len(timestamps))
+            batch_events = [i for i in markers if start <= i < stop]
+            # Split the batch at marker rows so each marker lands on its sample
+            bounds = sorted({start, stop, *batch_events})
+            for lo, hi in zip(bounds[:-1], bounds[1:]):
+                writer.write_block(samples[lo:hi], timestamps[lo:hi], markers.get(lo))
+
+    logger.info("Exported %d samples and %d markers from %s to %s",
+                len(timestamps), len(events), path, csv_path)
+    return csv_path
+
+
+def session_index_path(path: Path) -> Path:
+    """Returns the index sidecar path of a session recording."""
+    return Path(path).with_suffix(SESSION_INDEX_SUFFIX)
+
+
+def write_session_index(writer: RecordWriter, segments: List[Dict[str, Any]],
+                        record_format: str) -> Path:
+    """
+    Writes the index sidecar of a closed session recording.
+
+    Args:
+        writer: The closed session writer (its events and bookmarks are final).
+        segments: One dict per protocol segment with ``name``, the bookmark
+            indices ``start``/``end`` and any protocol parameters.
+        record_format: ``csv`` or ``binary``.
+
+    Returns:
+        Path of the written index.
+    """
+    index_segments = []
+    for segment in segments:
+        start_sample, start_byte = writer.bookmarks[segment["start"]]
+        end_sample, end_byte = writer.bookmarks[segment["end"]]
+        entry = {k: v for k, v in segment.items() if k not in ("start", "end")}
+        entry.update(start_sample=start_sample, end_sample=end_sample,
+                     start_byte=start_byte, end_byte=end_byte)
+        index_segments.append(entry)
+
+    index_path = session_index_path(writer.path)
+    index_path.write_text(json.dumps({
+        "file": writer.path.name,
+        "format": record_format,
+        "num_channels": writer.num_channels,
+        "num_samples": writer.num_samples,
+        "events": [{"sample": sample_index, "code": code, "byte": byte_offset, "timestamp": ts}
+                   for sample_index, code, byte_offset, ts in writer.events],
+        "segments": index_segments,
+    }, indent=2), encoding="utf-8")
+    logger.info("Session index with %d events and %d segments saved to %s",
+                len(writer.events), len(index_segments), index_path)
+    return index_path
+
+
+def read_session_segment(path: Path, name: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Reads one segment (e.g. ``c5_f32_v100``) of a session recording.
+
+    Only the segment's byte range is read, using the offsets in the index
+    sidecar, so the cost does not depend on where the segment lies.
+
+    Args:
+        path: Session recording (``.csv`` file or ``.rec`` directory).
+        name: Segment name as listed in the index.
+
+    Returns:
+        Tuple of (samples (n, channels), timestamps (n,), markers (n,) with
+        NaN where there is no marker).
+
+    Raises:
+        KeyError: If the index has no segment called *name*.
+    """
+    path = Path(path)
+    index = json.loads(session_index_path(path).read_text(encoding="utf-8"))
+    segment = next((seg for seg in index["segments"] if seg["name"] == name), None)
+    if segment is None:
+        raise KeyError(f"No segment '{name}' in {session_index_path(path)}")
+
+    start, end = segment["start_sample"], segment["end_sample"]
+    if index["format"] == "binary":
+        samples, timestamps, events, _ = read_record(path)
+        inside = (events[:, 0] >= start) & (events[:, 0] < end)
+        events = events[inside] - [start, 0]
+        return np.asarray(samples[start:end]), timestamps[start:end], marker_column(events, end - start)
+
+    num_channels = index["num_channels"]
+    with open(path, "rb") as f:
+        f.seek(segment["start_byte"])
+        raw = f.read(segment["end_byte"] - segment["start_byte"])
+    if not raw:
+        return np.empty((0, num_channels)), np.empty(0), np.empty(0)
+    import pandas as pd
+
+    table = pd.read_csv(io.BytesIO(raw), header=None, float_precision="round_trip").values
+    return (table[:, 1:num_channels + 1].astype(np.float64), table[:, 0].astype(np.float64),
+            pd.to_numeric(pd.Series(table[:, num_channels + 1]), errors="coerce").values)
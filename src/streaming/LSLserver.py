@@ -1,15 +1,250 @@
 import logging
+import threading
 import time
+from collections import Counter
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, NamedTuple, Optional, Sequence
 
+import numpy as np
 from brainflow.board_shim import BoardIds, BoardShim, BrainFlowInputParams, LogLevels
-from pylsl import StreamInfo, StreamOutlet
+from brainflow.exit_codes import BrainFlowError
+from pylsl import StreamInfo, StreamOutlet, local_clock
 
+from src.streaming.package_counter import count_dropped_packages
+from src.streaming.ring_buffer import RingBuffer
+from src.streaming.telemetry import DEFAULT_INTERVAL_S, StreamTelemetry
+from src.utils import paths
 from src.utils.config import load_yaml
 
 logger = logging.getLogger(__name__)
 
+RANDOM_SEED: int = 42
+POLL_INTERVAL_S: float = 0.01
+# LSL outlet sample format; pushed blocks must match it to avoid a copy
+LSL_CHANNEL_FORMAT: str = "float32"
+LSL_SAMPLE_DTYPE: type = np.float32
+BENCHMARK_DURATION_S: float = 5.0
+BENCHMARK_STREAM_SUFFIX: str = "_benchmark"
+MICROSECONDS_PER_SECOND: float = 1e6
+MILLISECONDS_PER_SECOND: float = 1e3
+JOIN_POLL_S: float = 0.5
+# Upper edges (ms) of the push latency histogram reported at shutdown
+LATENCY_BIN_EDGES_MS: tuple[float, ...] = (5.0, 10.0, 20.0, 50.0, 100.0, 200.0)
+
+# Optional companion outlets published next to the EEG stream
+COMPANION_COUNTERS: str = "counters"
+COMPANION_AUX: str = "aux"
+COMPANION_KINDS: tuple[str, ...] = (COMPANION_COUNTERS, COMPANION_AUX)
+# Board timestamps are Unix seconds and need double precision
+COUNTERS_CHANNEL_FORMAT: str = "double64"
+COUNTERS_SAMPLE_DTYPE: type = np.float64
+# (channel type, BoardShim getter) for the rows published on the aux outlet
+AUX_ROW_GETTERS: tuple[tuple[str, str], ...] = (
+    ("Accel", "get_accel_channels"),
+    ("Gyro", "get_gyro_channels"),
+    ("Analog", "get_analog_channels"),
+    ("Other", "get_other_channels"),
+)
+
+
+class CompanionOutlet(NamedTuple):
+    """An extra LSL outlet carrying a subset of BrainFlow rows."""
+
+    outlet: StreamOutlet
+    rows: List[int]
+    dtype: type
+
+
+def append_channel_metadata(
+    info: StreamInfo,
+    labels: Sequence[str],
+    units: Sequence[str],
+    types: Sequence[str],
+) -> None:
+    """
+    Writes per-channel label/unit/type nodes into the stream description.
+
+    Args:
+        info: Stream info to annotate.
+        labels: Channel labels.
+        units: Channel units, one per label.
+        types: Channel types, one per label.
+    """
+    channels_node = info.desc().append_child("channels")
+    for label, unit, ch_type in zip(labels, units, types):
+        chan_node = channels_node.append_child("channel")
+        chan_node.append_child_value("label", str(label))
+        chan_node.append_child_value("unit", unit)
+        chan_node.append_child_value("type", ch_type)
+
+
+def board_rows(board_id: int, getter: str) -> List[int]:
+    """
+    Returns BrainFlow row indices for a channel kind, or [] if unsupported.
+
+    Args:
+        board_id: BrainFlow board id.
+        getter: Name of the static ``BoardShim`` getter, e.g.
+            ``"get_accel_channels"``.
+
+    Returns:
+        Row indices (a single-row getter is wrapped in a list).
+    """
+    try:
+        rows = getattr(BoardShim, getter)(board_id)
+    except BrainFlowError:
+        return []
+    return list(rows) if isinstance(rows, (list, tuple)) else [rows]
+
+
+class PushStats:
+    """
+    Accumulates chunk-size and latency histograms of pushed chunks.
+
+    Latency is the age of the oldest sample of a chunk at push time, i.e.
+    the wall clock minus the BrainFlow timestamp of its first sample. Counts
+    are binned as they arrive so memory stays constant over long sessions.
+    """
+
+    def __init__(self) -> None:
+        self.chunk_sizes: Counter = Counter()
+        self.latency_counts: np.ndarray = np.zeros(
+            len(LATENCY_BIN_EDGES_MS) + 1, dtype=np.int64
+        )
+        self.latency_sum_ms: float = 0.0
+        self.latency_max_ms: float = 0.0
+        self.num_chunks: int = 0
+
+    def record(self, num_samples: int, latency_ms: float) -> None:
+        """
+        Adds one pushed chunk to the statistics.
+
+        Args:
+            num_samples: Number of samples in the chunk.
+            latency_ms: Age of the oldest sample at push time in ms.
+        """
+        self.chunk_sizes[num_samples] += 1
+        self.latency_counts[np.searchsorted(LATENCY_BIN_EDGES_MS, latency_ms)] += 1
+        self.latency_sum_ms += latency_ms
+        self.latency_max_ms = max(self.latency_max_ms, latency_ms)
+        self.num_chunks += 1
+
+    def log_summary(self, stream_name: str) -> None:
+        """
+        Logs the latency and chunk-size histograms.
+
+        Args:
+            stream_name: Stream label used in the log lines.
+        """
+        if not self.num_chunks:
+            return
+
+        logger.info("  [Log] '%s': %d chunks, latency mean %.1f ms, max %.1f ms",
+                    stream_name, self.num_chunks,
+                    self.latency_sum_ms / self.num_chunks, self.latency_max_ms)
+
+        lower = 0.0
+        for upper, count in zip(LATENCY_BIN_EDGES_MS + (float("inf"),),
+                                self.latency_counts):
+            if count:
+                logger.info("  [Log]   latency %5.1f-%.1f ms: %d",
+                            lower, upper, count)
+            lower = upper
+
+        for size, count in sorted(self.chunk_sizes.items()):
+            logger.info("  [Log]   chunk %4d samples: %d", size, count)
+
+
+def to_lsl_block(
+    data: np.ndarray,
+    channels: List[int],
+    dtype: type = LSL_SAMPLE_DTYPE,
+) -> np.ndarray:
+    """
+    Extracts channel rows from a BrainFlow buffer as an LSL-ready block.
+
+    BrainFlow returns (rows, samples) float64; pylsl wants (samples, channels)
+    in the outlet's format. Producing a C-contiguous array of that dtype lets
+    pylsl hand the buffer to liblsl without building per-value Python objects.
+
+    Args:
+        data: BrainFlow board data of shape (rows, samples).
+        channels: Row indices to publish.
+        dtype: Sample dtype of the target outlet (float32 by default).
+
+    Returns:
+        C-contiguous array of shape (samples, len(channels)).
+    """
+    return np.ascontiguousarray(data[channels].T, dtype=dtype)
+
+
+def benchmark_push(
+    num_channels: int,
+    sampling_rate: int,
+    stream_name: str,
+    duration_s: float = BENCHMARK_DURATION_S,
+) -> Dict[str, float]:
+    """
+    Measures the CPU cost per pushed sample of the legacy and float32 paths.
+
+    Synthetic BrainFlow-shaped chunks (one poll interval of data each) are
+    pushed into a throw-away outlet, first via ``.T.tolist()`` and then via
+    :func:`to_lsl_block`. CPU time is taken from ``time.process_time`` so
+    that idle waiting does not count.
+
+    Args:
+        num_channels: Number of EEG channels in the outlet.
+        sampling_rate: Nominal sampling rate in Hz.
+        stream_name: Base name for the temporary benchmark outlet.
+        duration_s: Wall-clock budget per path in seconds.
+
+    Returns:
+        CPU microseconds per pushed sample, keyed by ``"list"`` and
+        ``"float32"``.
+    """
+    rng = np.random.default_rng(RANDOM_SEED)
+    chunk_samples = max(1, int(round(sampling_rate * POLL_INTERVAL_S)))
+    # Mimic a BrainFlow buffer: package number row, EEG rows, timestamp row
+    data = rng.standard_normal((num_channels + 2, chunk_samples))
+    channels = list(range(1, num_channels + 1))
+
+    info = StreamInfo(
+        stream_name + BENCHMARK_STREAM_SUFFIX,
+        "EEG",
+        num_channels,
+        sampling_rate,
+        LSL_CHANNEL_FORMAT,
+        f"{stream_name}{BENCHMARK_STREAM_SUFFIX}",
+    )
+    outlet = StreamOutlet(info)
+
+    push_paths = {
+        "list": lambda: outlet.push_chunk(data[channels].T.tolist()),
+        "float32": lambda: outlet.push_chunk(to_lsl_block(data, channels)),
+    }
+
+    results: Dict[str, float] = {}
+    for name, push in push_paths.items():
+        pushed = 0
+        cpu_start = time.process_time()
+        wall_end = time.perf_counter() + duration_s
+        while time.perf_counter() < wall_end:
+            push()
+            pushed += chunk_samples
+        cpu_used = time.process_time() - cpu_start
+        results[name] = cpu_used / pushed * MICROSECONDS_PER_SECOND
+        logger.info("Benchmark [%s]: %d samples, %.3f us CPU/sample",
+                    name, pushed, results[name])
+
+    if results["float32"] > 0:
+        logger.info("Benchmark: float32 path is %.1fx cheaper per sample "
+                    "(%d ch, chunks of %d samples)",
+                    results["list"] / results["float32"],
+                    num_channels, chunk_samples)
+    return results
+
+
 class LSLServer:
     """
     BrainFlow -> LSL bridge.
@@ -20,6 +255,22 @@ class LSLServer:
         self.config = config
         self.board_shim: Optional[BoardShim] = None
         self.outlet: Optional[StreamOutlet] = None
+        self.eeg_channels: List[int] = []
+        self.companions: List[CompanionOutlet] = []
+        self.timestamp_channel: int = 0
+        self.package_channel: int = 0
+        self.last_package: Optional[float] = None
+        self.telemetry: Optional[StreamTelemetry] = None
+        self.ring: Optional[RingBuffer] = None
+        # Optional server-side filter stage and its "<StreamName>_Filtered" outlet
+        self.chunk_filter = None
+        self.filtered_outlet: Optional[StreamOutlet] = None
+        self.sampling_rate: int = 0
+        # Scheduler mode: wait for this many buffered samples (0 = fixed polling)
+        self.target_chunk_samples: int = 0
+        self.push_stats = PushStats()
+        self.total_samples: int = 0
+        self.start_time: float = 0.0
         # BrainFlow logging is handled in src.utils.logger.setup_logger()
         # to ensure consistent formatting.
         # BoardShim.enable_board_logger()
@@ -55,18 +306,23 @@ class LSLServer:
 
         board_id = self.board_shim.get_board_id()
         sampling_rate = BoardShim.get_sampling_rate(board_id)
-        eeg_channels = BoardShim.get_eeg_channels(board_id)
-        num_channels = len(eeg_channels)
+        # Resolved once here; the streaming loop only indexes with it
+        self.eeg_channels = BoardShim.get_eeg_channels(board_id)
+        self.timestamp_channel = BoardShim.get_timestamp_channel(board_id)
+        self.package_channel = BoardShim.get_package_num_channel(board_id)
+        self.sampling_rate = sampling_rate
+        self.target_chunk_samples = self._target_chunk_samples()
+        num_channels = len(self.eeg_channels)
         
         # Use a name from config if available
-        stream_name = self.config.get("Board", {}).get("StreamName", "BrainFlowEEG")
+        stream_name = self.stream_name
         
         info = StreamInfo(
             stream_name,
             "EEG",
             num_channels,
             sampling_rate,
-            "float32",
+            LSL_CHANNEL_FORMAT,
             f"brainflow_{board_id}",
         )
 
@@ -83,57 +339,384 @@ class LSLServer:
                 logger.error("Could not load montage file: %s", e)
 
         # Add metadata to the stream info
-        channels_node = info.desc().append_child("channels")
-        for i in range(num_channels):
-            # Fallback to "Channel X" if montage is missing or too short
-            label = channel_names[i] if i < len(channel_names) else f"Channel {i}"
-            
-            chan_node = channels_node.append_child("channel")
-            chan_node.append_child_value("label", str(label))
-            chan_node.append_child_value("unit", "microvolts")
-            chan_node.append_child_value("type", "EEG")
+        # Fallback to "Channel X" if montage is missing or too short
+        labels = [channel_names[i] if i < len(channel_names) else f"Channel {i}"
+                  for i in range(num_channels)]
+        append_channel_metadata(info, labels, ["microvolts"] * num_channels,
+                                ["EEG"] * num_channels)
 
         self.outlet = StreamOutlet(info)
         logger.info("LSL Stream initialized: %s", stream_name)
 
+        for kind in self.config.get("Board", {}).get("Companions") or []:
+            self.setup_companion(kind)
+
+        self.telemetry = self._make_telemetry()
+
+        filter_cfg = self.config.get("Board", {}).get("Filter")
+        if filter_cfg:
+            self.setup_filter(filter_cfg, labels)
+
+        ring_cfg = self.config.get("Board", {}).get("RingBuffer")
+        if ring_cfg:
+            self.ring = RingBuffer.from_config(
+                ring_cfg, paths.DATA_DIR / "ring" / stream_name,
+                num_channels, sampling_rate, labels)
+
+    def _make_telemetry(self) -> Optional[StreamTelemetry]:
+        """
+        Builds the telemetry publisher from the ``Telemetry`` board section.
+
+        ``Telemetry: {Interval: 5, JsonLog: true}`` publishes every 5 s and
+        also appends JSON lines to ``LOG_DIR``.
+
+        Returns:
+            Configured telemetry, or None if telemetry is disabled.
+        """
+        telemetry_cfg = self.config.get("Board", {}).get("Telemetry")
+        if not telemetry_cfg:
+            return None
+
+        jsonl_path = None
+        if telemetry_cfg.get("JsonLog"):
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            jsonl_path = paths.LOG_DIR / f"{stamp}_{self.stream_name}_telemetry.jsonl"
+        return StreamTelemetry(
+            self.stream_name,
+            self.sampling_rate,
+            interval_s=float(telemetry_cfg.get("Interval", DEFAULT_INTERVAL_S)),
+            jsonl_path=jsonl_path,
+        )
+
+    def setup_filter(self, filter_cfg: Dict[str, Any], labels: List[str]) -> None:
+        """
+        Sets up the filter stage and its ``<StreamName>_Filtered`` outlet.
+
+        Consumers that want cleaned data subscribe to the filtered outlet
+        instead of each filtering the raw stream themselves.
+
+        Args:
+            filter_cfg: ``Filter`` section, e.g. ``{HighPass: 1.0, Notch: [50, 100]}``.
+            labels: EEG channel labels, reused for the filtered stream.
+        """
+        # scipy is only needed when filtering is enabled
+        from src.streaming.filters import ChunkFilter
+
+        num_channels = len(self.eeg_channels)
+        self.chunk_filter = ChunkFilter.from_config(filter_cfg, self.sampling_rate, num_channels)
+
+        board_id = self.board_shim.get_board_id()
+        name = f"{self.stream_name}_Filtered"
+        info = StreamInfo(name, "EEG", num_channels, self.sampling_rate,
+                          LSL_CHANNEL_FORMAT, f"brainflow_{board_id}_filtered")
+        append_channel_metadata(info, labels, ["microvolts"] * num_channels,
+                                ["EEG"] * num_channels)
+        filters_node = info.desc().append_child("filtering")
+        filters_node.append_child_value("highpass", str(filter_cfg.get("HighPass")))
+        filters_node.append_child_value("notch", str(filter_cfg.get("Notch")))
+        self.filtered_outlet = StreamOutlet(info)
+        logger.info("LSL filtered stream initialized: %s", name)
+
+    def setup_companion(self, kind: str) -> None:
+        """
+        Adds a companion outlet publishing rows the EEG stream drops.
+
+        ``counters`` carries the package number, board timestamp and marker
+        rows (double precision) so that consumers can detect dropped packets.
+        ``aux`` carries accelerometer, gyro, analog and other rows. Both are
+        named ``<StreamName>_<Kind>`` and share the EEG stream's rate.
+
+        Args:
+            kind: One of ``COMPANION_KINDS``.
+
+        Raises:
+            ValueError: If *kind* is unknown.
+        """
+        board_id = self.board_shim.get_board_id()
+
+        if kind == COMPANION_COUNTERS:
+            candidates = [("PackageNum", "count", "get_package_num_channel"),
+                          ("Timestamp", "seconds", "get_timestamp_channel"),
+                          ("Marker", "code", "get_marker_channel")]
+            rows, labels, units, types = [], [], [], []
+            for label, unit, getter in candidates:
+                for row in board_rows(board_id, getter):
+                    rows.append(row)
+                    labels.append(label)
+                    units.append(unit)
+                    types.append(label)
+            stream_type, channel_format, dtype = "Counters", COUNTERS_CHANNEL_FORMAT, COUNTERS_SAMPLE_DTYPE
+        elif kind == COMPANION_AUX:
+            rows, labels, units, types = [], [], [], []
+            for ch_type, getter in AUX_ROW_GETTERS:
+                for i, row in enumerate(board_rows(board_id, getter)):
+                    rows.append(row)
+                    labels.append(f"{ch_type} {i}")
+                    units.append("raw")
+                    types.append(ch_type)
+            stream_type, channel_format, dtype = "Aux", LSL_CHANNEL_FORMAT, LSL_SAMPLE_DTYPE
+        else:
+            raise ValueError(f"Unknown companion stream '{kind}', "
+                             f"expected one of {COMPANION_KINDS}")
+
+        if not rows:
+            logger.warning("Board %d has no %s rows; skipping companion stream.",
+                           board_id, kind)
+            return
+
+        name = f"{self.stream_name}_{kind.capitalize()}"
+        info = StreamInfo(name, stream_type, len(rows), self.sampling_rate,
+                          channel_format, f"brainflow_{board_id}_{kind}")
+        append_channel_metadata(info, labels, units, types)
+        self.companions.append(CompanionOutlet(StreamOutlet(info), rows, dtype))
+        logger.info("LSL companion stream initialized: %s (%s)",
+                    name, ", ".join(labels))
+
+    def _target_chunk_samples(self) -> int:
+        """
+        Derives the scheduler chunk size from the configured latency budget.
+
+        The oldest sample of a chunk of n samples waits about n / fs before
+        it is pushed, so the largest chunk meeting the budget is
+        floor(fs * budget), and at least one sample.
+
+        Returns:
+            Target chunk size in samples, or 0 if no budget is configured.
+        """
+        max_latency_ms = self.config.get("max_latency_ms")
+        if not max_latency_ms:
+            return 0
+
+        target = max(1, int(self.sampling_rate * max_latency_ms
+                            / MILLISECONDS_PER_SECOND))
+        logger.info("Scheduler mode: %.1f ms latency budget -> %d-sample chunks",
+                    max_latency_ms, target)
+        return target
+
+    def _read_chunk(self) -> Optional[np.ndarray]:
+        """
+        Reads the next chunk from the board according to the polling mode.
+
+        In fixed mode the loop drains the buffer and sleeps one poll interval.
+        In scheduler mode it only reads once the target chunk is buffered and
+        otherwise sleeps for the time the missing samples need to arrive.
+
+        Returns:
+            BrainFlow data of shape (rows, samples), or None if nothing was read.
+        """
+        if not self.target_chunk_samples:
+            # get_board_data() retrieves all samples since last call
+            data = self.board_shim.get_board_data()
+            time.sleep(POLL_INTERVAL_S) # 100Hz polling is enough for chunks
+            return data
+
+        missing = self.target_chunk_samples - self.board_shim.get_board_data_count()
+        if missing > 0:
+            time.sleep(missing / self.sampling_rate)
+            return None
+        return self.board_shim.get_board_data()
+
+    def benchmark(self, duration_s: float = BENCHMARK_DURATION_S) -> Dict[str, float]:
+        """
+        Benchmarks the push paths using this board's channel layout.
+
+        Only static BrainFlow board descriptions are queried, so no hardware
+        session is opened.
+
+        Args:
+            duration_s: Wall-clock budget per push path in seconds.
+
+        Returns:
+            CPU microseconds per pushed sample for each push path.
+        """
+        board_config = self.config.get("Board", {})
+        board_name = board_config.get("Master") or board_config["Id"]
+        board_id = BoardIds[board_name].value
+        stream_name = board_config.get("StreamName", "BrainFlowEEG")
+
+        return benchmark_push(
+            num_channels=len(BoardShim.get_eeg_channels(board_id)),
+            sampling_rate=BoardShim.get_sampling_rate(board_id),
+            stream_name=stream_name,
+            duration_s=duration_s,
+        )
+
+    @property
+    def stream_name(self) -> str:
+        """LSL stream name of this board."""
+        return self.config.get("Board", {}).get("StreamName", "BrainFlowEEG")
+
+    def start(self) -> None:
+        """Prepares the board and outlet (if needed) and starts acquisition."""
+        if not self.board_shim or not self.outlet:
+            self.setup_board()
+            self.setup_lsl()
+
+        self.board_shim.start_stream()
+        self.start_time = time.perf_counter()
+        if self.telemetry:
+            self.telemetry.start()
+        logger.info("* LSL stream '%s' is now active.", self.stream_name)
+
+    def stream(self, stop_event: threading.Event) -> None:
+        """
+        Pushes board data to LSL until *stop_event* is set.
+
+        Args:
+            stop_event: Event that ends the loop when set.
+        """
+        while not stop_event.is_set():
+            data = self._read_chunk()
+            if data is None or not data.shape[1]:
+                continue
+            num_samples = data.shape[1]
+
+            # push_chunk is much more efficient than push_sample in a loop;
+            # a float32 (samples, channels) block is passed to liblsl as-is.
+            # One shared stamp keeps companion samples aligned with the EEG.
+            stamp = local_clock()
+            eeg_block = to_lsl_block(data, self.eeg_channels)
+            self.outlet.push_chunk(eeg_block, stamp)
+            if self.chunk_filter:
+                self.filtered_outlet.push_chunk(self.chunk_filter.process(eeg_block), stamp)
+            if self.ring:
+                self.ring.append(eeg_block, stamp)
+            for companion in self.companions:
+                companion.outlet.push_chunk(
+                    to_lsl_block(data, companion.rows, companion.dtype), stamp)
+            latency_ms = float(time.time() - data[self.timestamp_channel, 0]) * MILLISECONDS_PER_SECOND
+            self.push_stats.record(num_samples, latency_ms)
+            self.total_samples += num_samples
+
+            if self.telemetry:
+                dropped, self.last_package = count_dropped_packages(
+                    data[self.package_channel], self.last_package)
+                self.telemetry.record_chunk(num_samples, dropped, latency_ms)
+
+    def stop(self) -> None:
+        """Logs the session summary and releases the BrainFlow session."""
+        if self.telemetry:
+            self.telemetry.stop()
+        if self.ring:
+            self.ring.flush()
+        logger.info("  [Log] Sent %d samples total on '%s'",
+                    self.total_samples, self.stream_name)
+        self.push_stats.log_summary(self.stream_name)
+        if self.board_shim and self.board_shim.is_prepared():
+            logger.info("Releasing BrainFlow session...")
+            self.board_shim.stop_stream()
+            self.board_shim.release_session()
+            logger.info("Port released.")
+
     def run(self) -> None:
         """Main loop for streaming data."""
-        total_samples: int = 0
         try:
-            if not self.board_shim or not self.outlet:
-                self.setup_board()
-                self.setup_lsl()
-
-            self.board_shim.start_stream()
-            stream_name = self.config.get("Board", {}).get("StreamName", "BrainFlowEEG")
-            logger.info("* LSL stream '%s' is now active.", stream_name)
+            self.start()
             logger.info("* Streaming data... (Press Ctrl+C to stop)")
+            self.stream(threading.Event())
+        except KeyboardInterrupt:
+            logger.info("Stopping LSL server...")
+        except Exception as e:
+            logger.error("Unexpected error in LSL server: %s", e)
+        finally:
+            self.stop()
+
+
+def split_board_configs(config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Expands a hardware config into one config per board.
+
+    A hardware YAML either has a single ``Board`` section or a ``Boards``
+    list of such sections. All other top-level keys (montage path, latency
+    budget, ...) are shared; a board entry may set its own ``Montage``.
+
+    Args:
+        config: Parsed hardware configuration.
+
+    Returns:
+        List of single-board configurations with a ``Board`` section each.
+
+    Raises:
+        ValueError: If two boards publish the same LSL stream name.
+    """
+    boards = config.get("Boards") or [config.get("Board", {})]
+    shared = {k: v for k, v in config.items() if k not in ("Board", "Boards")}
+
+    board_configs: List[Dict[str, Any]] = []
+    for board in boards:
+        board_config = dict(shared, Board=board)
+        if board.get("Montage"):
+            board_config["montage_path"] = board["Montage"]
+        board_configs.append(board_config)
+
+    names = [c["Board"].get("StreamName", "BrainFlowEEG") for c in board_configs]
+    duplicates = {n for n in names if names.count(n) > 1}
+    if duplicates:
+        raise ValueError(f"Each board needs its own StreamName; duplicated: {duplicates}")
+    return board_configs
+
+
+class LSLServerGroup:
+    """
+    Bridges several BrainFlow boards to LSL from a single process.
+
+    Sessions are prepared one after the other on the main thread; each board
+    then gets its own acquisition thread and outlet. Ctrl+C stops all boards
+    and a combined throughput report is logged.
+    """
+
+    def __init__(self, configs: List[Dict[str, Any]]) -> None:
+        self.servers: List[LSLServer] = [LSLServer(c) for c in configs]
+        self.stop_event = threading.Event()
+        self.threads: List[threading.Thread] = []
+
+    def _stream_board(self, server: LSLServer) -> None:
+        """Thread body: streams one board and logs (not raises) its failure."""
+        try:
+            server.stream(self.stop_event)
+        except Exception as e:
+            logger.error("Board '%s' stopped streaming: %s", server.stream_name, e)
+
+    def log_throughput(self) -> None:
+        """Logs per-board and combined sample counts and rates."""
+        total_samples = 0
+        total_rate = 0.0
+        for server in self.servers:
+            elapsed = time.perf_counter() - server.start_time if server.start_time else 0.0
+            rate = server.total_samples / elapsed if elapsed > 0 else 0.0
+            logger.info("  [Log] '%s': %d samples in %.1f s (%.1f Hz, nominal %d Hz)",
+                        server.stream_name, server.total_samples, elapsed,
+                        rate, server.sampling_rate)
+            total_samples += server.total_samples
+            total_rate += rate
+        logger.info("  [Log] Combined: %d samples from %d boards (%.1f samples/s)",
+                    total_samples, len(self.servers), total_rate)
+
+    def run(self) -> None:
+        """Starts every board, streams until Ctrl+C, then releases all boards."""
+        try:
+            for server in self.servers:
+                server.start()
+            for server in self.servers:
+                thread = threading.Thread(target=self._stream_board, args=(server,),
+                                          name=f"lsl-{server.stream_name}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
 
-            while True:
-                # get_board_data() retrieves all samples since last call
-                data = self.board_shim.get_board_data()
-                
-                if data.any():
-                    # EEG channels are specific indices depending on the board
-                    eeg_channels = BoardShim.get_eeg_channels(self.board_shim.get_board_id())
-                    eeg_data = data[eeg_channels]
-                    num_samples = eeg_data.shape[1]
-                    
-                    # push_chunk is much more efficient than push_sample in a loop
-                    # Transpose from (channels, samples) to (samples, channels)
-                    self.outlet.push_chunk(eeg_data.T.tolist())
-                    total_samples += num_samples
-                    
-                time.sleep(0.01) # 100Hz polling is enough for chunks
-                
+            logger.info("* Streaming %d boards... (Press Ctrl+C to stop)",
+                        len(self.servers))
+            # Join with a timeout so the main thread keeps receiving Ctrl+C
+            while any(t.is_alive() for t in self.threads):
+                for thread in self.threads:
+                    thread.join(timeout=JOIN_POLL_S)
         except KeyboardInterrupt:
             logger.info("Stopping LSL server...")
         except Exception as e:
             logger.error("Unexpected error in LSL server: %s", e)
         finally:
-            logger.info("  [Log] Sent %d samples total", total_samples)
-            if self.board_shim and self.board_shim.is_prepared():
-                logger.info("Releasing BrainFlow session...")
-                self.board_shim.stop_stream()
-                self.board_shim.release_session()
-                logger.info("Port released.")
+            self.stop_event.set()
+            for thread in self.threads:
+                thread.join()
+            self.log_throughput()
+            for server in self.servers:
+                server.stop()
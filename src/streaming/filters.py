@@ -0,0 +1,113 @@
+"""
+Stateful real-time filtering for the LSL server.
+
+One SOS cascade (high-pass + notches) is applied to all channels of each
+pushed chunk at once, with the filter state carried from chunk to chunk, so
+the filtered stream is continuous and identical to filtering the whole
+recording causally in one go.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from scipy.signal import butter, iirnotch, sosfilt, sosfilt_zi, tf2sos
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NOTCH_Q: float = 30.0
+DEFAULT_HIGHPASS_ORDER: int = 4
+NYQUIST_FACTOR: float = 0.5
+
+
+class ChunkFilter:
+    """
+    Causal high-pass + notch filter over (samples, channels) chunks.
+
+    Method: a Butterworth high-pass of order *highpass_order* and one IIR
+    notch (quality factor *notch_q*) per line frequency are converted to
+    second-order sections and stacked into a single cascade. ``sosfilt`` runs
+    the cascade along the sample axis for every channel in one call; the
+    per-channel delay-line state ``zi`` of shape (sections, 2, channels) is
+    kept between calls. On the first chunk the state is set to the steady
+    state for the first sample, so large electrode DC offsets do not ring.
+    """
+
+    def __init__(
+        self,
+        sampling_rate: float,
+        num_channels: int,
+        notch_freqs: Optional[List[float]] = None,
+        highpass: Optional[float] = None,
+        notch_q: float = DEFAULT_NOTCH_Q,
+        highpass_order: int = DEFAULT_HIGHPASS_ORDER,
+    ) -> None:
+        nyquist = NYQUIST_FACTOR * sampling_rate
+        sections = []
+        if highpass:
+            sections.append(butter(highpass_order, highpass, btype="highpass",
+                                   fs=sampling_rate, output="sos"))
+        for freq in notch_freqs or []:
+            if not 0 < freq < nyquist:
+                logger.warning("Notch %.1f Hz is outside (0, %.1f) Hz; skipped.", freq, nyquist)
+                continue
+            b, a = iirnotch(freq, notch_q, fs=sampling_rate)
+            sections.append(tf2sos(b, a))
+        if not sections:
+            raise ValueError("Filter stage needs a HighPass and/or Notch frequencies.")
+
+        self.sos: np.ndarray = np.vstack(sections)
+        self.num_channels = num_channels
+        self.zi: Optional[np.ndarray] = None
+        logger.info("Filter stage: high-pass %s Hz, notch %s Hz (%d sections)",
+                    highpass, notch_freqs, self.sos.shape[0])
+
+    @classmethod
+    def from_config(
+        cls,
+        filter_cfg: Dict[str, Any],
+        sampling_rate: float,
+        num_channels: int,
+    ) -> "ChunkFilter":
+        """
+        Builds the filter from a ``Filter`` YAML section.
+
+        Args:
+            filter_cfg: Section with ``HighPass``, ``Notch`` and optional
+                ``NotchQ`` / ``Order``.
+            sampling_rate: Sampling rate in Hz.
+            num_channels: Number of channels per sample.
+
+        Returns:
+            Configured filter.
+        """
+        return cls(
+            sampling_rate,
+            num_channels,
+            notch_freqs=filter_cfg.get("Notch"),
+            highpass=filter_cfg.get("HighPass"),
+            notch_q=float(filter_cfg.get("NotchQ", DEFAULT_NOTCH_Q)),
+            highpass_order=int(filter_cfg.get("Order", DEFAULT_HIGHPASS_ORDER)),
+        )
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """
+        Filters one chunk and advances the filter state.
+
+        Args:
+            block: Samples of shape (n, num_channels).
+
+        Returns:
+            Filtered float32 samples of the same shape, C-contiguous.
+
+        Raises:
+            ValueError: If the channel count does not match.
+        """
+        if block.ndim != 2 or block.shape[1] != self.num_channels:
+            raise ValueError(f"Expected (n, {self.num_channels}) block, got {block.shape}")
+        if self.zi is None:
+            # (sections, 2) steady state scaled per channel -> (sections, 2, channels)
+            self.zi = sosfilt_zi(self.sos)[:, :, np.newaxis] * block[0].astype(np.float64)
+
+        filtered, self.zi = sosfilt(self.sos, block, axis=0, zi=self.zi)
+        return np.ascontiguousarray(filtered, dtype=np.float32)
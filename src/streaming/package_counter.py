@@ -0,0 +1,40 @@
+"""Helpers for the BrainFlow package counter published by the LSL server."""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+# BrainFlow boards count packages in one unsigned byte
+PACKAGE_NUM_MODULO: int = 256
+
+
+def count_dropped_packages(
+    package_numbers: np.ndarray,
+    previous: Optional[float] = None,
+    modulo: int = PACKAGE_NUM_MODULO,
+) -> Tuple[int, Optional[float]]:
+    """
+    Counts packages missing from a run of board package numbers.
+
+    Consecutive packages differ by one modulo *modulo*; a step of k means
+    k - 1 packages were lost. Repeated numbers (step 0) are not counted.
+    Passing the last number of the previous chunk as *previous* makes the
+    count continuous across chunks.
+
+    Args:
+        package_numbers: 1-D array of package numbers in arrival order.
+        previous: Last package number seen before this chunk, if any.
+        modulo: Counter wrap-around value.
+
+    Returns:
+        Tuple of (number of dropped packages, last package number seen).
+    """
+    numbers = np.asarray(package_numbers, dtype=np.int64).ravel()
+    if numbers.size == 0:
+        return 0, previous
+    if previous is not None:
+        numbers = np.concatenate(([int(previous)], numbers))
+
+    steps = np.diff(numbers) % modulo
+    dropped = int(np.sum(steps[steps > 1] - 1))
+    return dropped, float(numbers[-1])
@@ -0,0 +1,200 @@
+"""
+Replay recorded EEG over LSL.
+
+Streams a FIF file written by ``convert`` or a raw sweep CSV as if it came
+from ``LSLserver``: one float32 EEG outlet with the original sampling rate
+and a string ``<StreamName>_Markers`` outlet carrying the annotations.
+Chunks are released on absolute deadlines, so the replay neither drifts nor
+accumulates sleep jitter, and can run faster than real time.
+"""
+
+import logging
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+from pylsl import IRREGULAR_RATE, StreamInfo, StreamOutlet, local_clock
+
+from src.streaming.LSLserver import LSL_CHANNEL_FORMAT, append_channel_metadata, to_lsl_block
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_MS: float = 20.0
+MILLISECONDS_PER_SECOND: float = 1e3
+VOLTS_TO_MICROVOLTS: float = 1e6
+# Sweep CSV layout: timestamp, channels..., marker
+CSV_TIMESTAMP_COLUMN: int = 0
+
+
+def load_fif(path: Path) -> Tuple[np.ndarray, float, List[str], List[Tuple[int, str]]]:
+    """
+    Loads a FIF recording as the LSL server would have streamed it.
+
+    Args:
+        path: FIF file (``*_eeg.fif`` or ``*_eeg.fif.gz``).
+
+    Returns:
+        Tuple of (data (channels, samples) in microvolts, sampling rate,
+        channel names, [(sample index, annotation description)]).
+    """
+    import mne
+
+    raw = mne.io.read_raw_fif(path, preload=True, verbose=False)
+    sfreq = raw.info["sfreq"]
+    data = raw.get_data() * VOLTS_TO_MICROVOLTS
+    events: List[Tuple[int, str]] = []
+    if len(raw.annotations):
+        mne_events, event_id = mne.events_from_annotations(raw, verbose=False)
+        descriptions = {code: desc for desc, code in event_id.items()}
+        events = [(int(sample - raw.first_samp), descriptions[code])
+                  for sample, _, code in mne_events]
+    return data, sfreq, list(raw.ch_names), events
+
+
+def load_csv(
+    path: Path,
+    sfreq: Optional[float] = None,
+) -> Tuple[np.ndarray, float, List[str], List[Tuple[int, str]]]:
+    """
+    Loads a raw sweep CSV (timestamp, channels..., marker).
+
+    Args:
+        path: CSV file written by the sweep recorder.
+        sfreq: Sampling rate in Hz; estimated from the timestamp column
+            (median sample interval) if omitted.
+
+    Returns:
+        Tuple of (data (channels, samples), sampling rate, channel names,
+        [(sample index, marker description)]).
+    """
+    import pandas as pd
+    from src.utils.markers import marker_descriptions, markers_from_column
+
+    table = pd.read_csv(path, header=None)
+    timestamps = table.iloc[:, CSV_TIMESTAMP_COLUMN].to_numpy(dtype=np.float64)
+    data = table.iloc[:, 1:-1].to_numpy(dtype=np.float64).T
+    idxs, codes = markers_from_column(table.iloc[:, -1].to_numpy())
+
+    if sfreq is None:
+        sfreq = float(1.0 / np.median(np.diff(timestamps)))
+        logger.info("Estimated sampling rate from timestamps: %.2f Hz", sfreq)
+
+    events = list(zip(idxs.tolist(), marker_descriptions(codes).tolist()))
+    names = [f"Channel {i}" for i in range(data.shape[0])]
+    return data, sfreq, names, events
+
+
+class ReplayServer:
+    """Pushes a loaded recording to LSL on a real-time (or scaled) schedule."""
+
+    def __init__(
+        self,
+        path: Path,
+        stream_name: str = "BrainFlowEEG",
+        speed: float = 1.0,
+        chunk_ms: float = DEFAULT_CHUNK_MS,
+        sfreq: Optional[float] = None,
+    ) -> None:
+        """
+        Args:
+            path: FIF or CSV recording.
+            stream_name: LSL name of the EEG stream.
+            speed: Replay speed multiplier; 0 replays as fast as possible.
+            chunk_ms: Recording time per pushed chunk in milliseconds.
+            sfreq: Sampling rate override for CSV files.
+        """
+        self.path = Path(path)
+        self.stream_name = stream_name
+        self.speed = speed
+        if self.path.suffix.lower() == ".csv":
+            self.data, self.sfreq, self.ch_names, self.events = load_csv(self.path, sfreq)
+        else:
+            self.data, self.sfreq, self.ch_names, self.events = load_fif(self.path)
+        self.chunk_samples = max(1, int(round(self.sfreq * chunk_ms / MILLISECONDS_PER_SECOND)))
+        self.event_samples = np.array([e[0] for e in self.events], dtype=np.int64)
+        # LSL timestamp of the next sample to push; carried over between loop passes
+        self.next_stamp: Optional[float] = None
+
+        info = StreamInfo(stream_name, "EEG", len(self.ch_names), self.sfreq,
+                          LSL_CHANNEL_FORMAT, f"replay_{self.path.stem}")
+        append_channel_metadata(info, self.ch_names, ["microvolts"] * len(self.ch_names),
+                                ["EEG"] * len(self.ch_names))
+        self.outlet = StreamOutlet(info)
+        marker_info = StreamInfo(f"{stream_name}_Markers", "Markers", 1, IRREGULAR_RATE,
+                                 "string", f"replay_{self.path.stem}_markers")
+        self.marker_outlet = StreamOutlet(marker_info)
+        logger.info("Replaying %s: %d ch, %d samples (%.1f s) at %.1f Hz, %d markers, speed %s",
+                    self.path.name, len(self.ch_names), self.data.shape[1],
+                    self.data.shape[1] / self.sfreq, self.sfreq, len(self.events),
+                    f"{speed}x" if speed > 0 else "max")
+
+    def replay_once(self) -> float:
+        """
+        Streams the recording once.
+
+        Chunk k is released at ``start + (k + 1) * chunk / (sfreq * speed)``
+        on the monotonic clock, i.e. when its last sample would have been
+        acquired; only the remaining time to that deadline is slept.
+
+        Timestamps follow the sample index at the nominal rate from the
+        ``local_clock()`` time of the first sample, so they stay evenly spaced
+        and monotonic at any speed (faster replays run ahead of the clock).
+        A looped pass continues after the last timestamp of the previous one.
+
+        Returns:
+            Worst lateness of a chunk behind its deadline in seconds.
+        """
+        num_samples = self.data.shape[1]
+        all_rows = list(range(self.data.shape[0]))
+        start = time.perf_counter()
+        t0 = local_clock()
+        if self.next_stamp is not None:
+            t0 = max(t0, self.next_stamp)
+        worst_late = 0.0
+
+        for begin in range(0, num_samples, self.chunk_samples):
+            end = min(begin + self.chunk_samples, num_samples)
+            if self.speed > 0:
+                deadline = start + end / (self.sfreq * self.speed)
+                delay = deadline - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                worst_late = max(worst_late, time.perf_counter() - deadline)
+
+            # Timestamp of the chunk's last sample; liblsl back-fills the others
+            stamp = t0 + (end - 1) / self.sfreq
+            self.outlet.push_chunk(to_lsl_block(self.data[:, begin:end], all_rows), stamp)
+
+            # Markers get the timestamp liblsl derives for their sample
+            lo, hi = np.searchsorted(self.event_samples, [begin, end])
+            for i in range(lo, hi):
+                sample, description = self.events[i]
+                self.marker_outlet.push_sample(
+                    [description], t0 + sample / self.sfreq)
+        self.next_stamp = t0 + num_samples / self.sfreq
+        return worst_late
+
+    def run(self, loop: bool = False) -> None:
+        """
+        Replays until the file ends (or forever with *loop*) or Ctrl+C.
+
+        Args:
+            loop: Restart from the beginning when the file ends.
+        """
+        logger.info("* Replay stream '%s' is now active. (Press Ctrl+C to stop)",
+                    self.stream_name)
+        try:
+            while True:
+                started = time.perf_counter()
+                worst_late = self.replay_once()
+                elapsed = time.perf_counter() - started
+                # Fast looped replays would flood the log with one line per pass
+                log = logger.debug if loop else logger.info
+                log("Replayed %.1f s of data in %.1f s (worst chunk lateness %.1f ms)",
+                    self.data.shape[1] / self.sfreq, elapsed,
+                    worst_late * MILLISECONDS_PER_SECOND)
+                if not loop:
+                    break
+        except KeyboardInterrupt:
+            logger.info("Stopping replay...")
@@ -0,0 +1,288 @@
+"""
+Bounded on-disk ring buffer for the LSL server.
+
+Every pushed EEG block is also written into memory-mapped files so that data
+the recorder failed to pull can be recovered afterwards::
+
+    <dir>/header.json     layout (channels, capacity, rate, labels, clock offset)
+    <dir>/samples.f32     float32 (capacity, channels)
+    <dir>/timestamps.f64  float64 (capacity,) LSL timestamps
+    <dir>/position.i64    int64 total number of samples ever written
+
+The write position lives in its own one-element memmap so that it survives
+a crash without rewriting the JSON header on every chunk.
+"""
+
+import json
+import logging
+import time
+from argparse import Namespace
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from pylsl import local_clock
+
+logger = logging.getLogger(__name__)
+
+HEADER_FILE: str = "header.json"
+SAMPLES_FILE: str = "samples.f32"
+TIMESTAMPS_FILE: str = "timestamps.f64"
+POSITION_FILE: str = "position.i64"
+DEFAULT_MINUTES: float = 30.0
+SECONDS_PER_MINUTE: float = 60.0
+# CSV layout written by the sweep recorder: timestamp, channels..., marker
+CSV_TIMESTAMP_FORMAT: str = "%.17g"
+CSV_SAMPLE_FORMAT: str = "%.9g"  # round-trips float32 exactly
+
+
+class RingBuffer:
+    """
+    Fixed-capacity float32 sample ring with LSL timestamps on disk.
+
+    Opening an existing directory with the same layout continues after the
+    last written sample, so a restarted server does not wipe the data that
+    is meant to be recovered.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        num_channels: int,
+        capacity: int,
+        sampling_rate: float,
+        channel_labels: Optional[List[str]] = None,
+    ) -> None:
+        self.directory = Path(directory)
+        self.num_channels = num_channels
+        self.capacity = capacity
+        self.sampling_rate = sampling_rate
+        self.channel_labels = channel_labels or [f"Channel {i}" for i in range(num_channels)]
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        header_path = self.directory / HEADER_FILE
+        # Maps LSL local_clock() to Unix time for wall-clock exports
+        self.clock_offset = time.time() - local_clock()
+        header: Optional[Dict[str, Any]] = None
+        if header_path.exists():
+            header = json.loads(header_path.read_text(encoding="utf-8"))
+            if (header["num_channels"], header["capacity"]) != (num_channels, capacity):
+                raise ValueError(
+                    f"Ring buffer {self.directory} holds {header['num_channels']} ch x "
+                    f"{header['capacity']} samples; use another directory for "
+                    f"{num_channels} ch x {capacity} samples."
+                )
+            mode = "r+"
+        else:
+            mode = "w+"
+
+        self.samples = np.memmap(self.directory / SAMPLES_FILE, dtype=np.float32,
+                                 mode=mode, shape=(capacity, num_channels))
+        self.timestamps = np.memmap(self.directory / TIMESTAMPS_FILE, dtype=np.float64,
+                                    mode=mode, shape=(capacity,))
+        self.position = np.memmap(self.directory / POSITION_FILE, dtype=np.int64,
+                                  mode=mode, shape=(1,))
+        if header is not None:
+            self.continue_clock(header["clock_offset"])
+
+        header_path.write_text(json.dumps({
+            "num_channels": num_channels,
+            "capacity": capacity,
+            "sampling_rate": sampling_rate,
+            "channel_labels": self.channel_labels,
+            "clock_offset": self.clock_offset,
+        }, indent=2), encoding="utf-8")
+        logger.info("Ring buffer at %s: %d ch x %d samples (%.1f min), %d written so far",
+                    self.directory, num_channels, capacity,
+                    capacity / sampling_rate / SECONDS_PER_MINUTE, int(self.position[0]))
+
+    def continue_clock(self, stored_offset: float) -> None:
+        """
+        Keeps the stored timestamps on one clock when an existing ring is reopened.
+
+        While ``local_clock()`` keeps running (a restarted server), the stored
+        offset stays valid and is kept. After a reboot the clock starts
+        again near zero, below the newest stored timestamp; the stored
+        timestamps are then moved onto the new clock via their wall-clock
+        time, so the ring stays sorted and exports keep their wall time.
+
+        Args:
+            stored_offset: ``clock_offset`` from the existing header.
+        """
+        written = int(self.position[0])
+        if written == 0:
+            return
+        newest = float(self.timestamps[(written - 1) % self.capacity])
+        if newest <= local_clock():
+            self.clock_offset = stored_offset
+            return
+        valid = min(written, self.capacity)
+        self.timestamps[:valid] += stored_offset - self.clock_offset
+        self.timestamps.flush()
+        logger.info("LSL clock restarted since the last write to %s; moved %d stored "
+                    "timestamps onto the new clock", self.directory, valid)
+
+    @classmethod
+    def from_config(
+        cls,
+        ring_cfg: Dict[str, Any],
+        default_directory: Path,
+        num_channels: int,
+        sampling_rate: float,
+        channel_labels: List[str],
+    ) -> "RingBuffer":
+        """
+        Builds a ring buffer from a ``RingBuffer`` YAML section.
+
+        Args:
+            ring_cfg: Section with optional ``Directory`` and ``Minutes``.
+            default_directory: Directory used when none is configured.
+            num_channels: Channels per sample.
+            sampling_rate: Nominal sampling rate in Hz.
+            channel_labels: Channel labels stored in the header.
+
+        Returns:
+            Opened ring buffer.
+        """
+        minutes = float(ring_cfg.get("Minutes", DEFAULT_MINUTES))
+        capacity = int(minutes * SECONDS_PER_MINUTE * sampling_rate)
+        directory = Path(ring_cfg.get("Directory") or default_directory)
+        return cls(directory, num_channels, capacity, sampling_rate, channel_labels)
+
+    def append(self, block: np.ndarray, last_timestamp: float) -> None:
+        """
+        Writes a (samples, channels) float32 block into the ring.
+
+        Per-sample timestamps are derived from the stamp of the last sample
+        and the nominal rate, exactly as liblsl does for ``push_chunk``, so
+        they match the timestamps a recorder receives.
+
+        Args:
+            block: Samples of shape (n, num_channels).
+            last_timestamp: LSL timestamp of the last sample in *block*.
+        """
+        n = block.shape[0]
+        if n == 0:
+            return
+        if n > self.capacity:
+            block = block[-self.capacity:]
+            n = self.capacity
+
+        stamps = last_timestamp - np.arange(n - 1, -1, -1) / self.sampling_rate
+        start = int(self.position[0]) % self.capacity
+        first = min(n, self.capacity - start)
+        self.samples[start:start + first] = block[:first]
+        self.timestamps[start:start + first] = stamps[:first]
+        if first < n:
+            self.samples[:n - first] = block[first:]
+            self.timestamps[:n - first] = stamps[first:]
+        self.position[0] += n
+
+    def flush(self) -> None:
+        """Flushes the memory maps to disk."""
+        self.samples.flush()
+        self.timestamps.flush()
+        self.position.flush()
+
+
+def read_ring_range(
+    directory: Path,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+) -> Tuple[np.ndarray, np.ndarray, Dict[str, Any]]:
+    """
+    Reads the samples whose LSL timestamps fall in [start, end].
+
+    Args:
+        directory: Ring buffer directory.
+        start: First LSL timestamp to include (None = oldest available).
+        end: Last LSL timestamp to include (None = newest available).
+
+    Returns:
+        Tuple of (samples (n, channels) float32, timestamps (n,) float64,
+        header dict), in chronological order.
+    """
+    directory = Path(directory)
+    header = json.loads((directory / HEADER_FILE).read_text(encoding="utf-8"))
+    capacity, num_channels = header["capacity"], header["num_channels"]
+    samples = np.memmap(directory / SAMPLES_FILE, dtype=np.float32, mode="r",
+                        shape=(capacity, num_channels))
+    timestamps = np.memmap(directory / TIMESTAMPS_FILE, dtype=np.float64, mode="r",
+                           shape=(capacity,))
+    written = int(np.fromfile(directory / POSITION_FILE, dtype=np.int64)[0])
+
+    # Chronological order of the valid part: oldest sample first
+    oldest = max(0, written - capacity)
+    order = np.arange(oldest, written) % capacity
+    chrono_ts = timestamps[order]
+
+    lo = 0 if start is None else int(np.searchsorted(chrono_ts, start, side="left"))
+    hi = len(order) if end is None else int(np.searchsorted(chrono_ts, end, side="right"))
+    picks = order[lo:hi]
+    return np.asarray(samples[picks]), np.asarray(timestamps[picks]), header
+
+
+def write_ring_csv(samples: np.ndarray, timestamps: np.ndarray, csv_path: Path) -> None:
+    """
+    Writes samples in the sweep CSV layout (timestamp, channels..., marker).
+
+    The marker column is left empty; ``convert`` reads the file unchanged.
+
+    Args:
+        samples: (n, channels) samples.
+        timestamps: (n,) LSL timestamps.
+        csv_path: Output CSV path.
+    """
+    row_format = ",".join([CSV_TIMESTAMP_FORMAT] + [CSV_SAMPLE_FORMAT] * samples.shape[1]) + ","
+    table = np.column_stack((timestamps, samples.astype(np.float64)))
+    np.savetxt(csv_path, table, fmt=row_format)
+
+
+def export_ring(
+    directory: Path,
+    output_dir: Path,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    montage_config: Optional[Dict[str, Any]] = None,
+) -> Path:
+    """
+    Exports a time range of a ring buffer to CSV and, optionally, FIF.
+
+    Args:
+        directory: Ring buffer directory.
+        output_dir: Directory for the exported files.
+        start: Start as Unix time (None = oldest available sample).
+        end: End as Unix time (None = newest available sample).
+        montage_config: Montage YAML content; if given, the CSV is also
+            converted to FIF with ``convert``.
+
+    Returns:
+        Path of the written CSV file.
+
+    Raises:
+        ValueError: If the range contains no samples.
+    """
+    header = json.loads((Path(directory) / HEADER_FILE).read_text(encoding="utf-8"))
+    offset = header["clock_offset"]
+    samples, timestamps, _ = read_ring_range(
+        directory,
+        None if start is None else start - offset,
+        None if end is None else end - offset,
+    )
+    if len(timestamps) == 0:
+        raise ValueError(f"No samples in {directory} for the requested range.")
+
+    first_wall = time.strftime("%y%m%d-%H%M%S", time.localtime(timestamps[0] + offset))
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    csv_path = output_dir / f"{first_wall}_{Path(directory).name}_ring.csv"
+    write_ring_csv(samples, timestamps, csv_path)
+    logger.info("Exported %d samples (%.1f s) to %s", len(timestamps),
+                len(timestamps) / header["sampling_rate"], csv_path)
+
+    if montage_config is not None:
+        from src.converting.convert import mne_from_brainflow, write_raw
+
+        convert_args = Namespace(file=str(csv_path), output_dir=str(output_dir), verbose=False)
+        write_raw(convert_args, mne_from_brainflow(convert_args, montage_config))
+    return csv_path
@@ -0,0 +1,175 @@
+"""
+Acquisition telemetry for the LSL server.
+
+Counts samples, chunks, dropped packages and push latency per interval and
+publishes them as a low-rate ``<StreamName>_Diagnostics`` LSL stream and,
+optionally, as JSON lines so that starvation is visible during a sweep.
+"""
+
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from pylsl import StreamInfo, StreamOutlet
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL_S: float = 5.0
+# Warn when the effective rate falls below this fraction of the nominal rate
+STARVATION_RATIO: float = 0.95
+DIAGNOSTICS_CHANNEL_FORMAT: str = "double64"
+DIAGNOSTICS_FIELDS: tuple[str, ...] = (
+    "samples",
+    "chunks",
+    "chunk_mean",
+    "chunk_max",
+    "dropped_packages",
+    "latency_mean_ms",
+    "latency_max_ms",
+    "effective_rate_hz",
+    "nominal_rate_hz",
+)
+
+
+class StreamTelemetry:
+    """
+    Interval counters for one board, published from a background thread.
+
+    The acquisition loop calls :meth:`record_chunk` for every pushed chunk;
+    it only takes a lock and adds to a few scalars. Every *interval_s* the
+    telemetry thread swaps the counters out, derives the effective rate and
+    publishes one diagnostics sample.
+    """
+
+    def __init__(
+        self,
+        stream_name: str,
+        nominal_rate: float,
+        interval_s: float = DEFAULT_INTERVAL_S,
+        jsonl_path: Optional[Path] = None,
+    ) -> None:
+        self.stream_name = stream_name
+        self.nominal_rate = nominal_rate
+        self.interval_s = interval_s
+        self.jsonl_path = jsonl_path
+        self.outlet: Optional[StreamOutlet] = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        """Clears the interval counters (caller holds the lock)."""
+        self._samples = 0
+        self._chunks = 0
+        self._chunk_max = 0
+        self._dropped = 0
+        self._latency_sum_ms = 0.0
+        self._latency_max_ms = 0.0
+        self._interval_start = time.perf_counter()
+
+    def record_chunk(self, num_samples: int, dropped: int, latency_ms: float) -> None:
+        """
+        Adds one pushed chunk to the current interval.
+
+        Args:
+            num_samples: Samples in the chunk.
+            dropped: Packages missing before or inside the chunk.
+            latency_ms: Age of the oldest sample at push time in ms.
+        """
+        with self._lock:
+            self._samples += num_samples
+            self._chunks += 1
+            self._chunk_max = max(self._chunk_max, num_samples)
+            self._dropped += dropped
+            self._latency_sum_ms += latency_ms
+            self._latency_max_ms = max(self._latency_max_ms, latency_ms)
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Returns the current interval's metrics and starts a new interval.
+
+        Returns:
+            Metrics keyed by ``DIAGNOSTICS_FIELDS``.
+        """
+        with self._lock:
+            elapsed = time.perf_counter() - self._interval_start
+            chunks = self._chunks
+            metrics = {
+                "samples": self._samples,
+                "chunks": chunks,
+                "chunk_mean": self._samples / chunks if chunks else 0.0,
+                "chunk_max": self._chunk_max,
+                "dropped_packages": self._dropped,
+                "latency_mean_ms": self._latency_sum_ms / chunks if chunks else 0.0,
+                "latency_max_ms": self._latency_max_ms,
+                "effective_rate_hz": self._samples / elapsed if elapsed > 0 else 0.0,
+                "nominal_rate_hz": self.nominal_rate,
+            }
+            self._reset()
+        return metrics
+
+    def publish(self, metrics: Dict[str, float]) -> None:
+        """
+        Pushes one diagnostics sample, appends the JSON line and warns on
+        starvation or packet loss.
+
+        Args:
+            metrics: Output of :meth:`snapshot`.
+        """
+        if self.outlet:
+            self.outlet.push_sample([float(metrics[f]) for f in DIAGNOSTICS_FIELDS])
+
+        if self.jsonl_path:
+            record: Dict[str, Any] = {"time": time.time(), "stream": self.stream_name}
+            record.update(metrics)
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+        if metrics["effective_rate_hz"] < STARVATION_RATIO * self.nominal_rate:
+            logger.warning("'%s' starving: %.1f Hz of %.1f Hz nominal "
+                           "(%d samples, %d dropped packages)",
+                           self.stream_name, metrics["effective_rate_hz"],
+                           self.nominal_rate, metrics["samples"],
+                           metrics["dropped_packages"])
+        elif metrics["dropped_packages"]:
+            logger.warning("'%s': %d dropped packages in the last %.0f s",
+                           self.stream_name, metrics["dropped_packages"],
+                           self.interval_s)
+        else:
+            logger.debug("'%s' telemetry: %s", self.stream_name, metrics)
+
+    def _run(self) -> None:
+        """Thread body: publishes one snapshot per interval until stopped."""
+        while not self._stop_event.wait(self.interval_s):
+            self.publish(self.snapshot())
+
+    def start(self) -> None:
+        """Creates the diagnostics outlet and starts the telemetry thread."""
+        name = f"{self.stream_name}_Diagnostics"
+        info = StreamInfo(name, "Diagnostics", len(DIAGNOSTICS_FIELDS),
+                          1.0 / self.interval_s, DIAGNOSTICS_CHANNEL_FORMAT,
+                          f"{self.stream_name}_diagnostics")
+        channels_node = info.desc().append_child("channels")
+        for field_name in DIAGNOSTICS_FIELDS:
+            channels_node.append_child("channel").append_child_value("label", field_name)
+        self.outlet = StreamOutlet(info)
+
+        with self._lock:
+            self._reset()
+        self._thread = threading.Thread(target=self._run, name=f"telemetry-{self.stream_name}",
+                                        daemon=True)
+        self._thread.start()
+        logger.info("Telemetry every %.1f s on LSL stream '%s'%s", self.interval_s, name,
+                    f" and {self.jsonl_path}" if self.jsonl_path else "")
+
+    def stop(self) -> None:
+        """Stops the telemetry thread."""
+        if not self._thread:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
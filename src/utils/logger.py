@@ -1,9 +1,12 @@
 import logging
+import os
 import sys
 import warnings
 from pathlib import Path
 from datetime import datetime
-from .paths import LOG_DIR
+from . import paths
+
+MNE_LOG_LEVEL: str = "WARNING"
 
 # Filter out specific annoying pyprep messages that are redundant or misleading
 class PyPrepFilter(logging.Filter):
@@ -13,6 +16,23 @@ class PyPrepFilter(logging.Filter):
             return False
         return True
 
+def configure_mne_logging(level: str = MNE_LOG_LEVEL) -> None:
+    """
+    Sets the MNE log level without importing MNE.
+
+    MNE reads ``MNE_LOGGING_LEVEL`` when it is first imported, so commands
+    that never use MNE (LSLserver, sweep) do not pay for importing it here.
+    If MNE is already loaded, its level is set directly.
+
+    Args:
+        level: MNE log level name.
+    """
+    mne = sys.modules.get("mne")
+    if mne is not None:
+        mne.set_log_level(level)
+    else:
+        os.environ.setdefault("MNE_LOGGING_LEVEL", level)
+
 def setup_logger(name: str = None, level: int = logging.INFO) -> logging.Logger:
     """
     Sets up a logger with both console and file handlers.
@@ -45,13 +65,13 @@ def setup_logger(name: str = None, level: int = logging.INFO) -> logging.Logger:
     # File Handler
     log_name = name if name else "EEGsuite"
     log_filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{log_name}.log"
-    file_handler = logging.FileHandler(LOG_DIR / log_filename)
+    # Resolved at call time: --data-root may have moved LOG_DIR after import
+    file_handler = logging.FileHandler(paths.LOG_DIR / log_filename)
     file_handler.setFormatter(formatter)
     logger.addHandler(file_handler)
 
     # Silence external libraries
-    import mne
-    mne.set_log_level("WARNING")
+    configure_mne_logging()
     logging.getLogger("matplotlib").setLevel(logging.WARNING)
 
     pyprep_logger = logging.getLogger("pyprep")
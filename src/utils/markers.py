@@ -0,0 +1,115 @@
+"""
+Sweep marker codes and their conversion to MNE annotations.
+
+Every consumer of recorded markers (``convert``, the offline visualizer,
+``replay``) maps the numeric codes of the marker column to the same
+descriptions here. Codes are mapped with array operations: the distinct
+codes are looked up once in a sorted code table with ``np.searchsorted``
+and broadcast back with the ``np.unique`` inverse, so the cost does not
+depend on a Python loop over every marker.
+
+Each annotation lasts until the next marker (or the end of the recording),
+so a ``Stimulation ON`` annotation spans the actual stimulation and a rest
+annotation the actual rest, without the fixed 10 ms placeholder.
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+MARKER_MAP: Dict[float, str] = {
+    # New condition-aware markers
+    100.0: "FOT_Rest [100]",
+    101.0: "FOT_Stim_ON [101]",
+    111.0: "FOT_Stim_OFF [111]",
+    200.0: "IFNFN_Rest [200]",
+    201.0: "IFNFN_Stim_ON [201]",
+    211.0: "IFNFN_Stim_OFF [211]",
+    # Legacy markers (single-condition recordings)
+    0.0: "Stimulation READY [0]",
+    1.0: "Stimulation ON [1]",
+    11.0: "Stimulation OFF [11]",
+    3.0: "Baseline_VHP_OFF [3]",
+    33.0: "Baseline_VHP_ON [33]",
+    31.0: "Baseline_NoContact [31]",
+    333.0: "Baseline_PreSweep [333]",
+}
+
+# Sorted lookup table for np.searchsorted
+_CODES: np.ndarray = np.array(sorted(MARKER_MAP), dtype=np.float64)
+_NAMES: np.ndarray = np.array([MARKER_MAP[code] for code in _CODES], dtype=object)
+
+
+def marker_descriptions(codes: np.ndarray) -> np.ndarray:
+    """
+    Maps marker codes to annotation descriptions.
+
+    Args:
+        codes: Numeric marker codes.
+
+    Returns:
+        Object array of descriptions; codes without a name become
+        ``Event_<code>``.
+    """
+    unique, inverse = np.unique(np.asarray(codes, dtype=np.float64), return_inverse=True)
+    pos = np.minimum(np.searchsorted(_CODES, unique), len(_CODES) - 1)
+    known = _CODES[pos] == unique
+    names = np.where(known, _NAMES[pos], None)
+    # Only distinct unknown codes are formatted one by one
+    names[~known] = [f"Event_{int(code)}" for code in unique[~known]]
+    return names[inverse.reshape(-1)]
+
+
+def markers_from_column(markers: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Extracts the marked samples from a dense marker column.
+
+    Args:
+        markers: Marker column, NaN (or non-numeric) where no marker was written.
+
+    Returns:
+        Tuple of (sample indices, marker codes as float64).
+    """
+    markers = np.asarray(markers)
+    if markers.dtype.kind not in "fiu":
+        import pandas as pd
+        markers = pd.to_numeric(pd.Series(markers), errors="coerce").to_numpy()
+    markers = markers.astype(np.float64, copy=False)
+    idxs = np.flatnonzero(~np.isnan(markers))
+    return idxs, markers[idxs]
+
+
+def marker_durations(onsets: np.ndarray, end: float) -> np.ndarray:
+    """
+    Returns how long each marker lasts: until the next marker, the last one until *end*.
+
+    Args:
+        onsets: Marker onsets in seconds, ascending.
+        end: End of the recording in seconds, on the same time base.
+
+    Returns:
+        Non-negative durations in seconds.
+    """
+    onsets = np.asarray(onsets, dtype=np.float64)
+    return np.maximum(np.diff(onsets, append=max(end, onsets[-1]) if len(onsets) else end), 0.0)
+
+
+def marker_annotations(onsets: np.ndarray, codes: np.ndarray, end: Optional[float] = None):
+    """
+    Builds MNE annotations from marker onsets and codes.
+
+    Args:
+        onsets: Marker onsets in seconds from the start of the recording.
+        codes: Marker codes.
+        end: Length of the recording in seconds; the last marker lasts until
+            then. Defaults to the last onset (zero duration).
+
+    Returns:
+        ``mne.Annotations`` with one entry per marker.
+    """
+    import mne
+
+    onsets = np.asarray(onsets, dtype=np.float64)
+    end = end if end is not None else (onsets[-1] if len(onsets) else 0.0)
+    return mne.Annotations(onset=onsets, duration=marker_durations(onsets, end),
+                           description=marker_descriptions(codes))
@@ -24,6 +24,8 @@ RAW_DATA_DIR: Path = DATA_DIR / "raw"
 PROCESSED_DATA_DIR: Path = DATA_DIR / "processed"
 REPORT_DIR: Path = ROOT_DIR / "reports"
 LOG_DIR: Path = ROOT_DIR / "logs"
+# Local only: derived data that is not worth syncing to the cloud root
+CACHE_DIR: Path = ROOT_DIR / "cache"
 
 
 def set_cloud_root(new_root: Optional[Path] = None) -> None:
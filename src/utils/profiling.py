@@ -0,0 +1,63 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MILLISECONDS_PER_SECOND: float = 1e3
+
+
+class StartupProfiler:
+    """
+    Times named startup phases (imports, device connects) of a CLI command.
+
+    Phases are measured with ``time.perf_counter``; a disabled profiler
+    costs nothing but the context manager call.
+    """
+
+    def __init__(self, enabled: bool, origin: Optional[float] = None) -> None:
+        """
+        Args:
+            enabled: Whether to record and report phases.
+            origin: ``perf_counter`` value at process start (e.g. taken at
+                the top of ``main.py``); defaults to now.
+        """
+        self.enabled = enabled
+        self.origin = origin if origin is not None else time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+
+    def mark(self, name: str, start: float) -> None:
+        """
+        Records a phase that started at *start* and ends now.
+
+        Args:
+            name: Phase label.
+            start: ``perf_counter`` value at the start of the phase.
+        """
+        if self.enabled:
+            self.phases.append((name, time.perf_counter() - start))
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Context manager timing the enclosed block as one phase.
+
+        Args:
+            name: Phase label.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.mark(name, start)
+
+    def report(self) -> None:
+        """Logs every phase and the total time since the origin."""
+        if not self.enabled:
+            return
+        logger.info("Startup profile:")
+        for name, duration in self.phases:
+            logger.info("  %-28s %8.1f ms", name, duration * MILLISECONDS_PER_SECOND)
+        logger.info("  %-28s %8.1f ms", "total (since process start)",
+                    (time.perf_counter() - self.origin) * MILLISECONDS_PER_SECOND)